@@ -19,8 +19,19 @@ from serial.tools import list_ports
 import matplotlib.pyplot as plt
 import platform
 
+from .instruments import Spectroradiometer, SpectrumResult
 
-class PR650:
+N_SPECTRUM_POINTS = 101  # 380-780 nm in 4 nm steps
+SPECTRUM_HEADER_LINES = 2  # Lines before the spectral data in a d5 reply
+COMMAND_DELAY = 0.5  # Pause (s) after sending a command, before reading the reply
+QUALITY_CODES = {0: 'OK', 10: 'Light Low', 18: 'Light Low'}
+
+
+class PR650Error(Exception):
+    '''The PR650 did not reply, or replied with something unexpected'''
+
+
+class PR650(Spectroradiometer):
     """Class to control a PhotoResearch PR650 spectrophotometer
     """
 
@@ -36,11 +47,7 @@ class PR650:
         self.quality = 0
         self.lum = None
         self.OK = True
-        self.codes = {'OK': '000\r\n',  # this is returned after measure
-                      '18': 'Light Low',  # these is returned at beginning of data
-                      '10': 'Light Low',
-                      '00': 'OK'
-                      }
+        self.codes = {'OK': '000\r\n'}  # this is returned after measure - see QUALITY_CODES for the data quality codes
         self.com = serial.Serial(self.port, 9600, timeout=10)
         print("Spinning to attempt to open PR650 on port %s" % self.port)
         while True:
@@ -76,62 +83,69 @@ class PR650:
         # send the message
         self.com.write(str.encode(message))
         self.com.flush()
-        time.sleep(0.5)  # Allow PR650 to keep up
-        # get the reply
-        self.com.timeout = timeout  # DO NOT UNCOMMENT THIS, IT IS OLD
-        if message in ['d5', 'd5\n']:  # spectrum returns multiple lines
-            return self.com.readlines()
-        else:
-            return self.com.readline()
+        time.sleep(COMMAND_DELAY)
+        # get the reply - each line is returned as soon as it arrives, the timeout is only reached if the PR650 stops
+        self.com.timeout = timeout
+        n_lines = SPECTRUM_HEADER_LINES + N_SPECTRUM_POINTS if message == 'd5\n' else 1  # spectrum returns multiple lines
+        lines = []
+        for _ in range(n_lines):
+            line = self.com.readline()
+            if not line.endswith(b'\n'):
+                raise PR650Error(f"PR650 timed out after {timeout} s replying to {message.strip()} "
+                                 f"({len(lines)} of {n_lines} lines received)")
+            lines.append(line)
+        return lines if n_lines > 1 else lines[0]
 
     def measure(self, timeOut: float = 30.0):
         reply = self.sendMessage('m0', timeOut)  # m0 = measure and hold data
-        if reply.decode() == self.codes['OK']:
-            raw = self.sendMessage('d2')
-            xyz = str.split(raw.decode(), ',')  # parse into words
-            self.quality = str(xyz[0])
-            if self.codes[self.quality] == 'OK':
-                self.lum = float(xyz[3])
-        else:
-            print(f"PR650 did not respond to the m0 message with an 'OK, code is {reply}")
+        if reply.decode() != self.codes['OK']:
             self.lum = 0.0
-        #     print("PR650 returned no data-- try a longer timeout")
+            raise PR650Error(f"PR650 did not respond to the m0 message with an 'OK', code is {reply}")
+        raw = self.sendMessage('d2')
+        xyz = str.split(raw.decode(), ',')  # parse into words
+        self.quality = int(xyz[0])
+        self.lum = float(xyz[3]) if self.quality == 0 else 0.0
 
     def measureLum(self):
-        self.measure()
+        self.submit(self.measure).result()
         return self.lum
 
-    def measureSpectrum(self):
-        self.measure()
-        raw = self.sendMessage('d5')
-        print(raw)
-        return self.parseSpectrumOutput(raw), self.lum
+    def acquireSpectrum(self, timeout: float = 30.0, integrated=None) -> SpectrumResult:
+        start_time = time.perf_counter()
+        try:
+            try:
+                self.measure(timeout)
+            finally:
+                integration_end = time.perf_counter()
+                if integrated is not None:
+                    integrated.set()  # The spectrum is held by the PR650 - reading it back doesn't need the light
+            wavelengths, spectrum = self.parseSpectrumOutput(self.sendMessage('d5', timeout))
+        except (PR650Error, serial.SerialException, ValueError) as e:
+            return SpectrumResult(luminance=0.0, quality=self.quality, error=str(e), start_time=start_time)
+
+        error = None if self.quality == 0 else QUALITY_CODES.get(self.quality, f"Quality code {self.quality}")
+        return SpectrumResult(wavelengths, spectrum, self.lum, self.quality, error, start_time,
+                              integration_end=integration_end)
 
     def getLum(self):
         return self.lum
 
     def getSpectrum(self):
         # returns spectrum in a num array with 100 rows [nm, power]
-        raw = self.sendMessage('d5')
+        raw = self.submit(self.sendMessage, 'd5').result()
         return self.parseSpectrumOutput(raw)
 
     def parseSpectrumOutput(self, raw):
-        # Parses the spectrum strings from the PR650 (command 'd5')
-        nPoints = len(raw)
-        raw = raw[2:]
-        power = []
-        nm = []
-        for n, point in enumerate(raw):
-            thisNm, thisPower = str.split(point.decode(), ',')
-            nm.append(float(thisNm))
-            power.append(float(thisPower.replace('\r\n', '')))
+        # Parses the spectrum strings from the PR650 (command 'd5') - "nm,power" per line - in one pass
+        text = b''.join(raw[SPECTRUM_HEADER_LINES:]).decode().replace('\r\n', ',').strip(',')
+        values = numpy.array(text.split(','), dtype=numpy.float64).reshape(-1, 2)
+        nm, power = values[:, 0], values[:, 1]
         # If the PR650 doesn't get enough photons, it won't update the spec buffer.
         # So, we need to check for that condition to avoid returning an old (incorrect) spectrum.
-
         if self.lum == 0.0:
-            return numpy.asfarray(nm), numpy.zeros(nPoints-2)
+            return nm, numpy.zeros(len(nm))
         else:
-            return numpy.asfarray(nm), numpy.asfarray(power)
+            return nm, power
 
 
 def connect_to_PR650():
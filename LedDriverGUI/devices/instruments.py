@@ -0,0 +1,153 @@
+"""
+Instrument interfaces used by the calibration routines, and a registry of the backends that implement them.
+
+Backends are imported when they are connected, so e.g. the simulator can be used on a machine without the Newport USB
+driver or pyserial.
+"""
+
+import abc
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+SIMULATED = "simulated"
+
+
+class PowerMeter(abc.ABC):
+    """Optical power meter - all powers are in microwatts"""
+
+    @abc.abstractmethod
+    def measurePowerAndStd(self, std_dev_thresh=0.001) -> float:
+        """Averaged power measurement, repeated until its standard deviation is below std_dev_thresh"""
+
+    @abc.abstractmethod
+    def readPower(self) -> float:
+        """Single fast power reading, for polling while waiting for the signal to settle"""
+
+    @abc.abstractmethod
+    def setInstrumWavelength(self, wavelength):
+        pass
+
+    @abc.abstractmethod
+    def zeroPowerMeter(self):
+        """Store the current reading as the zero (dark) offset"""
+
+    def zeroValue(self):
+        """The stored zero offset (µW), or None if the meter can't report it"""
+        return None
+
+
+class SpectrumResult:
+    """A spectral measurement, or the reason it failed.
+
+    ok is only True for a complete measurement with quality code 0. Otherwise error holds the reason - the quality code
+    is kept as well, e.g. the PR650 reports "light low" as a quality code with a zero spectrum.
+    """
+
+    def __init__(self, wavelengths=None, spectrum=None, luminance=0.0, quality=None, error=None, start_time=None,
+                 end_time=None, integration_end=None):
+        self.wavelengths = wavelengths  # nm
+        self.spectrum = spectrum  # spectral radiance at each wavelength
+        self.luminance = luminance  # cd/m²
+        self.quality = quality  # instrument quality code, 0 is OK
+        self.error = error
+        self.start_time = start_time  # time.perf_counter() when the measurement started
+        self.end_time = end_time if end_time is not None else time.perf_counter()
+        # End of the integration, before the data was read back - defaults to end_time
+        self.integration_end = integration_end if integration_end is not None else self.end_time
+
+    @property
+    def ok(self):
+        return self.error is None and self.quality == 0
+
+    def __repr__(self):
+        status = "OK" if self.ok else f"failed ({self.error})"
+        return f"SpectrumResult({status}, quality={self.quality}, luminance={self.luminance})"
+
+
+class Spectroradiometer(abc.ABC):
+    """Spectroradiometer measuring the spectrum and luminance of the display.
+
+    Commands run one at a time on a single worker thread (the command queue), so measurements can be started without
+    blocking the caller and never interleave on the instrument's port.
+    """
+
+    _command_queue = None
+
+    @abc.abstractmethod
+    def acquireSpectrum(self, timeout=30.0, integrated=None) -> SpectrumResult:
+        """Measure a spectrum - implemented by each backend and only called from the command queue.
+
+        If given, the integrated threading.Event is set as soon as the light has been measured, before the data is read
+        back, so the display can be changed while the rest of the measurement completes. It is also set on failure.
+        """
+
+    def submit(self, function, *args, **kwargs) -> Future:
+        """Queue a command to run after the ones already queued"""
+        if self._command_queue is None:
+            self._command_queue = ThreadPoolExecutor(max_workers=1)
+        return self._command_queue.submit(function, *args, **kwargs)
+
+    def measureSpectrumAsync(self, timeout=30.0, integrated=None) -> Future:
+        """Queue a measurement - poll the returned Future with done(), and get its SpectrumResult with result()"""
+        return self.submit(self.acquireSpectrum, timeout, integrated)
+
+    def measureSpectrumResult(self, timeout=30.0) -> SpectrumResult:
+        return self.measureSpectrumAsync(timeout).result()
+
+    def measureSpectrum(self):
+        """Returns ((wavelengths (nm), spectral radiance), luminance (cd/m²))"""
+        result = self.measureSpectrumResult()
+        return (result.wavelengths, result.spectrum), result.luminance
+
+
+def _newport(**kwargs):
+    from .newport import NewPortWrapper
+    return NewPortWrapper(**kwargs)
+
+
+def _newportStreaming(**kwargs):
+    from .newport import NewPortWrapper
+    return NewPortWrapper(streaming=True, **kwargs)
+
+
+def _pr650(**kwargs):
+    from .PR650 import connect_to_PR650
+    return connect_to_PR650(**kwargs)
+
+
+def _simulatedPowerMeter(**kwargs):
+    from .simulator import SimulatedPowerMeter
+    return SimulatedPowerMeter(**kwargs)
+
+
+def _simulatedSpectroradiometer(**kwargs):
+    from .simulator import SimulatedSpectroradiometer
+    return SimulatedSpectroradiometer(**kwargs)
+
+
+POWER_METERS = {"newport": _newport, "newport_streaming": _newportStreaming, SIMULATED: _simulatedPowerMeter}
+SPECTRORADIOMETERS = {"pr650": _pr650, SIMULATED: _simulatedSpectroradiometer}
+
+
+def registerPowerMeter(name, factory):
+    POWER_METERS[name] = factory
+
+
+def registerSpectroradiometer(name, factory):
+    SPECTRORADIOMETERS[name] = factory
+
+
+def connectPowerMeter(backend="newport", **kwargs) -> PowerMeter:
+    try:
+        factory = POWER_METERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown power meter backend {backend} -- use one of {list(POWER_METERS)}")
+    return factory(**kwargs)
+
+
+def connectSpectroradiometer(backend="pr650", **kwargs) -> Spectroradiometer:
+    try:
+        factory = SPECTRORADIOMETERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown spectroradiometer backend {backend} -- use one of {list(SPECTRORADIOMETERS)}")
+    return factory(**kwargs)
@@ -10,6 +10,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 import concurrent.futures
 
+from .instruments import PowerMeter
+from .runningStats import measureUntilConfident
+
 
 class CommandError(Exception):
     '''The function in the usbdll.dll was not successfully evaluated'''
@@ -92,11 +95,12 @@ class Newport_1918c():
         except CommandError as e:
             print(e)
 
-    def ask(self, query_string):
+    def ask(self, query_string, response_size=1024):
         """
         Write a query and read the response from the device
         :rtype : String
         :param query_string: Check Manual for commands, ex '*IDN?'
+        :param response_size: size of the response buffer in bytes - increase for data store reads
         :return: :raise CommandError:
         """
         answer = ''
@@ -109,8 +113,8 @@ class Newport_1918c():
         else:
             pass
         time.sleep(0.1)
-        response = create_string_buffer(bytes(('\000' * 1024), 'utf-8'))
-        leng = c_ulong(1024)
+        response = create_string_buffer(bytes(('\000' * response_size), 'utf-8'))
+        leng = c_ulong(response_size)
         read_bytes = c_ulong()
         status = self.lib.newp_usb_get_ascii(cdevice_id, byref(response), leng, byref(read_bytes))
         if status != 0:
@@ -294,8 +298,27 @@ class Newport_1918c():
             print("Exiting the Newport console")
 
 
-class NewPortWrapper:
-    def __init__(self):
+SAMPLE_RESPONSE_BYTES = 20  # Upper bound on the length of one sample in a PM:DS:GET? response
+
+
+class NewPortWrapper(PowerMeter):
+    def __init__(self, streaming=False, ci_target=0.00002, max_samples=10000):
+        """
+        :param streaming: measure by streaming raw samples and stopping once the mean is known well enough, instead of
+            waiting for a full 10,000 sample buffer and only reading back its mean and standard deviation
+        :param ci_target: 95% confidence interval half-width (µW) at which streaming measurements stop
+        :param max_samples: maximum number of samples per streaming measurement
+        """
+        self.streaming = streaming
+        self.ci_target = ci_target
+        self.max_samples = max_samples
+        self.last_stats = None  # RunningStats of the last streaming measurement
+        self.last_waveform = None  # Raw samples (µW) of the last streaming measurement, for diagnostics
+        self.instrum = None
+        self.connect()
+
+    def connect(self):
+        """Connect to the power meter and apply its settings - also used to reconnect after a failed measurement"""
         # Initialize a instrument object. You might have to change the LIBname or product_id.
         nd = Newport_1918c(
             LIBNAME=r"C:\Program Files (x86)\Newport\Newport USB Driver\Bin\x64\usbdll.dll", product_id=0xCEC7)
@@ -367,20 +390,72 @@ class NewPortWrapper:
                 except concurrent.futures.TimeoutError:
                     num_tries -= 1
                     print(f"Measurement Failed. Trying again {num_tries} more times.")
-                    self.instrum = self.__init__()  # untested
+                    self.connect()
         return power
 
+    @staticmethod
+    def parseSamples(response):
+        """Sample values from a PM:DS:GET? response, skipping the header and footer lines"""
+        values = []
+        for line in response.splitlines():
+            try:
+                values.append(float(line))
+            except ValueError:
+                continue
+        return np.asarray(values)
+
+    def streamSamples(self, block_size=1000, buff_size=10000, interval_ms=0.1):
+        """
+        Start filling the data store and yield the new raw samples (in microwatts) as they arrive.
+        Acquisition is stopped when the generator is closed or the buffer is full.
+        """
+        self.instrum.write('PM:DS:Clear')
+        self.instrum.write('PM:DS:SIZE ' + str(buff_size))
+        self.instrum.write('PM:DS:INT ' + str(interval_ms * 10))  # in units of 0.1 ms, see read_buffer()
+        self.instrum.write('PM:DS:ENable 1')
+        try:
+            next_sample = 1  # Data store indices are 1-based
+            while next_sample <= buff_size:
+                count = int(self.instrum.ask('PM:DS:COUNT?'))
+                if count < next_sample:
+                    time.sleep(0.001 * interval_ms * block_size / 10)
+                    continue
+                last_sample = min(count, next_sample + block_size - 1)
+                response = self.instrum.ask(f'PM:DS:GET? {next_sample}-{last_sample}',
+                                            response_size=(last_sample - next_sample + 2) * SAMPLE_RESPONSE_BYTES + 1024)
+                next_sample = last_sample + 1
+                yield self.parseSamples(response) * 1000000.0
+        finally:
+            self.instrum.write('PM:DS:ENable 0')
+            self.instrum.write('PM:DS:Clear')
+
+    def measurePowerStreaming(self, ci_target=None, max_samples=None) -> float:
+        """Mean power in microwatts, streamed until its 95% confidence interval is within ci_target (µW)"""
+        ci_target = self.ci_target if ci_target is None else ci_target
+        max_samples = self.max_samples if max_samples is None else max_samples
+        self.last_stats, self.last_waveform = measureUntilConfident(
+            self.streamSamples(buff_size=max_samples), ci_target, max_samples=max_samples)
+        return self.last_stats.mean
+
     def measurePowerAndStd(self, std_dev_thresh=0.001) -> float:
+        if self.streaming:
+            return self.measurePowerStreaming()
         while True:
             mean_power, std_power = self.read_buffer()
             mean_power, std_power = float(mean_power) * 1000000.0, float(std_power) * 1000000.0  # in microwatts
             if std_power < std_dev_thresh:  # make sure we take a stable measurement that isn't fluctuating like crazy
                 return mean_power
 
+    def readPower(self) -> float:
+        """Single (digitally filtered) power reading in microwatts - fast enough to poll while waiting for settling"""
+        return float(self.instrum.ask("PM:Power?")) * 1000000.0
+
     def setInstrumWavelength(self, wavelength):
         self.instrum.write(f"PM:Lambda {str(wavelength)}")
         assert (self.instrum.ask("PM:Lambda?") == str(wavelength))
 
     def zeroPowerMeter(self):
         self.instrum.write("PM:ZEROSTOre")
-        # return float(self.instrum.ask("PM:ZEROVALue?"))
+
+    def zeroValue(self):
+        return float(self.instrum.ask("PM:ZEROVALue?")) * 1000000.0
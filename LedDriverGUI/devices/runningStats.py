@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class RunningStats:
+    """Streaming mean and variance (Welford), updated a block of samples at a time.
+
+    Each block is reduced with numpy and merged into the running totals with Chan's parallel update, so there is no
+    per-sample Python loop and no loss of precision from accumulating raw sums.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+
+    def update(self, samples):
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        n_block = len(samples)
+        if n_block == 0:
+            return
+        block_mean = samples.mean()
+        block_m2 = np.sum((samples - block_mean) ** 2)
+        n_total = self.n + n_block
+        delta = block_mean - self.mean
+        self.mean += delta * n_block / n_total
+        self.m2 += block_m2 + delta ** 2 * self.n * n_block / n_total
+        self.n = n_total
+
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else float("inf")
+
+    def std(self):
+        return float(np.sqrt(self.variance()))
+
+    def standardError(self):
+        return float(np.sqrt(self.variance() / self.n)) if self.n > 1 else float("inf")
+
+    def confidenceInterval(self, z=1.96):
+        """Half-width of the confidence interval on the mean (z=1.96 for 95%)"""
+        return z * self.standardError()
+
+
+def measureUntilConfident(blocks, ci_target, min_samples=100, max_samples=10000, z=1.96):
+    """Consume blocks of samples until the confidence interval on the mean is within ci_target.
+
+    :param blocks: iterator of sample arrays, e.g. from a power meter's streamSamples() - closed when done
+    :param ci_target: stop once the confidence interval half-width is at most this (same units as the samples)
+    :param min_samples: never stop before this many samples, so the variance estimate is meaningful
+    :param max_samples: hard cap - stop after this many samples even if the target has not been reached
+    :return: (RunningStats, all samples as one array)
+    """
+    stats = RunningStats()
+    waveform = []
+    try:
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float64)[:max_samples - stats.n]
+            stats.update(block)
+            waveform.append(block)
+            if stats.n >= max_samples:
+                break
+            if stats.n >= min_samples and stats.confidenceInterval(z) <= ci_target:
+                break
+    finally:
+        if hasattr(blocks, "close"):
+            blocks.close()  # Lets the instrument stop acquiring
+    return stats, np.concatenate(waveform) if waveform else np.empty(0)
@@ -0,0 +1,227 @@
+"""
+Simulated projector, power meter and spectroradiometer, so the calibration routines can be run and timed without
+hardware.
+
+SimulatedProjector models what the instruments see: the RGO/BGO sequence tables set the PWM and current of each LED
+per bit-plane, and the background color selects which bit-planes of each channel are shown. Both instruments read the
+same projector, which LUTMeasurement keeps up to date whenever it changes the background color or uploads a table.
+"""
+import time
+import numpy as np
+import pandas as pd
+
+from .instruments import PowerMeter, Spectroradiometer, SpectrumResult
+from .runningStats import measureUntilConfident
+
+N_LEVELS = 8  # Bit-plane levels per channel, sequence table row order (level 128 first)
+N_CHANNELS = 3  # Display color channels per sequence table
+LED_PEAKS = [452, 520, 592, 640]  # Peak wavelength (nm) of each LED, B G O R (LED # 1-4)
+WAVELENGTHS = np.arange(380, 781, 4)  # PR650 spectral sampling (nm)
+LIGHT_LOW = 10  # PR650 quality code for too little light
+
+
+def photopicEfficiency(wavelength):
+    """Gaussian approximation of the CIE 1924 photopic luminous efficiency function V(λ)"""
+    return 1.019 * np.exp(-285.4 * (np.asarray(wavelength) / 1000 - 0.559) ** 2)
+
+
+class SimulatedProjector:
+    def __init__(self, peak_powers=(1.2, 2.0, 1.5, 2.5), gammas=(1.08, 1.12, 1.1, 1.15), current_exponent=0.9,
+                 fwhm=(20, 30, 15, 18), dark_offset=0.002, drift=-2e-5, settle_time=0.05, seed=None):
+        """
+        :param peak_powers: power (µW) of each LED (B G O R) at full PWM and current, with all bit-planes shown
+        :param gammas: exponent of the power vs PWM curve of each LED
+        :param current_exponent: exponent of the power vs current curve
+        :param fwhm: full width at half maximum (nm) of each LED spectrum
+        :param dark_offset: power (µW) reaching the meter with a black background - ambient and DMD leakage
+        :param drift: relative change in LED output per second, e.g. as the LEDs warm up
+        :param settle_time: time constant (s) of the optical signal after every change
+        """
+        self.peak_powers = np.asarray(peak_powers, dtype=np.float64)
+        self.gammas = np.asarray(gammas, dtype=np.float64)
+        self.current_exponent = current_exponent
+        self.fwhm = np.asarray(fwhm, dtype=np.float64)
+        self.dark_offset = dark_offset
+        self.drift = drift
+        self.settle_time = settle_time
+        self.rng = np.random.default_rng(seed)
+        self.start_time = time.perf_counter()
+
+        # LED number (1-based), PWM and current (fractions) per sequence table (low/high), level and channel
+        self.led_numbers = np.zeros((2, N_LEVELS, N_CHANNELS), dtype=int)
+        self.pwms = np.zeros((2, N_LEVELS, N_CHANNELS))
+        self.currents = np.zeros((2, N_LEVELS, N_CHANNELS))
+        self.color = np.zeros(N_CHANNELS, dtype=int)
+        bit = np.array([2 ** (N_LEVELS - 1 - level) for level in range(N_LEVELS)])
+        self.bit_weights = bit / (2 ** N_LEVELS - 1)  # Fraction of the frame each bit-plane is shown for
+
+        # Each change starts an exponential transition from the output at the time of the change
+        self.previous_output = np.zeros(len(LED_PEAKS))
+        self.changed_at = self.start_time
+
+    def targetOutput(self):
+        """Steady state power (µW) of each LED for the current tables and background color, without drift"""
+        shifts = N_LEVELS - 1 - np.arange(N_LEVELS)
+        shown = (self.color[None, :] >> shifts[:, None]) & 1  # Bit-planes shown per level and channel
+        led = self.led_numbers - 1
+        valid = (led >= 0) & (led < len(LED_PEAKS)) & (shown[None] == 1)
+        led = np.clip(led, 0, len(LED_PEAKS) - 1)
+        power = (self.peak_powers[led] * self.pwms ** self.gammas[led] * self.currents ** self.current_exponent
+                 * self.bit_weights[None, :, None] / 2)  # low and high tables are each shown half the time
+        return np.bincount(led[valid], power[valid], minlength=len(LED_PEAKS))
+
+    def ledOutput(self):
+        """Power (µW) of each LED right now, including settling and drift"""
+        now = time.perf_counter()
+        settle = np.exp(-(now - self.changed_at) / self.settle_time) if self.settle_time > 0 else 0.0
+        target = self.targetOutput()
+        output = target + (self.previous_output - target) * settle
+        return output * (1 + self.drift * (now - self.start_time))
+
+    def change(self, update):
+        self.previous_output = self.ledOutput()
+        update()
+        self.changed_at = time.perf_counter()
+
+    def setBackgroundColor(self, color):
+        def update():
+            self.color[:] = np.clip(color, 0, 2 ** N_LEVELS - 1)
+        self.change(update)
+
+    def setSequence(self, rows_low, rows_high):
+        """Set the low and high sequence tables from rows of [LED #, PWM %, current %, duration s]"""
+        def update():
+            for table, rows in enumerate([rows_low, rows_high]):
+                rows = np.asarray(rows, dtype=np.float64)[:N_LEVELS * N_CHANNELS].reshape(N_LEVELS, N_CHANNELS, -1)
+                self.led_numbers[table] = rows[:, :, 0].astype(int)
+                self.pwms[table] = rows[:, :, 1] / 100
+                self.currents[table] = rows[:, :, 2] / 100
+        self.change(update)
+
+    def loadSequenceFiles(self, path_low, path_high):
+        rows = [pd.read_csv(path, skipinitialspace=True).to_numpy(dtype=np.float64) for path in [path_low, path_high]]
+        self.setSequence(*rows)
+
+
+class SimulatedPowerMeter(PowerMeter):
+    """Silicon photodiode power meter reading a SimulatedProjector.
+
+    Like a real photodiode meter, the reading is only correct for light at the wavelength the meter is set to, as the
+    responsivity of silicon is roughly proportional to wavelength.
+    """
+
+    def __init__(self, projector=None, noise=0.0005, n_samples=10000, read_time=0.02, measure_time=0.0,
+                 sample_interval=0.0, streaming=False, ci_target=0.00002):
+        """
+        :param projector: SimulatedProjector to measure - a new one is created if None
+        :param noise: standard deviation (µW) of a single reading
+        :param n_samples: number of readings averaged by measurePowerAndStd()
+        :param read_time: time (s) a single reading takes
+        :param measure_time: time (s) an averaged measurement takes
+        :param sample_interval: time (s) between data store samples when streaming
+        :param streaming: stream samples until the mean is known to within ci_target, as NewPortWrapper(streaming=True)
+        :param ci_target: 95% confidence interval half-width (µW) at which streaming measurements stop
+        """
+        self.projector = projector if projector is not None else SimulatedProjector()
+        self.noise = noise
+        self.n_samples = n_samples
+        self.read_time = read_time
+        self.measure_time = measure_time
+        self.sample_interval = sample_interval
+        self.streaming = streaming
+        self.ci_target = ci_target
+        self.last_stats = None
+        self.last_waveform = None
+        self.wavelength = 550
+        self.zero = 0.0
+
+    def truePower(self):
+        responsivity = np.asarray(LED_PEAKS) / self.wavelength
+        return float(np.dot(self.projector.ledOutput(), responsivity)) + self.projector.dark_offset - self.zero
+
+    def readPower(self) -> float:
+        if self.read_time:
+            time.sleep(self.read_time)
+        return self.truePower() + self.projector.rng.normal(0, self.noise)
+
+    def streamSamples(self, block_size=1000, buff_size=10000):
+        for start in range(0, buff_size, block_size):
+            n = min(block_size, buff_size - start)
+            if self.sample_interval:
+                time.sleep(self.sample_interval * n)
+            yield self.truePower() + self.projector.rng.normal(0, self.noise, n)
+
+    def measurePowerStreaming(self, ci_target=None, max_samples=None) -> float:
+        ci_target = self.ci_target if ci_target is None else ci_target
+        max_samples = self.n_samples if max_samples is None else max_samples
+        self.last_stats, self.last_waveform = measureUntilConfident(
+            self.streamSamples(buff_size=max_samples), ci_target, max_samples=max_samples)
+        return self.last_stats.mean
+
+    def measurePowerAndStd(self, std_dev_thresh=0.001) -> float:
+        if self.streaming:
+            return self.measurePowerStreaming()
+        # The noise of the simulated meter doesn't change, so unlike the real meter there is no point retrying until the
+        # standard deviation is below std_dev_thresh
+        if self.measure_time:
+            time.sleep(self.measure_time)
+        return self.truePower() + self.projector.rng.normal(0, self.noise / np.sqrt(self.n_samples))
+
+    def setInstrumWavelength(self, wavelength):
+        self.wavelength = wavelength
+
+    def zeroPowerMeter(self):
+        self.zero += self.truePower()
+
+    def zeroValue(self):
+        return self.zero
+
+
+class SimulatedSpectroradiometer(Spectroradiometer):
+    """PR650 style spectroradiometer reading a SimulatedProjector, with the LED spectra modelled as Gaussians."""
+
+    def __init__(self, projector=None, radiance_scale=0.05, noise=0.005, min_luminance=0.01, measure_time=0.0,
+                 readout_time=0.0):
+        """
+        :param projector: SimulatedProjector to measure - a new one is created if None
+        :param radiance_scale: spectral radiance (W/sr/m²) per µW of LED power at the power meter
+        :param noise: relative noise of each spectral sample
+        :param min_luminance: luminance (cd/m²) below which the PR650 reports "light low" and returns a zero spectrum
+        :param measure_time: integration time (s) of a measurement
+        :param readout_time: time (s) to read the spectrum back after the integration
+        """
+        self.projector = projector if projector is not None else SimulatedProjector()
+        self.radiance_scale = radiance_scale
+        self.noise = noise
+        self.min_luminance = min_luminance
+        self.measure_time = measure_time
+        self.readout_time = readout_time
+        self.lum = None
+
+    def acquireSpectrum(self, timeout=30.0, integrated=None):
+        start_time = time.perf_counter()
+        output = self.projector.ledOutput()
+        if self.measure_time:
+            time.sleep(self.measure_time)
+            output = (output + self.projector.ledOutput()) / 2  # the display may change during the integration time
+        integration_end = time.perf_counter()
+        if integrated is not None:
+            integrated.set()
+        if self.readout_time:
+            time.sleep(self.readout_time)
+        sigma = self.projector.fwhm / (2 * np.sqrt(2 * np.log(2)))
+        peaks = np.asarray(LED_PEAKS, dtype=np.float64)
+        # Spectral density (per nm) of each LED, normalised to integrate to one
+        shapes = (np.exp(-0.5 * ((WAVELENGTHS[:, None] - peaks) / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi)))
+        spectrum = shapes @ (output * self.radiance_scale)
+        spectrum *= 1 + self.projector.rng.normal(0, self.noise, len(WAVELENGTHS))
+        spectrum = np.clip(spectrum, 0, None)
+
+        step = WAVELENGTHS[1] - WAVELENGTHS[0]
+        self.lum = float(683 * np.sum(spectrum * photopicEfficiency(WAVELENGTHS)) * step)
+        if self.lum < self.min_luminance:
+            self.lum = 0.0
+            return SpectrumResult(WAVELENGTHS.astype(np.float64), np.zeros(len(WAVELENGTHS)), 0.0, LIGHT_LOW,
+                                  "Light Low", start_time, integration_end=integration_end)
+        return SpectrumResult(WAVELENGTHS.astype(np.float64), spectrum, self.lum, 0, start_time=start_time,
+                              integration_end=integration_end)
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Acquisition:
+    """Measurements taken by every instrument against one display/driver state, aligned in time.
+
+    Each instrument integrates over its own window (time.perf_counter() start and end, excluding the time taken to read
+    the data back). time is the middle of the span covered by all windows, and skew is the largest difference between
+    the window centres - a measure of how well the instruments saw the same light.
+    """
+
+    def __init__(self, label=None, spectrum=None, power=None, power_start=None, power_end=None):
+        self.label = label
+        self.spectrum = spectrum  # SpectrumResult, or None without a spectroradiometer
+        self.power = power  # µW, or None without a power meter
+        self.power_start = power_start
+        self.power_end = power_end
+
+        windows = []
+        if spectrum is not None:
+            windows += [(spectrum.start_time, spectrum.integration_end)]
+        if power is not None:
+            windows += [(power_start, power_end)]
+        self.start_time = min(start for start, _ in windows) if windows else None
+        self.end_time = max(end for _, end in windows) if windows else None
+        self.time = (self.start_time + self.end_time) / 2 if windows else None
+        centres = [(start + end) / 2 for start, end in windows]
+        self.skew = max(centres) - min(centres) if windows else 0.0
+
+    @property
+    def luminance(self):
+        return self.spectrum.luminance if self.spectrum is not None else None
+
+    @property
+    def ok(self):
+        return self.spectrum is None or self.spectrum.ok
+
+
+class PendingAcquisition:
+    """Acquisition that has been started on all instruments but may not have finished yet"""
+
+    def __init__(self, label, power_future=None, spectrum_future=None, integrated=()):
+        self.label = label
+        self.power_future = power_future
+        self.spectrum_future = spectrum_future
+        self.integrated = integrated  # threading.Events set once each instrument no longer needs the light
+
+    def waitIntegrated(self, timeout=None):
+        """Block until every instrument has measured the light - the display can be changed after this returns"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for event in self.integrated:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def done(self):
+        return all(future.done() for future in [self.power_future, self.spectrum_future] if future is not None)
+
+    def result(self):
+        power, power_start, power_end = self.power_future.result() if self.power_future else (None, None, None)
+        spectrum = self.spectrum_future.result() if self.spectrum_future else None
+        return Acquisition(self.label, spectrum, power, power_start, power_end)
+
+
+class AcquisitionScheduler:
+    """Runs the power meter and spectroradiometer at the same time against the same display state.
+
+    start() returns as soon as both instruments are running. The caller can then wait for the integration to finish
+    (waitIntegrated()) and prepare or upload the next state while the instruments are still reading their data back.
+    """
+
+    def __init__(self, power_meter=None, spectroradiometer=None, timeout=30.0):
+        self.power_meter = power_meter
+        self.spectroradiometer = spectroradiometer
+        self.timeout = timeout
+        self._power_queue = ThreadPoolExecutor(max_workers=1) if power_meter is not None else None
+
+    def measurePower(self, integrated):
+        start = time.perf_counter()
+        try:
+            power = self.power_meter.measurePowerAndStd()
+        finally:
+            integrated.set()
+        return power, start, time.perf_counter()
+
+    def start(self, label=None) -> PendingAcquisition:
+        integrated = []
+        power_future = spectrum_future = None
+        if self.spectroradiometer is not None:
+            integrated += [threading.Event()]
+            spectrum_future = self.spectroradiometer.measureSpectrumAsync(self.timeout, integrated[-1])
+        if self.power_meter is not None:
+            integrated += [threading.Event()]
+            power_future = self._power_queue.submit(self.measurePower, integrated[-1])
+        return PendingAcquisition(label, power_future, spectrum_future, integrated)
+
+    def acquire(self, label=None) -> Acquisition:
+        return self.start(label).result()
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+
+START = "start"
+COMPLETE = "complete"
+
+
+class CalibrationJournal:
+    """Append-only log of completed calibration steps, so an interrupted run can be resumed where it stopped.
+
+    Each entry is one JSON object per line, flushed and fsynced as soon as it is written, so everything up to the last
+    completed step survives an instrument hang or a GUI crash. A line cut short by a crash is ignored when the journal is
+    read back. Once a run records COMPLETE, the next run archives the journal and starts a new one.
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.entries = self.read()
+        if self.entries and (not resume or self.entries[-1]["step"] == COMPLETE):
+            self.archive()
+            self.entries = []
+        self.resumed = any(entry["step"] != START for entry in self.entries)
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell() > 0 and not self._endsWithNewline():
+            self._file.write("\n")  # Don't append to a line cut short by a crash
+        self.record(START, resumed=self.resumed)
+
+    def _endsWithNewline(self):
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def read(self):
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # partially written entry
+        return entries
+
+    def archive(self):
+        root, ext = os.path.splitext(self.path)
+        os.replace(self.path, f"{root}-{time.strftime('%Y%m%d-%H%M%S')}{ext}")
+
+    def record(self, step, **fields):
+        entry = {"step": step, "time": time.time(), **fields}
+        self._file.write(json.dumps(entry, default=float) + "\n")  # default=float converts numpy scalars
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries.append(entry)
+        return entry
+
+    def find(self, step, **match):
+        """All entries of a step whose fields equal the given values, oldest first"""
+        return [entry for entry in self.entries
+                if entry["step"] == step and all(entry.get(key) == value for key, value in match.items())]
+
+    def last(self, step, **match):
+        entries = self.find(step, **match)
+        return entries[-1] if entries else None
+
+    def complete(self):
+        self.record(COMPLETE)
+        self.close()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
@@ -0,0 +1,181 @@
+"""
+Colorimetric model of the projector: converts measured LED spectra to XYZ and cone (LMS) excitations, and solves for the
+PWM of every primary that produces a target colour.
+
+A primary is one LED in one slot of the frame - in the RGO/BGO setup the frame alternates between an RGO and a BGO
+half, giving six primaries (R, G, O, B, G, O) from four LEDs. Light adds linearly, so the excitation of a drive state is
+a 3 x n_leds matrix times the total PWM of each LED, and targets are solved for thousands at a time with matrix algebra.
+"""
+import numpy as np
+import pandas as pd
+
+LED_NAMES = ["B", "G", "O", "R"]  # Zero-indexed LEDs, as in LUTMeasurement.four_leds
+SIX_PRIMARIES = [3, 1, 2, 0, 1, 2]  # LED of each slot: the RGO half (rgo.csv) then the BGO half (bgo.csv)
+LUMINOUS_EFFICACY = 683.0  # lm/W
+PWM_MAX = 65535  # Full scale PWM on the driver
+XYZ = "XYZ"
+LMS = "LMS"
+
+# Smith & Pokorny cone fundamentals from Judd-Vos XYZ, scaled so that L + M = Y (luminance)
+XYZ_TO_LMS = np.array([[0.15514, 0.54312, -0.03286],
+                       [-0.15514, 0.45684, 0.03286],
+                       [0.0, 0.0, 0.00801]])
+
+
+def _lobe(wavelength, mean, sigma_low, sigma_high):
+    sigma = np.where(wavelength < mean, sigma_low, sigma_high)
+    return np.exp(-0.5 * ((wavelength - mean) / sigma) ** 2)
+
+
+def colorMatchingFunctions(wavelengths):
+    """CIE 1931 2° colour matching functions, from the multi-lobe fit of Wyman, Sloan & Shirley (2013).
+
+    :return: array of shape (3, n_wavelengths) with x̄, ȳ, z̄
+    """
+    wl = np.asarray(wavelengths, dtype=np.float64)
+    x = 1.056 * _lobe(wl, 599.8, 37.9, 31.0) + 0.362 * _lobe(wl, 442.0, 16.0, 26.7) - 0.065 * _lobe(wl, 501.1, 20.4, 26.2)
+    y = 0.821 * _lobe(wl, 568.8, 46.9, 40.5) + 0.286 * _lobe(wl, 530.9, 16.3, 31.1)
+    z = 1.217 * _lobe(wl, 437.0, 11.8, 36.0) + 0.681 * _lobe(wl, 459.0, 26.0, 13.8)
+    return np.stack([x, y, z])
+
+
+def loadSpectraCSV(path):
+    """Read spectrums.csv from a spectral measurement. Returns (wavelengths, {led: spectral radiance})"""
+    df = pd.read_csv(path)
+    spectra = {int(column.split()[-1]): df[column].to_numpy(dtype=np.float64)
+               for column in df.columns if column.startswith("LED")}
+    return df["wavelength"].to_numpy(dtype=np.float64), spectra
+
+
+class ColorEngine:
+    def __init__(self, wavelengths, spectra, primaries=SIX_PRIMARIES, slot_fraction=0.5, currents=None,
+                 current_exponent=1.0):
+        """
+        :param wavelengths: nm, evenly spaced
+        :param spectra: {led: spectral radiance (W/sr/m²/nm)} measured with the LED on at full PWM and current
+        :param primaries: LED shown in each slot of the frame
+        :param slot_fraction: fraction of the frame each slot is shown for (spectra are measured over the whole frame)
+        :param currents: {led: current (0-1)} the LEDs will be driven at, defaults to full current
+        :param current_exponent: exponent of radiance vs current
+        """
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.primaries = list(primaries)
+        self.leds = sorted(set(self.primaries))
+        missing = [led for led in self.leds if led not in spectra]
+        if missing:
+            raise ValueError(f"No spectra for LEDs {missing}")
+        self.slot_fraction = slot_fraction
+        currents = {} if currents is None else currents
+        scale = np.array([currents.get(led, 1.0) ** current_exponent * slot_fraction for led in self.leds])
+
+        # Slots each LED is shown in, and the most drive it can get (sum of full PWM over its slots)
+        self.slots = np.array([[primary == led for primary in self.primaries] for led in self.leds], dtype=np.float64)
+        self.max_drive = self.slots.sum(axis=1)
+
+        # Excitation of each LED per unit PWM in one slot
+        step = np.gradient(self.wavelengths)
+        led_spectra = np.stack([np.asarray(spectra[led], dtype=np.float64) for led in self.leds]) * scale[:, None]
+        self.xyz = LUMINOUS_EFFICACY * (colorMatchingFunctions(self.wavelengths) * step) @ led_spectra.T
+        self.lms = XYZ_TO_LMS @ self.xyz
+
+    @classmethod
+    def fromSpectraCSV(cls, path, **kwargs):
+        wavelengths, spectra = loadSpectraCSV(path)
+        return cls(wavelengths, spectra, **kwargs)
+
+    @classmethod
+    def fromDatabase(cls, database, temperature=np.nan, primaries=SIX_PRIMARIES, **kwargs):
+        """Use the full power spectra in a SpectralDatabase closest to the given board temperature"""
+        spectra = {}
+        for led in sorted(set(primaries)):
+            entry = database.nearest(led, temperature=temperature)
+            if entry is not None:
+                spectra[led] = entry.spectrum
+        return cls(database.wavelengths, spectra, primaries, **kwargs)
+
+    def matrix(self, space=LMS):
+        if space == LMS:
+            return self.lms
+        if space == XYZ:
+            return self.xyz
+        raise ValueError(f"Unknown colour space {space} -- use '{LMS}' or '{XYZ}'")
+
+    def drivesToPrimaries(self, drives):
+        """Split each LED's drive evenly over its slots. drives (N, n_leds) -> PWM (N, n_primaries), 0-1"""
+        return (drives / self.max_drive) @ self.slots
+
+    def primariesToDrives(self, pwms):
+        return np.asarray(pwms, dtype=np.float64) @ self.slots.T
+
+    def excitations(self, pwms, space=LMS):
+        """Excitations (N, 3) of PWMs (N, n_primaries), 0-1"""
+        return self.primariesToDrives(pwms) @ self.matrix(space).T
+
+    def luminance(self, pwms):
+        """Luminance (cd/m²)"""
+        return self.excitations(pwms, XYZ)[..., 1]
+
+    def gamut(self, space=LMS):
+        """Excitations of each LED at full drive - columns span the gamut"""
+        return self.matrix(space) * self.max_drive
+
+    def solve(self, targets, space=LMS, tolerance=1e-3, iterations=200):
+        """PWMs that produce each target, for a batch of targets.
+
+        Drives are solved exactly where the LEDs allow (with the LED drives kept as small as possible when there are
+        more LEDs than colour dimensions). Targets outside the gamut get the closest colour that can be shown, found with
+        projected gradient least squares.
+        :param targets: (N, 3) or (3,) excitations in the given space
+        :param tolerance: relative error allowed for a target to count as in gamut
+        :return: (PWM (N, n_primaries) 0-1, in gamut flags (N,))
+        """
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        matrix = self.matrix(space)
+        upper = self.max_drive
+        _, singular, vh = np.linalg.svd(matrix)
+        rank = int(np.sum(singular > singular[0] * 1e-10))
+        drives = targets @ np.linalg.pinv(matrix).T  # Minimum norm exact solution
+
+        if len(self.leds) - rank == 1:
+            # One spare degree of freedom: move along the null space to bring the drives inside their limits
+            null = vh[-1]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                to_zero = -drives / null
+                to_upper = (upper - drives) / null
+            moving = np.abs(null) > 1e-12
+            low = np.where(null > 0, to_zero, to_upper)[:, moving].max(axis=1)
+            high = np.where(null > 0, to_upper, to_zero)[:, moving].min(axis=1)
+            drives += np.clip(0.0, low, high)[:, None] * null
+
+        scale = np.maximum(np.linalg.norm(targets, axis=1), 1e-30)
+        feasible = np.all((drives >= -1e-9) & (drives <= upper + 1e-9), axis=1)
+        drives = np.clip(drives, 0, upper)
+        error = np.linalg.norm(drives @ matrix.T - targets, axis=1) / scale
+        in_gamut = feasible & (error <= tolerance)
+
+        outside = ~in_gamut
+        if np.any(outside):
+            drives[outside] = self._closest(matrix, targets[outside], drives[outside], iterations)
+            error = np.linalg.norm(drives @ matrix.T - targets, axis=1) / scale
+            in_gamut = error <= tolerance
+        return self.drivesToPrimaries(drives), in_gamut
+
+    def _closest(self, matrix, targets, drives, iterations):
+        """Accelerated projected gradient (FISTA) for min ||matrix @ d - t|| with 0 <= d <= max_drive, batched"""
+        normal = matrix.T @ matrix
+        step = 1 / np.linalg.eigvalsh(normal)[-1]
+        rhs = targets @ matrix
+        momentum = drives.copy()
+        t = 1.0
+        for _ in range(iterations):
+            updated = np.clip(momentum - step * (momentum @ normal - rhs), 0, self.max_drive)
+            t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+            momentum = updated + (t - 1) / t_next * (updated - drives)
+            drives, t = updated, t_next
+        return drives
+
+    def solveLuminanceChromaticity(self, luminance, x, y, **kwargs):
+        """PWMs for targets given as luminance (cd/m²) and CIE 1931 xy chromaticity"""
+        luminance, x, y = np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in (luminance, x, y)))
+        xyz = np.stack([x / y * luminance, luminance, (1 - x - y) / y * luminance], axis=-1)
+        return self.solve(xyz.reshape(-1, 3), XYZ, **kwargs)
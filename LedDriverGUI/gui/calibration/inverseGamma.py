@@ -0,0 +1,170 @@
+"""
+Build inverse gamma LUTs from measured gamma curves (Control,Power CSV files written by LUTMeasurement.runGammaCheck),
+so that equal steps in display level give equal steps in optical power.
+
+All LEDs are inverted at once: each curve is resampled with monotone (PCHIP) interpolation at every output code, and
+the code closest to each linear target power is found with a single searchsorted over all curves.
+"""
+import glob
+import os
+import re
+import numpy as np
+import pandas as pd
+
+N_ENTRIES = 256  # Display levels (LUT inputs)
+MAX_CONTROL = 255  # Largest display level in the gamma measurements
+GAMMA_FILE_PATTERN = r"gamma(?:_check)?_(\d+)\.csv$"  # gamma_check_<led>.csv from runGammaCheck, or gamma_<led>.csv
+
+
+def pchipSlopes(x, y):
+    """Fritsch-Carlson derivative estimates, which keep a cubic Hermite interpolant monotone wherever the data is"""
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    slopes = np.zeros_like(y)
+    if len(x) == 2:
+        slopes[:] = delta[0]
+        return slopes
+
+    # Interior points: weighted harmonic mean of the neighbouring secants, zero at local extrema
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same_sign = delta[:-1] * delta[1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interior = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    slopes[1:-1] = np.where(same_sign, interior, 0.0)
+
+    # End points: one-sided three point estimate, limited so the ends stay monotone
+    for end, (h0, h1, d0, d1) in [(0, (h[0], h[1], delta[0], delta[1])), (-1, (h[-1], h[-2], delta[-1], delta[-2]))]:
+        slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        if np.sign(slope) != np.sign(d0):
+            slope = 0.0
+        elif np.sign(d0) != np.sign(d1) and abs(slope) > abs(3 * d0):
+            slope = 3 * d0
+        slopes[end] = slope
+    return slopes
+
+
+def pchip(x, y, x_new):
+    """Evaluate the monotone piecewise cubic Hermite interpolant of (x, y) at x_new"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x_new = np.clip(np.asarray(x_new, dtype=np.float64), x[0], x[-1])
+    slopes = pchipSlopes(x, y)
+    i = np.clip(np.searchsorted(x, x_new, side="right") - 1, 0, len(x) - 2)
+    h = x[i + 1] - x[i]
+    t = (x_new - x[i]) / h
+    t2 = t * t
+    t3 = t2 * t
+    return ((2 * t3 - 3 * t2 + 1) * y[i] + (t3 - 2 * t2 + t) * h * slopes[i]
+            + (-2 * t3 + 3 * t2) * y[i + 1] + (t3 - t2) * h * slopes[i + 1])
+
+
+def validateMonotone(powers, tolerance=0.01, name="curve"):
+    """Check a measured curve increases with control, allowing for measurement noise.
+
+    Drops smaller than tolerance (as a fraction of the curve's range) are treated as noise and flattened out, larger
+    drops raise a ValueError as the curve can't be inverted.
+    :return: the curve with noise flattened out (running maximum)
+    """
+    powers = np.asarray(powers, dtype=np.float64)
+    if len(powers) < 2:
+        raise ValueError(f"{name}: at least two points are needed to invert a gamma curve")
+    span = powers.max() - powers.min()
+    if span <= 0 or powers[-1] <= powers[0]:
+        raise ValueError(f"{name}: power does not increase with control")
+    running_max = np.maximum.accumulate(powers)
+    drops = running_max - powers
+    worst = int(np.argmax(drops))
+    if drops[worst] > tolerance * span:
+        raise ValueError(f"{name}: power drops by {drops[worst] / span:.1%} of its range at point {worst} "
+                         f"(tolerance {tolerance:.1%})")
+    return running_max
+
+
+def loadGammaCurves(directory, pattern=GAMMA_FILE_PATTERN):
+    """Read every gamma curve in a folder. Returns {led: (controls, powers)} sorted by control"""
+    curves = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        match = re.search(pattern, os.path.basename(path))
+        if match is None:
+            continue
+        df = pd.read_csv(path, usecols=["Control", "Power"]).dropna().sort_values("Control")
+        curves[int(match.group(1))] = (df["Control"].to_numpy(dtype=np.float64), df["Power"].to_numpy(dtype=np.float64))
+    return curves
+
+
+def buildInverseLUTs(curves, bits=8, n_entries=N_ENTRIES, max_control=MAX_CONTROL, tolerance=0.01):
+    """Invert measured gamma curves.
+
+    :param curves: {led: (controls, powers)} as returned by loadGammaCurves()
+    :param bits: output resolution - 8 gives display levels 0-255, 16 gives controls scaled to 0-65535
+    :param n_entries: number of LUT inputs
+    :param max_control: control value corresponding to the largest output code
+    :param tolerance: allowed non-monotonic noise, see validateMonotone()
+    :return: (list of LEDs, array of shape (n_leds, n_entries) with the output code for each input)
+    """
+    if bits not in [8, 16]:
+        raise ValueError("Only 8 and 16 bit LUTs are supported")
+    leds = sorted(curves)
+    n_codes = 2 ** bits
+    code_controls = np.arange(n_codes) * max_control / (n_codes - 1)
+
+    # Power at every output code, normalised so each curve runs from 0 to 1
+    resampled = np.empty((len(leds), n_codes))
+    for row, led in enumerate(leds):
+        controls, powers = curves[led]
+        powers = validateMonotone(powers, tolerance, f"LED {led}")
+        curve = np.maximum.accumulate(pchip(controls, powers, code_controls))
+        resampled[row] = (curve - curve[0]) / (curve[-1] - curve[0])
+
+    # Offset each curve so all of them form one sorted array, and search for every LED's targets in one call
+    targets = np.linspace(0, 1, n_entries)
+    offsets = 2 * np.arange(len(leds))[:, None]
+    flat = (resampled + offsets).ravel()
+    upper = np.searchsorted(flat, (targets + offsets).ravel()).reshape(len(leds), n_entries)
+    upper = np.clip(upper - (np.arange(len(leds)) * n_codes)[:, None], 1, n_codes - 1)
+
+    # Pick whichever neighbouring code is closer to the target
+    rows = np.arange(len(leds))[:, None]
+    lower = upper - 1
+    closer_to_lower = (targets - resampled[rows, lower]) <= (resampled[rows, upper] - targets)
+    codes = np.where(closer_to_lower, lower, upper)
+    codes[:, 0] = 0
+    return leds, codes.astype(np.uint8 if bits == 8 else np.uint16)
+
+
+def writeHeader(path, leds, luts, name="inverse_gamma_lut"):
+    """Write the LUTs as a C header, one row per LED"""
+    c_type = "uint8_t" if luts.dtype == np.uint8 else "uint16_t"
+    guard = re.sub(r"\W", "_", os.path.basename(path)).upper()
+    lines = ["// Generated by LedDriverGUI.gui.calibration.inverseGamma - do not edit",
+             f"#ifndef {guard}", f"#define {guard}", "", "#include <stdint.h>", "",
+             f"#define {name.upper()}_LEDS {len(leds)}",
+             f"#define {name.upper()}_SIZE {luts.shape[1]}", "",
+             f"static const {c_type} {name}[{name.upper()}_LEDS][{name.upper()}_SIZE] = {{"]
+    for led, lut in zip(leds, luts):
+        lines += [f"    // LED {led}", "    {"]
+        for start in range(0, len(lut), 16):
+            lines += ["        " + ", ".join(str(value) for value in lut[start:start + 16]) + ","]
+        lines += ["    },"]
+    lines += ["};", "", f"#endif  // {guard}", ""]
+    with open(path, "w") as file:
+        file.write("\n".join(lines))
+
+
+def writeBinary(path, luts):
+    """Write the LUTs as a raw little-endian array, one LED after another"""
+    luts.astype(luts.dtype.newbyteorder("<")).tofile(path)
+
+
+def buildFromDirectory(gamma_directory, output_directory=None, bits=8, name="inverse_gamma_lut", tolerance=0.01):
+    """Invert every gamma curve in gamma_directory and write <name>.h and <name>.bin to output_directory"""
+    curves = loadGammaCurves(gamma_directory)
+    if not curves:
+        raise ValueError(f"No gamma curves found in {gamma_directory}")
+    leds, luts = buildInverseLUTs(curves, bits=bits, tolerance=tolerance)
+    output_directory = gamma_directory if output_directory is None else output_directory
+    os.makedirs(output_directory, exist_ok=True)
+    writeHeader(os.path.join(output_directory, f"{name}.h"), leds, luts, name)
+    writeBinary(os.path.join(output_directory, f"{name}.bin"), luts)
+    return leds, luts
@@ -0,0 +1,67 @@
+"""
+Linearity and bit-plane additivity of a calibrated LUT, from one sweep of display levels per LED.
+
+Each display level is shown as the sum of its bit planes (1, 2, 4, ... 128), each with its own sequence table row, so a
+calibrated LUT is linear in level, and the power of any level should equal the sum of the powers of its bit planes.
+"""
+import numpy as np
+import pandas as pd
+
+N_BITS = 8
+# Dark, every bit plane on its own, and the levels combining all planes below each one (where additivity errors add up)
+SWEEP_LEVELS = sorted(set([0] + [2 ** i for i in range(N_BITS)] + [2 ** i - 1 for i in range(2, N_BITS + 1)]))
+LINEARITY_LIMIT = 0.01  # Largest allowed deviation from the straight line fit, as a fraction of full scale
+ADDITIVITY_LIMIT = 0.01  # Largest allowed difference from the sum of the bit planes, as a fraction of full scale
+
+
+def bitPlanes(levels):
+    """Bit plane matrix of shape (n_levels, N_BITS) - 1 where a plane is on in a level"""
+    return (np.asarray(levels, dtype=np.int64)[:, None] >> np.arange(N_BITS)) & 1
+
+
+def analyzeSweep(levels, powers, leds, linearity_limit=LINEARITY_LIMIT, additivity_limit=ADDITIVITY_LIMIT):
+    """Fit all LEDs at once.
+
+    :param levels: display levels of the sweep, must include 0, 255 and every bit plane
+    :param powers: measured powers, shape (n_leds, n_levels)
+    :param leds: LED of each row of powers
+    :return: DataFrame with one row per LED
+    """
+    levels = np.asarray(levels, dtype=np.int64)
+    powers = np.asarray(powers, dtype=np.float64)
+    index = {level: i for i, level in enumerate(levels)}
+    missing = [level for level in [0, 2 ** N_BITS - 1] + [2 ** b for b in range(N_BITS)] if level not in index]
+    if missing:
+        raise ValueError(f"Sweep is missing levels {missing}")
+
+    dark = powers[:, index[0]]
+    full_scale = powers[:, index[2 ** N_BITS - 1]] - dark
+
+    # Straight line fit of every LED in one least squares solve
+    design = np.stack([levels, np.ones(len(levels))], axis=1)
+    coefficients, *_ = np.linalg.lstsq(design, powers.T, rcond=None)
+    linearity = (powers - (design @ coefficients).T) / full_scale[:, None]
+
+    # Each level predicted as dark plus the dark-subtracted power of each of its bit planes
+    bits = bitPlanes(levels)
+    planes = powers[:, [index[2 ** b] for b in range(N_BITS)]] - dark[:, None]
+    additivity = (powers - dark[:, None] - planes @ bits.T) / full_scale[:, None]
+    composite = bits.sum(axis=1) > 1
+
+    worst_linearity = np.abs(linearity).argmax(axis=1)
+    worst_additivity = np.abs(additivity[:, composite]).argmax(axis=1)
+    report = pd.DataFrame({
+        "LED": leds,
+        "Slope": coefficients[0],
+        "Offset": coefficients[1],
+        "Full Scale": full_scale,
+        "Linearity Error": np.abs(linearity).max(axis=1),
+        "Linearity Worst Level": levels[worst_linearity],
+        "Additivity Error": np.abs(additivity[:, composite]).max(axis=1),
+        "Additivity Worst Level": levels[composite][worst_additivity],
+        "Linearity Limit": linearity_limit,
+        "Additivity Limit": additivity_limit,
+    })
+    report["Pass"] = ((report["Linearity Error"] <= linearity_limit)
+                      & (report["Additivity Error"] <= additivity_limit) & (full_scale > 0))
+    return report
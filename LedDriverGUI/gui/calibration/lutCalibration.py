@@ -12,13 +12,25 @@ from screeninfo import get_monitors
 from simple_pid import PID
 from typing import Union
 
-from ...devices.newport import NewPortWrapper
-from ...devices.PR650 import connect_to_PR650
+from ...devices.instruments import connectPowerMeter, connectSpectroradiometer, SIMULATED
+from ...devices.simulator import SimulatedProjector
 from .. import guiSequence as seq
-from ..windows.calibrationSelection import promptForLUTSaveFile, promptForLUTStartingValues, promptForLEDList, FullscreenWindow, PlotMonitor, promptForFolderSelection
-from ..utils.sequenceFiles import createRGOBGOFiles, createAllOnSingleLED, readOutStartingPoints
+from .. import guiConfigIO as fileIO
+from ..windows.calibrationSelection import promptForLUTSaveFile, promptForLUTStartingValues, promptForLEDList, FullscreenWindow, PlotMonitor, promptForFolderSelection, promptForRemeasure
+from ..utils.sequenceFiles import createRGOBGOFiles, createAllOnSingleLED
+from .lutModel import LUTModel
+from .settleDetector import SettleDetector
+from .rootFinder import IllinoisSolver, warmStart
+from .acquisitionScheduler import AcquisitionScheduler
+from .calibrationJournal import CalibrationJournal
+from .spectralDatabase import SpectralDatabase
+from .linearityCheck import analyzeSweep, SWEEP_LEVELS, LINEARITY_LIMIT, ADDITIVITY_LIMIT
 
 ROOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "measurements")
+DISPLAY_LATENCY = 0.1  # Minimum time (s) before a new background color can show up on the power meter
+UPLOAD_LATENCY = 0.5  # Minimum time (s) before an uploaded sequence table can show up on the power meter
+LUT_JOURNAL = "lut-calibration-journal.jsonl"
+GAMMA_JOURNAL = "gamma-check-journal.jsonl"
 
 
 class LUTMeasurement(QThread):
@@ -26,16 +38,41 @@ class LUTMeasurement(QThread):
     data_generated = pyqtSignal(float, float, float, float, float)
     reset_plot_signal = pyqtSignal()
     send_seq_table = pyqtSignal(str, str)
+    send_seq_rows = pyqtSignal(object, object)
 
     def __init__(self, gui, lut_directory: Union[str, None],
                  gamma_directory: Union[str, None] = None,
                  peak_spectra_directory: Union[str, None] = None,
                  starting_pwms=[0.8, 0.8, 0.8, 0.8], starting_currents=[1.0, 1.0, 1.0, 1.0],
                  sleep_time=3, wavelength=660,
-                 threshold=0.001, debug=False):
+                 threshold=0.001, solver="illinois", power_meter="newport", spectroradiometer="pr650",
+                 spectral_power=False, spectral_database=None, read_temperature=None, remeasure=False, resume=True,
+                 debug=False):
+        """
+        :param power_meter: power meter backend, see devices.instruments.POWER_METERS
+        :param spectroradiometer: spectroradiometer backend, see devices.instruments.SPECTRORADIOMETERS
+        :param spectral_power: also measure radiometric power with the power meter during spectral measurements
+        :param spectral_database: folder of a SpectralDatabase - spectral measurements are stored there, and LEDs with a
+            recent spectrum at the same temperature (and power, with spectral_power) are not measured again - without a
+            power meter only if the board temperature is known, as it is then the only drift check
+        :param read_temperature: function returning the board temperature (°C) to store with spectra, if known
+        :param remeasure: measure every LED even if the database holds a spectrum that is still valid
+        :param resume: continue an interrupted LUT calibration or gamma check from its journal instead of starting over
+        :param debug: measure a simulated projector instead of the real instruments
+        """
         super().__init__()
         self.gui = gui
         self.debug = debug
+        if solver not in ["illinois", "pid"]:
+            raise ValueError(f"Unknown solver {solver} -- use 'illinois' or 'pid'")
+        self.solver = solver
+        self.iterations = {}  # Number of upload+measure cycles per (led, level) of the last calibration run
+        self.resume = resume
+        self.journal = None  # CalibrationJournal of the running routine, if it can be resumed
+        self.zero_values = {}  # Power meter zero offset (µW) of the last zeroing, per LED
+        self.spectral_database = SpectralDatabase(spectral_database) if spectral_database is not None else None
+        self.read_temperature = read_temperature
+        self.remeasure = remeasure
 
         levels = [2**i for i in range(8)]
         levels.reverse()
@@ -66,38 +103,58 @@ class LUTMeasurement(QThread):
         if not os.path.exists(self.lut_rgo_path) or not os.path.exists(self.lut_bgo_path):
             createRGOBGOFiles([self.lut_rgo_path, self.lut_bgo_path], starting_pwms, starting_currents)
 
-        self.start_control_points = readOutStartingPoints([self.lut_rgo_path, self.lut_bgo_path])
+        # The LUT is edited in memory during calibration and only written back to the CSV files at checkpoints
+        self.lut = LUTModel(self.lut_rgo_path, self.lut_bgo_path)
+        self.start_control_points = self.lut.startingPoints()
 
         # alternate file paths for different routines.
         self.gamma_directory = gamma_directory
         self.peak_spectra_directory = peak_spectra_directory
         # configure measurement
         self.measurement_wavelength = wavelength
+        if debug:
+            power_meter = spectroradiometer = SIMULATED
+        # Simulated instruments measure a model of the projector, which is updated with every color and table change
+        self.simulation = None
+        if SIMULATED in [power_meter, spectroradiometer]:
+            self.simulation = SimulatedProjector()
+
+        def instrumentArgs(backend):
+            # Only the simulated backends take the projector model - a real instrument alongside one doesn't
+            return {"projector": self.simulation} if backend == SIMULATED else {}
+
+        self.pr650 = None
+        self.instrum = None
+        self.settle_detector = None
         if peak_spectra_directory:
-            self.pr650 = connect_to_PR650()
-        else:
-            self.instrum = NewPortWrapper()
+            self.pr650 = connectSpectroradiometer(spectroradiometer, **instrumentArgs(spectroradiometer))
+        if not peak_spectra_directory or spectral_power:
+            self.instrum = connectPowerMeter(power_meter, **instrumentArgs(power_meter))
+            self.settle_detector = SettleDetector(self.instrum.readPower, min_dwell=DISPLAY_LATENCY)
+
+    def waitForSettle(self, timeout, min_time=0.0):
+        """Wait until the power meter reading is stable, or for the full timeout if there is no power meter to read."""
+        if self.settle_detector is None:
+            time.sleep(timeout)
+            return
+        self.settle_detector.wait(timeout, min_time)
+
+    def reportSettleTime(self):
+        if self.settle_detector is not None:
+            print(self.settle_detector.report())
+
+    def boardTemperature(self):
+        return self.read_temperature() if self.read_temperature is not None else np.nan
 
     def setBackgroundColor(self, color):
         self.display_color.emit(QColor(color[0], color[1], color[2]))
-        time.sleep(self.sleep_time)
+        if self.simulation is not None:
+            self.simulation.setBackgroundColor(color)
+        self.waitForSettle(self.sleep_time, DISPLAY_LATENCY)
 
     def editSequenceFile(self, led, level, pwm, current=None):
-        # convert led and level into a row number
-        for seq_file in [self.lut_rgo_path, self.lut_bgo_path]:
-            if led == 0 and seq_file == self.lut_rgo_path:  # blue LED,
-                continue
-            if led == 3 and seq_file == self.lut_bgo_path:  # red LED, ignore BGO
-                continue
-            row_number = 3 * level + (led % 3)  # make sure it's between [0, 1, 2]
-            df = pd.read_csv(seq_file)
-            # Edit a specific cell by row and column indices
-            df.loc[row_number, 'LED PWM (%)'] = pwm * 100  # Modify the value at a specific cell
-            if current is not None:
-                df.loc[row_number, 'LED current (%)'] = current * 100  # Modify the value at a specific cell
-
-            # Save the updated DataFrame back to CSV
-            df.to_csv(seq_file, index=False)
+        # Only the in-memory LUT is edited - call self.lut.checkpoint() to write it back to the sequence files
+        self.lut.set(led, level, pwm, current)
 
     def readOutSequenceFile(self, seq_file):
         df = pd.read_csv(seq_file)
@@ -118,29 +175,36 @@ class LUTMeasurement(QThread):
 
     def setTableToMode(self, led=None, filename=None):
         if filename is not None:
-            self.send_seq_table.emit(self.lut_rgo_path, self.lut_bgo_path)
-            time.sleep(self.sleep_time)
+            self.send_seq_table.emit(filename, filename)
+            if self.simulation is not None:
+                self.simulation.loadSequenceFiles(filename, filename)
+            self.waitForSettle(self.sleep_time, UPLOAD_LATENCY)
             return
 
+        rgo_rows = self.lut.rows(0)
+        bgo_rows = self.lut.rows(1)
         if led in [1, 2]:  # G or O
-            self.send_seq_table.emit(self.lut_rgo_path, self.lut_bgo_path)
+            rows = [rgo_rows, bgo_rows]
         elif led == 0:  # Blue
-            self.send_seq_table.emit(self.lut_bgo_path, self.lut_bgo_path)
+            rows = [bgo_rows, bgo_rows]
         elif led == 3:  # Red
-            self.send_seq_table.emit(self.lut_rgo_path, self.lut_rgo_path)
+            rows = [rgo_rows, rgo_rows]
         else:
             raise ValueError("LED not in range 0-3 -- This setup only calibrates RGO/BGO setup")
+        self.send_seq_rows.emit(*rows)
+        if self.simulation is not None:
+            self.simulation.setSequence(*rows)
 
-        time.sleep(self.sleep_time)
+        self.waitForSettle(self.sleep_time, UPLOAD_LATENCY)
 
     def zeroBackground(self, led):
         self.setBackgroundColor([0, 0, 0])
-        if not self.debug:
-            self.instrum.setInstrumWavelength(self.four_led_peaks[led])
-            self.setTableToMode(led=led)
-            time.sleep(self.sleep_time * 2)
-            self.instrum.zeroPowerMeter()
-            time.sleep(self.sleep_time)
+        self.instrum.setInstrumWavelength(self.four_led_peaks[led])
+        self.setTableToMode(led=led)
+        self.waitForSettle(self.sleep_time * 2)
+        self.instrum.zeroPowerMeter()
+        self.waitForSettle(self.sleep_time, DISPLAY_LATENCY)
+        self.zero_values[led] = self.instrum.zeroValue()
 
     def measureLevel(self, leds, level):
         powers = []
@@ -151,10 +215,8 @@ class LUTMeasurement(QThread):
 
             color = [0, 0, 0]
             color[led % 3] = level
-            self.setBackgroundColor(color)
-            time.sleep(self.sleep_time)
-            powers += [self.instrum.measurePowerAndStd() if not self.debug else 0.1]
-            time.sleep(self.sleep_time)  # need to sleep as measurePower has no automatic sleep
+            self.setBackgroundColor(color)  # waits for the signal to settle
+            powers += [self.instrum.measurePowerAndStd()]
 
         return powers
 
@@ -162,68 +224,137 @@ class LUTMeasurement(QThread):
         self.data_generated.emit(elapsed_time, power, control, power, target)
 
     def runCalibration(self, skip_level=128):
+        self.iterations = {}
         for led_idx, led in enumerate(self.led_list):
+            # (control, power, level) of levels with a known result, used to warm start the solver for the next level
+            solved_levels = []
+            if skip_level in self.levels:
+                skip_idx = self.levels.index(skip_level)
+                solved_levels += [(self.start_control_vals[led_idx][skip_idx], self.set_points[led_idx][skip_idx],
+                                   skip_level)]
+
+            # Levels finished by an interrupted run are restored from the journal instead of being measured again
+            journaled = {}
+            if self.journal is not None:
+                journaled = {level: self.journal.last("level", led=led, level=level) for level in self.levels}
+                journaled = {level: entry for level, entry in journaled.items() if entry is not None}
+            for level, entry in journaled.items():
+                self.editSequenceFile(led, entry["level_idx"], entry["control"], 1)
+                solved_levels += [(entry["control"], entry["power"], level)]
+            if journaled:
+                print(f"LED {led}: restored levels {list(journaled)} from the calibration journal")
+                self.lut.checkpoint()
+            if all(level in journaled for level in self.levels if level != skip_level):
+                continue
+
             self.setTableToMode(led)
             self.zeroBackground(led)
 
-            if not self.debug:
-                self.instrum.setInstrumWavelength(self.four_led_peaks[led])
-            last_control = 0.0
+            self.instrum.setInstrumWavelength(self.four_led_peaks[led])
+
             for level_idx, level in enumerate(self.levels):
                 if level == skip_level:  # skip the mask we're using to set the setpoints
                     continue
+                if level in journaled:
+                    continue
 
                 # set background color to the level we're measuring
                 color = [0, 0, 0]
                 color[led % 3] = level
                 self.setBackgroundColor(color)
 
-                # setup PID for this mask
                 set_point = self.set_points[led_idx][level_idx]
                 starting_control = self.start_control_vals[led_idx][level_idx]
-                pid_offset = 6 if level >= 16 else 3 # because the pid setpoint is not binary scaled anymore
-                pid = PID(0.000139, 0.2 * 2**(level_idx + pid_offset), 0.000000052, setpoint=set_point,
-                          sample_time=None, starting_output=starting_control)
-                # pid = PID(0.000139, 16, 0.000000052, setpoint=1,
-                #           sample_time=None, starting_output=starting_control)
-                pid.output_limits = (0, 1)
+                # threshold = self.threshold
+                threshold = self.threshold / 4 if level < 16 else self.threshold
 
                 self.reset_plot_signal.emit()
-
-                start_time = time.time()
-                # send sequence to device, and then measure
-                self.sendUpdatedSeqTable(led, level_idx, starting_control, 1)
-                power = self.instrum.measurePowerAndStd() if not self.debug else 0.1
-                time.sleep(0.1)
-
-                itr = 0
-                while True:
-                    control = pid(power, dt=0.01) # normalize based on set point
-                    # send the sequence to the device & measure
-                    self.sendUpdatedSeqTable(led, level_idx, control, 1)
-                    power = self.instrum.measurePowerAndStd() if not self.debug else 0.1
-                    time.sleep(0.2)
-
-                    print(led, level, control, power, set_point)
-
-                    # write the data out to a file
-                    elapsed_time = time.time() - start_time
-                    self.plotPidData(elapsed_time, power, control, set_point)
-
-                    itr = itr + 1
-                    # threshold = self.threshold
-                    threshold = self.threshold / 4 if level < 16 else self.threshold
-                    if abs(power - pid.setpoint) < threshold and (power-pid.setpoint) > 0:  # always finetune to the positive value
-                        # logging.info(f'Gamma calibration for led {led} level {level} complete - Control: {control} Power: {power}')
-                        print("Control is stable. Breaking and Moving onto next bitmask")
-                        break
-
-                    if abs(control - last_control) <= float(1/65535 * 2) and itr > 10:  # less than 8 bit precision
-                        # logging.info(f'Gamma calibration for led {led} level {level} did not finish - Control: {control}, Power: {power}')
-                        print("Control is not within bit precision. Breaking and Moving onto Next Bit Mask")
-                        break
-
-                    last_control = control
+                if self.solver == "pid":
+                    control, power, itr = self.calibrateLevelPid(led, level, level_idx, set_point, starting_control,
+                                                                 threshold)
+                else:
+                    starting_control = warmStart(set_point, level, solved_levels, starting_control)
+                    control, power, itr = self.calibrateLevelSolver(led, level, level_idx, set_point, starting_control,
+                                                                    threshold)
+                solved_levels += [(control, power, level)]
+                self.iterations[(led, level)] = itr
+                print(f"LED {led} level {level}: {itr} iterations, control {control}, power {power}")
+                if self.journal is not None:
+                    self.journal.record("level", led=led, level=level, level_idx=level_idx, control=control,
+                                        power=power, set_point=set_point, zero=self.zero_values.get(led),
+                                        iterations=itr)
+
+                # Level is done - save the LUT in the background without blocking the next level
+                self.lut.checkpoint()
+        self.lut.flush()
+        if self.iterations:
+            print(f"{self.solver} solver: {sum(self.iterations.values())} iterations for {len(self.iterations)} levels")
+        self.reportSettleTime()
+
+    def calibrateLevelSolver(self, led, level, level_idx, set_point, starting_control, threshold):
+        """Find the control value for a level with a bracketing root finder. Returns (control, power, iterations)"""
+        solver = IllinoisSolver(set_point, threshold, starting_control)
+        start_time = time.time()
+        while not solver.done:
+            control = solver.next_control
+            # send the sequence to the device & measure
+            self.sendUpdatedSeqTable(led, level_idx, control, 1)
+            power = self.instrum.measurePowerAndStd()
+            print(led, level, control, power, set_point)
+            self.plotPidData(time.time() - start_time, power, control, set_point)
+            solver.update(control, power)
+
+        if solver.converged:
+            print("Control is stable. Moving onto next bitmask")
+        else:
+            print("Control did not reach the set point. Moving onto next bitmask")
+        # The solver may finish on an earlier measurement than the last one, so make sure that's what ends up in the LUT
+        self.editSequenceFile(led, level_idx, solver.control, 1)
+        return solver.control, solver.power, solver.iterations
+
+    def calibrateLevelPid(self, led, level, level_idx, set_point, starting_control, threshold):
+        """Find the control value for a level with a PID loop. Returns (control, power, iterations)"""
+        pid_offset = 6 if level >= 16 else 3 # because the pid setpoint is not binary scaled anymore
+        pid = PID(0.000139, 0.2 * 2**(level_idx + pid_offset), 0.000000052, setpoint=set_point,
+                  sample_time=None, starting_output=starting_control)
+        # pid = PID(0.000139, 16, 0.000000052, setpoint=1,
+        #           sample_time=None, starting_output=starting_control)
+        pid.output_limits = (0, 1)
+
+        start_time = time.time()
+        # send sequence to device, and then measure
+        self.sendUpdatedSeqTable(led, level_idx, starting_control, 1)
+        power = self.instrum.measurePowerAndStd()
+        time.sleep(0.1)
+
+        itr = 0
+        last_control = 0.0
+        while True:
+            control = pid(power, dt=0.01) # normalize based on set point
+            # send the sequence to the device & measure
+            self.sendUpdatedSeqTable(led, level_idx, control, 1)
+            power = self.instrum.measurePowerAndStd()
+            time.sleep(0.2)
+
+            print(led, level, control, power, set_point)
+
+            # write the data out to a file
+            elapsed_time = time.time() - start_time
+            self.plotPidData(elapsed_time, power, control, set_point)
+
+            itr = itr + 1
+            if abs(power - pid.setpoint) < threshold and (power-pid.setpoint) > 0:  # always finetune to the positive value
+                # logging.info(f'Gamma calibration for led {led} level {level} complete - Control: {control} Power: {power}')
+                print("Control is stable. Breaking and Moving onto next bitmask")
+                break
+
+            if abs(control - last_control) <= float(1/65535 * 2) and itr > 10:  # less than 8 bit precision
+                # logging.info(f'Gamma calibration for led {led} level {level} did not finish - Control: {control}, Power: {power}')
+                print("Control is not within bit precision. Breaking and Moving onto Next Bit Mask")
+                break
+
+            last_control = control
+        return control, power, itr + 1  # count the initial measurement too
 
     def checkGammaDirectory(self):
         if self.gamma_directory is None:
@@ -233,62 +364,82 @@ class LUTMeasurement(QThread):
         os.makedirs(self.gamma_directory, exist_ok=True)
 
     def runGammaCheck(self):
+        self.led_list = self.four_leds
         self.checkGammaDirectory()
+        self.journal = CalibrationJournal(os.path.join(self.gamma_directory, GAMMA_JOURNAL), self.resume)
+        controls = list(range(0, 256, 5))
         for led_idx, led in enumerate(self.led_list):
-            self.setTableToMode(led)
+            # Points measured by an interrupted run are restored from the journal, and only the rest are measured
+            measured = {entry["control"]: entry["power"] for entry in self.journal.find("gamma", led=led)}
             gamma_check_power_filename = os.path.join(self.gamma_directory, f'gamma_check_{led}.csv')
             with open(gamma_check_power_filename, 'w') as file:
                 file.write('Control,Power\n')
-            self.zeroBackground(led)
+                for i in controls:
+                    if i in measured:
+                        file.write(f'{i},{measured[i]},\n')
+            if all(i in measured for i in controls):
+                continue
 
-            if not self.debug:
-                self.instrum.setInstrumWavelength(self.four_led_peaks[led_idx])
-            last_control = 0
-            for i in range(0, 256, 5):
+            self.zeroBackground(led)  # uploads the LED's table and sets the meter wavelength
+            for i in controls:
+                if i in measured:
+                    continue
                 # set background color to the level we're measuring
                 color = [0, 0, 0]
                 color[led % 3] = i
                 self.setBackgroundColor(color)
 
-                power = self.instrum.measurePowerAndStd() if not self.debug else 0.1
+                power = self.instrum.measurePowerAndStd()
                 with open(gamma_check_power_filename, 'a') as file:
                     file.write(f'{i},{power},\n')
+                self.journal.record("gamma", led=led, control=i, power=power, zero=self.zero_values.get(led))
                 print(f"Led: {led}, color: {color}, power: {power}")
-                time.sleep(0.5)
+        self.journal.complete()
+        self.journal = None
+        self.reportSettleTime()
         return
 
-    def runLUTCheck(self):
-        self.led_list = self.four_leds
-        lut_checks = [[2 ** i - 1, 2**i] for i in range(1, 8)]
-        lut_checks = [item for sublist in lut_checks for item in sublist]
+    def runLUTCheck(self, levels=None, linearity_limit=LINEARITY_LIMIT, additivity_limit=ADDITIVITY_LIMIT):
+        """Check the LUT is linear and its bit planes add up.
 
+        Each LED's table is uploaded and the meter zeroed once, then every level is measured back to back (each waiting
+        only until the reading settles). All LEDs are fitted together and the results written to one report.
+        """
+        self.led_list = self.four_leds
+        levels = SWEEP_LEVELS if levels is None else levels
         self.checkGammaDirectory()
-        for led_idx, led in enumerate(self.led_list):
-            gamma_check_power_filename = os.path.join(self.gamma_directory, f'gamma_subset_{led}.csv')
-            with open(gamma_check_power_filename, 'w') as file:
-                file.write('Control,Power\n')
-            self.zeroBackground(led)
 
-            if not self.debug:
-                self.instrum.setInstrumWavelength(self.four_led_peaks[led])
-            last_control = 0
-
-            for i in lut_checks:
-                # set background color to the level we're measuring
+        powers = np.full((len(self.led_list), len(levels)), np.nan)
+        for row, led in enumerate(self.led_list):
+            self.zeroBackground(led)  # uploads the LED's table and sets the meter wavelength
+            for col, level in enumerate(levels):
                 color = [0, 0, 0]
-                color[led % 3] = i
+                color[led % 3] = level
                 self.setBackgroundColor(color)
+                powers[row, col] = self.instrum.measurePowerAndStd()
+                print(f"Led: {led}, color: {color}, power: {powers[row, col]}")
 
-                power = self.instrum.measurePowerAndStd() if not self.debug else 0.1
-                with open(gamma_check_power_filename, 'a') as file:
-                    file.write(f'{i},{power},\n')
-                print(f"Led: {led}, color: {color}, power: {power}")
-                time.sleep(0.5)
-        return
+            sweep = pd.DataFrame({'Control': levels, 'Power': powers[row]})
+            sweep.to_csv(os.path.join(self.gamma_directory, f'gamma_subset_{led}.csv'), index=False)
+
+        report = analyzeSweep(levels, powers, self.led_list, linearity_limit, additivity_limit)
+        report.to_csv(os.path.join(self.gamma_directory, 'lut-check-report.csv'), index=False)
+        print(report.to_string(index=False))
+        self.reportSettleTime()
+        return report
 
     def runLutCalibration(self, level_set=16):
         led_list = [3] # self.four_leds  # BGOR
-        max_powers = self.measureLevel(led_list, level_set)
+        self.journal = CalibrationJournal(os.path.join(self.lut_directory, LUT_JOURNAL), self.resume)
+        journaled = [self.journal.last("max_power", led=led, level=level_set) for led in led_list]
+        if all(entry is not None for entry in journaled):
+            max_powers = [entry["power"] for entry in journaled]
+            print("Restored max powers from the calibration journal")
+        else:
+            max_powers = self.measureLevel(led_list, level_set)
+            for led, power in zip(led_list, max_powers):
+                self.journal.record("max_power", led=led, level=level_set, power=power,
+                                    zero=self.zero_values.get(led))
         path_name = os.path.join(self.lut_directory, 'max-powers.npy')
         np.save(path_name, max_powers)
         print(max_powers)
@@ -299,6 +450,8 @@ class LUTMeasurement(QThread):
         actual_start_points = [self.start_control_points[i] for i in led_list]
         self.setCalibrationParams(led_list, set_points, actual_start_points)
         self.runCalibration(skip_level=level_set)
+        self.journal.complete()
+        self.journal = None
 
     def runSpectralMeasurement(self, led_list=None):
         if led_list is None:
@@ -311,27 +464,82 @@ class LUTMeasurement(QThread):
 
         self.tmp_seq_file = self.peak_spectra_directory + '/tmp_seq.csv'
 
-        df_spectrums = pd.DataFrame()
-        df_luminances = pd.DataFrame()
-        spectrums = []
-        for led_idx, led in enumerate(led_list):
+        if self.instrum is not None:
+            self.zeroBackground(led_list[0])
+        scheduler = AcquisitionScheduler(self.instrum, self.pr650)
+        start_time = time.perf_counter()
+        acquisitions = []
+        cached = {}  # LEDs whose stored spectrum is still valid
+        temperature = self.boardTemperature()
+        pending = None
+        for led in led_list:
+            # Without a power meter the temperature is the only drift check, so spectra aren't reused if it's unknown
+            if self.spectral_database is not None and not self.remeasure and self.instrum is None \
+                    and not np.isnan(temperature) \
+                    and not self.spectral_database.needsRemeasure(led, temperature=temperature):
+                cached[led] = self.spectral_database.nearest(led, temperature=temperature)
+                print(f"Reusing {cached[led]}")
+                continue
             print(f"Attempting to Measure LED {led}")
-            createAllOnSingleLED(self.tmp_seq_file, 1.0, 1.0, led)  # full power
+            if pending is not None:
+                # The previous LED's data is read back from the instruments while this LED's table is uploaded
+                pending.waitIntegrated()
+            createAllOnSingleLED(self.tmp_seq_file, 1.0, 1.0, led + 1)  # full power, LED # is 1-based
             self.setTableToMode(filename=self.tmp_seq_file)
             # measure the first channel only
             self.setBackgroundColor([255, 0, 0])
-            spectrum, luminance = self.pr650.measureSpectrum()
-            spectrums += [spectrum[1]]
-            if led_idx == 0:
-                df_spectrums['wavelength'] = spectrum[0]
-            df_spectrums[f'LED {led}'] = spectrum[1]
-            df_luminances[f'LED {led}'] = [luminance]
+            if pending is not None:
+                acquisitions += [pending.result()]
+                pending = None
+            if self.instrum is not None:
+                self.instrum.setInstrumWavelength(self.four_led_peaks[led])
+                if self.spectral_database is not None and not self.remeasure:
+                    # A power reading is much quicker than a spectrum, and shows whether the stored one has drifted
+                    power = self.instrum.measurePowerAndStd()
+                    if not self.spectral_database.needsRemeasure(led, temperature=temperature, power=power):
+                        cached[led] = self.spectral_database.nearest(led, temperature=temperature)
+                        print(f"Reusing {cached[led]}, power {power} µW")
+                        continue
+            pending = scheduler.start(label=led)
+        if pending is not None:
+            acquisitions += [pending.result()]
 
-            print(spectrum[1])
-            print(luminance)
+        df_spectrums = pd.DataFrame()
+        df_luminances = pd.DataFrame()
+        df_acquisitions = pd.DataFrame(columns=['LED', 'Time (s)', 'Luminance', 'Power', 'Skew (s)', 'OK'])
+        for acquisition in acquisitions:
+            led = acquisition.label
+            result = acquisition.spectrum
+            df_acquisitions.loc[len(df_acquisitions)] = [led, acquisition.time - start_time, acquisition.luminance,
+                                                         acquisition.power, acquisition.skew, acquisition.ok]
+            if result.spectrum is None:
+                print(f"LED {led} measurement failed: {result.error}")
+                continue
+            if not result.ok:
+                print(f"LED {led} measurement quality: {result.error}")
+            df_spectrums['wavelength'] = result.wavelengths
+            df_spectrums[f'LED {led}'] = result.spectrum
+            df_luminances[f'LED {led}'] = [result.luminance]
+
+            print(f"LED {led} luminance: {result.luminance} cd/m², peak at {result.wavelengths[result.spectrum.argmax()]} nm"
+                  + (f", power: {acquisition.power} µW" if acquisition.power is not None else ""))
+            if self.spectral_database is not None and result.ok:
+                power = acquisition.power if acquisition.power is not None else np.nan
+                self.spectral_database.add(led, 1.0, 1.0, result.wavelengths, result.spectrum, result.luminance,
+                                           temperature, power, save=False)
+
+        for led, entry in cached.items():
+            df_spectrums['wavelength'] = entry.wavelengths
+            df_spectrums[f'LED {led}'] = entry.spectrum
+            df_luminances[f'LED {led}'] = [entry.luminance]
+        if self.spectral_database is not None:
+            self.spectral_database.save()
 
         df_spectrums.to_csv(os.path.join(self.peak_spectra_directory, 'spectrums.csv'), index=False)
         df_luminances.to_csv(os.path.join(self.peak_spectra_directory, 'luminances.csv'), index=False)
+        df_acquisitions.to_csv(os.path.join(self.peak_spectra_directory, 'acquisitions.csv'), index=False)
+        print(f"Spectral measurement took {time.perf_counter() - start_time:.1f} s")
+        self.reportSettleTime()
 
         return
 
@@ -363,6 +571,13 @@ class ConfigurationFile:
         self.gui.ser.uploadSyncConfiguration()
         self.gui.syncDisableMain()
 
+    def uploadRows(self, seq_rows1, seq_rows2):
+        self.gui.syncDisableMain()
+        seq.loadSequenceRows(self.gui, self.gui.sync_digital_low_sequence_table, seq_rows1)  # load the sequence
+        seq.loadSequenceRows(self.gui, self.gui.sync_digital_high_sequence_table, seq_rows2)  # load the sequence
+        self.gui.ser.uploadSyncConfiguration()
+        self.gui.syncDisableMain()
+
 
 def runLUTCalibration(gui):
     folder_name = promptForFolderSelection("Select LUT Folder", os.path.join(ROOT_DIR, 'sequence-tables'), 'LUT')
@@ -381,6 +596,7 @@ def runLUTCalibration(gui):
 
     thread = QThread()
     calibpid.send_seq_table.connect(gui.config.uploadConfig)
+    calibpid.send_seq_rows.connect(gui.config.uploadRows)
     calibpid.display_color.connect(calibration_window.change_background_color)
     calibpid.data_generated.connect(gui.plotting_window.update_both_plots)
     calibpid.reset_plot_signal.connect(gui.plotting_window.reset_plots)
@@ -419,6 +635,7 @@ def runLUTCheck(gui):
 
     thread = QThread()
     calibpid.send_seq_table.connect(gui.config.uploadConfig)
+    calibpid.send_seq_rows.connect(gui.config.uploadRows)
     calibpid.display_color.connect(calibration_window.change_background_color)
     calibpid.data_generated.connect(gui.plotting_window.update_both_plots)
     calibpid.reset_plot_signal.connect(gui.plotting_window.reset_plots)
@@ -456,6 +673,7 @@ def runGammaCheck(gui):
 
     thread = QThread()
     calibpid.send_seq_table.connect(gui.config.uploadConfig)
+    calibpid.send_seq_rows.connect(gui.config.uploadRows)
     calibpid.display_color.connect(calibration_window.change_background_color)
     calibpid.data_generated.connect(gui.plotting_window.update_both_plots)
     calibpid.reset_plot_signal.connect(gui.plotting_window.reset_plots)
@@ -477,6 +695,14 @@ def runGammaCheck(gui):
     thread.start()
 
 
+def driverTemperature(gui):
+    """Mean temperature (°C) of the connected driver boards from the last status update, NaN if none is known"""
+    adc = np.array([gui.status_dict["Temperature" + str(board)] for board in range(1, gui.nBoards() + 1)])
+    temperature = np.asarray(fileIO.adcToTemp(adc, False), dtype=np.float64)
+    temperature = temperature[temperature > -30]  # Disconnected thermistors read -1000
+    return float(temperature.mean()) if len(temperature) else np.nan
+
+
 def runSpectralMeasurement(gui):
     lut_folder_name = promptForFolderSelection("Select LUT Folder", os.path.join(ROOT_DIR, 'sequence-tables'), 'LUT')
     folder_name = promptForFolderSelection(
@@ -485,7 +711,10 @@ def runSpectralMeasurement(gui):
     calibration_window = gui.calibration_window
 
     # calibpid is the worker
-    gui.calibpid = LUTMeasurement(gui, lut_folder_name, peak_spectra_directory=folder_name, sleep_time=2)
+    remeasure = promptForRemeasure()
+    gui.calibpid = LUTMeasurement(gui, lut_folder_name, peak_spectra_directory=folder_name, sleep_time=2,
+                                  spectral_database=os.path.join(ROOT_DIR, 'spectral-database'),
+                                  read_temperature=lambda: driverTemperature(gui), remeasure=remeasure)
     calibpid = gui.calibpid
 
     # needed to send the sequence table to the device on the main thread
@@ -496,6 +725,7 @@ def runSpectralMeasurement(gui):
 
     thread = QThread()
     calibpid.send_seq_table.connect(gui.config.uploadConfig)
+    calibpid.send_seq_rows.connect(gui.config.uploadRows)
     calibpid.display_color.connect(calibration_window.change_background_color)
     calibpid.data_generated.connect(gui.plotting_window.update_both_plots)
     calibpid.reset_plot_signal.connect(gui.plotting_window.reset_plots)
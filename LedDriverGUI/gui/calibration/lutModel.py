@@ -0,0 +1,85 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from ..utils.sequenceFiles import RGO_MAPPING, BGO_MAPPING
+
+N_LEVELS = 8  # Number of bit-plane levels (sequence rows per LED) in the LUT
+N_LEDS = 4  # B G O R
+PWM = 0  # Index of the PWM value in the last axis of LUTModel.values
+CURRENT = 1  # Index of the current value in the last axis of LUTModel.values
+SEQ_HEADER = "LED #,LED PWM (%),LED current (%),Duration (s)\n"
+
+
+class LUTModel:
+    """In-memory copy of the RGO/BGO sequence table LUT used during calibration.
+
+    Values are fractions (0.0 to 1.0) stored in an array indexed [led, level, PWM/CURRENT], with LEDs in BGOR order and
+    levels in sequence file row order. The CSV files are only touched by load(), checkpoint() and save(), so a calibration
+    loop can edit the LUT and upload it to the driver on every iteration without any file I/O.
+    """
+
+    def __init__(self, rgo_path, bgo_path):
+        self.paths = [rgo_path, bgo_path]
+        self.mappings = [RGO_MAPPING, BGO_MAPPING]
+        self.values = np.ones((N_LEDS, N_LEVELS, 2))
+        self.durations = np.ones(N_LEVELS)  # Duration (s) of each bit-plane level in the sequence
+        self._writer = ThreadPoolExecutor(max_workers=1)  # Single worker so checkpoints are written in order
+        self._pending = []
+        self.load()
+
+    def load(self):
+        # Load BGO first so G and O values are taken from RGO, matching readOutStartingPoints()
+        for path, mapping in reversed(list(zip(self.paths, self.mappings))):
+            table = pd.read_csv(path, skipinitialspace=True).to_numpy(dtype=np.float64)
+            for level in range(N_LEVELS):
+                for i, led_number in enumerate(mapping):
+                    row = table[3 * level + i]
+                    self.values[led_number - 1, level, PWM] = row[1] / 100
+                    self.values[led_number - 1, level, CURRENT] = row[2] / 100
+                    self.durations[level] = row[3]
+
+    def set(self, led, level, pwm, current=None):
+        self.values[led, level, PWM] = pwm
+        if current is not None:
+            self.values[led, level, CURRENT] = current
+
+    def startingPoints(self) -> List[List[float]]:
+        """PWM values per LED (BGOR) and level, in the same format as readOutStartingPoints()."""
+        return self.values[:, :, PWM].tolist()
+
+    def rows(self, table):
+        """Sequence rows ([LED #, PWM %, current %, duration s]) of the RGO (0) or BGO (1) table."""
+        mapping = self.mappings[table]
+        return [[led_number, float(self.values[led_number - 1, level, PWM] * 100),
+                 float(self.values[led_number - 1, level, CURRENT] * 100), float(self.durations[level])]
+                for level in range(N_LEVELS) for led_number in mapping]
+
+    def checkpoint(self):
+        """Write a snapshot of the LUT to the CSV files in the background."""
+        snapshot = [self.rows(table) for table in range(len(self.paths))]
+        self._pending = [future for future in self._pending if not future.done()]
+        self._pending.append(self._writer.submit(self._write, snapshot))
+
+    def save(self):
+        """Write the LUT to the CSV files and wait for all checkpoints to finish."""
+        self.checkpoint()
+        self.flush()
+
+    def flush(self):
+        for future in self._pending:
+            future.result()  # Re-raises any error from the background write
+        self._pending = []
+
+    def _write(self, snapshot):
+        for path, rows in zip(self.paths, snapshot):
+            # Write to a temporary file first so a crash during the write can't corrupt the existing LUT
+            directory = os.path.dirname(os.path.abspath(path))
+            with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", dir=directory, delete=False) as file:
+                file.write(SEQ_HEADER)
+                for row in rows:
+                    file.write(", ".join(str(value) for value in row) + "\n")
+            os.replace(file.name, path)
@@ -0,0 +1,164 @@
+"""
+Precomputed Rayleigh match tables for the anomaloscope: encoder values to red/green/yellow PWM and current.
+
+The red/green mixture is luminance balanced - the currents are chosen so red and green reach the same luminance at full
+PWM, and the mixture ratio sets the fraction of that luminance coming from red, so every ratio has the same luminance.
+The ratio and yellow axes are independent, so the table is one entry per encoder value on each axis and a lookup is
+a single index per encoder tick.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from .colorEngine import colorMatchingFunctions, LUMINOUS_EFFICACY
+from .inverseGamma import buildInverseLUTs
+
+ENCODER_MIN = -32768
+ENCODER_STEPS = 65536  # One table entry per int16 encoder value
+PWM_MAX = 65535
+CURRENT_MAX = 65535
+COLORS = ["green", "yellow", "red"]  # Order of AnomaloscopeController.currents_GYR
+TABLE_VERSION = 1
+MEASUREMENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))),
+                                "measurements")
+SWEEP_DIRECTORY = os.path.join(MEASUREMENTS_DIR, "anomaloscope-sweeps")  # PWM sweeps of the anomaloscope LEDs
+SWEEP_FILE = "pwm_sweep_board_{board}.csv"
+
+
+def calibrationKey(luminances, reference_currents, current_exponent=1.0, gamma_curves=None):
+    """Hash of everything a table is built from - the cached table is rebuilt when this changes"""
+    gamma_curves = {} if gamma_curves is None else gamma_curves
+    calibration = {
+        "version": TABLE_VERSION,
+        "luminances": {color: float(luminances[color]) for color in COLORS},
+        "reference_currents": {color: float(reference_currents[color]) for color in COLORS},
+        "current_exponent": float(current_exponent),
+        "gamma_curves": {color: [np.asarray(values, dtype=np.float64).round(9).tolist() for values in curve]
+                         for color, curve in sorted(gamma_curves.items())},
+    }
+    return hashlib.sha1(json.dumps(calibration, sort_keys=True).encode()).hexdigest()
+
+
+def inversePWM(gamma_curve=None):
+    """PWM (0-65535) giving each relative luminance (index / 65535), from a (PWM 0-1, luminance) curve if given"""
+    if gamma_curve is None:
+        return np.arange(ENCODER_STEPS, dtype=np.uint16)
+    pwms, luminance = gamma_curve
+    _, lut = buildInverseLUTs({0: (np.asarray(pwms) * PWM_MAX, luminance)}, bits=16, n_entries=ENCODER_STEPS,
+                              max_control=PWM_MAX)
+    return lut[0]
+
+
+def luminancesFromSpectra(wavelengths, spectra):
+    """{color: cd/m²} from the spectral radiance (W/sr/m²/nm) of each LED at full PWM"""
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+    efficiency = LUMINOUS_EFFICACY * colorMatchingFunctions(wavelengths)[1] * np.gradient(wavelengths)
+    return {color: float(efficiency @ np.asarray(spectra[color], dtype=np.float64)) for color in COLORS}
+
+
+def loadBoardSweeps(boards, reference_currents, directory=SWEEP_DIRECTORY):
+    """Luminances and gamma curves of each anomaloscope LED from a PWM sweep measured on its driver board.
+
+    Each board has a pwm_sweep_board_<board>.csv with PWM (0-65535), Current (0-65535) and Luminance (cd/m²) columns,
+    measured from PWM 0 to full PWM at the current the LED is driven at in the experiment.
+    :param boards: {color: driver board of the LED}
+    :param reference_currents: {color: current 0-65535} the LEDs are driven at
+    :return: ({color: cd/m² at full PWM}, {color: (PWM 0-1, luminance)}), or None unless every LED has a full sweep
+        at its reference current - the linear PWM mapping is kept rather than using a sweep of some other state
+    """
+    luminances = {}
+    gamma_curves = {}
+    for color in COLORS:
+        path = os.path.join(directory, SWEEP_FILE.format(board=boards[color]))
+        if not os.path.exists(path):
+            return None
+        df = pd.read_csv(path, usecols=["PWM", "Current", "Luminance"]).dropna().sort_values("PWM")
+        if df.empty or not (df["Current"] == reference_currents[color]).all() \
+                or df["PWM"].iloc[0] != 0 or df["PWM"].iloc[-1] != PWM_MAX:
+            print(f"Ignoring {path} - it is not a full PWM sweep at current {reference_currents[color]}")
+            return None
+        luminance = df["Luminance"].to_numpy(dtype=np.float64)
+        luminances[color] = float(luminance[-1])
+        gamma_curves[color] = (df["PWM"].to_numpy(dtype=np.float64) / PWM_MAX, luminance)
+    return luminances, gamma_curves
+
+
+class RayleighTable:
+    def __init__(self, red_pwm, green_pwm, yellow_pwm, currents, mixture_luminance, yellow_luminance, key=None):
+        self.red_pwm = red_pwm  # indexed by red/green ratio encoder value - ENCODER_MIN
+        self.green_pwm = green_pwm
+        self.yellow_pwm = yellow_pwm  # indexed by yellow encoder value - ENCODER_MIN
+        self.currents = currents  # {color: current 0-65535}
+        self.mixture_luminance = mixture_luminance  # cd/m² of the red/green mixture at every ratio
+        self.yellow_luminance = yellow_luminance  # cd/m² at full yellow PWM
+        self.key = key
+
+    def lookup(self, red_green_ratio, yellow):
+        """(red, green, yellow) PWM for encoder values (-32768 to 32767)"""
+        ratio_index = int(red_green_ratio) - ENCODER_MIN
+        return (int(self.red_pwm[ratio_index]), int(self.green_pwm[ratio_index]),
+                int(self.yellow_pwm[int(yellow) - ENCODER_MIN]))
+
+    def yellowLuminance(self, yellow):
+        """Yellow luminance (cd/m²) at an encoder value"""
+        return self.yellow_luminance * (int(yellow) - ENCODER_MIN) / (ENCODER_STEPS - 1)
+
+    def redFraction(self, red_green_ratio):
+        """Fraction of the mixture luminance from the red LED at an encoder value"""
+        return (int(red_green_ratio) - ENCODER_MIN) / (ENCODER_STEPS - 1)
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, red_pwm=self.red_pwm, green_pwm=self.green_pwm, yellow_pwm=self.yellow_pwm,
+                     currents=[self.currents[color] for color in COLORS], mixture_luminance=self.mixture_luminance,
+                     yellow_luminance=self.yellow_luminance, key=self.key)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["red_pwm"], data["green_pwm"], data["yellow_pwm"],
+                       dict(zip(COLORS, data["currents"].tolist())), float(data["mixture_luminance"]),
+                       float(data["yellow_luminance"]), str(data["key"]))
+
+
+def buildRayleighTable(luminances, reference_currents, current_exponent=1.0, gamma_curves=None):
+    """Build the table from the luminance of each LED.
+
+    :param luminances: {color: cd/m²} of each LED at full PWM, measured at reference_currents
+    :param reference_currents: {color: current 0-65535} the luminances were measured at
+    :param current_exponent: exponent of luminance vs current, used to predict luminance at other currents
+    :param gamma_curves: optional {color: (PWM 0-1, luminance)} measured curves, for LEDs that aren't linear in PWM
+    """
+    gamma_curves = {} if gamma_curves is None else gamma_curves
+    full_current = {color: luminances[color] / (reference_currents[color] / CURRENT_MAX) ** current_exponent
+                    for color in COLORS}
+
+    # Dim the brighter of red and green so both reach the same luminance at full PWM, keeping the stimulus no brighter
+    # than at the reference currents
+    mixture_luminance = min(luminances["red"], luminances["green"])
+    currents = {color: int(round(CURRENT_MAX * (mixture_luminance / full_current[color]) ** (1 / current_exponent)))
+                for color in ["red", "green"]}
+    currents["yellow"] = int(reference_currents["yellow"])
+
+    # Encoder value i gives red fraction i / 65535, so the inverse PWM curves are indexed by encoder value directly
+    red_pwm = inversePWM(gamma_curves.get("red"))
+    green_pwm = inversePWM(gamma_curves.get("green"))[::-1].copy()
+    yellow_pwm = inversePWM(gamma_curves.get("yellow"))
+    key = calibrationKey(luminances, reference_currents, current_exponent, gamma_curves)
+    return RayleighTable(red_pwm, green_pwm, yellow_pwm, currents, mixture_luminance, luminances["yellow"], key)
+
+
+def loadRayleighTable(path, luminances, reference_currents, current_exponent=1.0, gamma_curves=None):
+    """Load the table cached at path, rebuilding it only if the calibration it was built from has changed"""
+    key = calibrationKey(luminances, reference_currents, current_exponent, gamma_curves)
+    if os.path.exists(path):
+        table = RayleighTable.load(path)
+        if table.key == key:
+            return table
+    table = buildRayleighTable(luminances, reference_currents, current_exponent, gamma_curves)
+    table.save(path)
+    return table
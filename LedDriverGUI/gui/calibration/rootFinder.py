@@ -0,0 +1,106 @@
+import numpy as np
+
+CONTROL_PRECISION = 2 / 65535  # Smallest useful change in control value - the driver PWM is 16 bit
+
+
+class IllinoisSolver:
+    """Finds the control value (0.0 to 1.0) at which a monotonically increasing measurement reaches a target.
+
+    The solver is driven one measurement at a time: measure at next_control, pass the result to update(), and repeat
+    until done. Until the target is bracketed, the next control is extrapolated assuming power is proportional to
+    control (the power meter is zeroed on the dark background). Once bracketed, the Illinois variant of false position
+    is used, which converges in a handful of measurements for a smooth monotone curve.
+
+    Like the PID loop it replaces, a result is only accepted above the target, within tolerance.
+    """
+
+    def __init__(self, target, tolerance, start_control, lower=0.0, upper=1.0, max_iterations=30):
+        self.target = target
+        self.tolerance = tolerance
+        self.lower = lower
+        self.upper = upper
+        self.max_iterations = max_iterations
+        self.next_control = float(np.clip(start_control, lower, upper))
+        self.low = None  # [control, residual, power] of the highest control measured below the target
+        self.high = None  # [control, residual, power] of the lowest control measured above the target
+        self.last_side = 0
+        self.iterations = 0
+        self.done = False
+        self.converged = False
+        self.control = None  # Final control value, once done
+        self.power = None  # Power measured at the final control value, once done
+
+    def finish(self, control, power, converged):
+        self.done = True
+        self.converged = converged
+        self.control = control
+        self.power = power
+
+    def update(self, control, power):
+        """Add a measurement and compute next_control. Sets done once the target is reached or can't be improved."""
+        self.iterations += 1
+        residual = power - self.target
+        if 0 <= residual < self.tolerance:
+            self.finish(control, power, True)
+            return
+
+        side = 1 if residual >= 0 else -1
+        if side < 0:
+            if self.high is not None and control >= self.high[0]:
+                self.high = None  # Measurement noise has broken the bracket - start bracketing again
+            self.low = [control, residual, power]
+            if self.last_side < 0 and self.high is not None:
+                self.high[1] /= 2  # Illinois step: stop the stale endpoint from dominating the interpolation
+        else:
+            if self.low is not None and control <= self.low[0]:
+                self.low = None
+            self.high = [control, residual, power]
+            if self.last_side > 0 and self.low is not None:
+                self.low[1] /= 2
+        self.last_side = side
+
+        if self.low is not None and self.high is not None:
+            x_low, r_low, _ = self.low
+            x_high, r_high, _ = self.high
+            if x_high - x_low <= CONTROL_PRECISION:
+                # Can't get any closer - keep the value above the target, as the PID loop did
+                self.finish(x_high, self.high[2], False)
+                return
+            next_control = x_low - r_low * (x_high - x_low) / (r_high - r_low)
+            # Keep strictly inside the bracket so every measurement shrinks it
+            margin = CONTROL_PRECISION / 2
+            next_control = min(max(next_control, x_low + margin), x_high - margin)
+        else:
+            if (side < 0 and control >= self.upper) or (side > 0 and control <= self.lower):
+                self.finish(control, power, False)  # Target is out of reach
+                return
+            if power > 0:
+                next_control = control * self.target / power
+            else:
+                next_control = control * 2 if side < 0 else control / 2
+            next_control = float(np.clip(next_control, self.lower, self.upper))
+            if next_control == control:
+                next_control = self.upper if side < 0 else self.lower
+
+        if self.iterations >= self.max_iterations:
+            if self.high is not None:
+                self.finish(self.high[0], self.high[2], False)
+            else:
+                self.finish(control, power, False)
+            return
+        self.next_control = float(next_control)
+
+
+def warmStart(target, level, neighbours, default):
+    """Predict the control value that reaches a target power at a bit-plane level.
+
+    Power scales with both the control value and the bit-plane weight, so each solved neighbouring level (a list of
+    (control, power, level) tuples) gives a power per unit control and weight. The nearest level is used as it shares the
+    most of the LED's operating range. Falls back to default if there are no usable neighbours.
+    """
+    neighbours = [n for n in neighbours if n[0] > 0 and n[1] > 0]
+    if not neighbours:
+        return default
+    control, power, neighbour_level = min(neighbours, key=lambda n: abs(np.log2(n[2] / level)))
+    gain = power / (control * neighbour_level)
+    return float(np.clip(target / (gain * level), 0, 1))
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+from collections import deque
+
+MIN_DWELL = 0.1  # Minimum time (s) before a change can show up on the meter - readings before it are ignored
+
+
+class SettleDetector:
+    """Waits for an optical signal to stop changing after the display or driver state has been changed.
+
+    The power meter is read continuously and the signal is declared stable once a straight line fit over the last
+    `window` readings has both a total drift and a residual standard deviation below the tolerance. Readings taken within
+    `min_dwell` of the change are ignored, so a window of fast readings can't settle on the level from before the change
+    reached the meter. If the signal never settles, wait() gives up after the timeout, so it is never slower than the
+    fixed delay it replaces.
+    """
+
+    def __init__(self, read_power, window=5, interval=0.0, relative_tolerance=0.005, absolute_tolerance=0.001,
+                 min_dwell=MIN_DWELL):
+        """
+        :param read_power: function returning a single power reading (µW)
+        :param window: number of consecutive readings that must be stable
+        :param interval: time (s) to sleep between readings, on top of the time the reading itself takes
+        :param relative_tolerance: allowed drift and noise as a fraction of the mean reading
+        :param absolute_tolerance: allowed drift and noise in µW - sets the floor for dark readings
+        :param min_dwell: readings before this time (s) after each change are always ignored - at least the display
+            latency
+        """
+        self.read_power = read_power
+        self.window = window
+        self.interval = interval
+        self.relative_tolerance = relative_tolerance
+        self.absolute_tolerance = absolute_tolerance
+        self.min_dwell = min_dwell
+        self.fixed_time = 0  # Total time (s) the replaced fixed delays would have taken
+        self.settle_time = 0  # Total time (s) actually spent waiting
+        self.n_timeouts = 0  # Number of waits where the signal did not settle before the timeout
+
+    def isStable(self, times, powers):
+        times = np.asarray(times)
+        powers = np.asarray(powers)
+        slope, intercept = np.polyfit(times - times[0], powers, 1)
+        residual_std = np.std(powers - (slope * (times - times[0]) + intercept))
+        tolerance = self.absolute_tolerance + self.relative_tolerance * abs(powers.mean())
+        return abs(slope * (times[-1] - times[0])) < tolerance and residual_std < tolerance
+
+    def wait(self, timeout, min_time=0.0):
+        """Block until the signal is stable or the timeout (s) is reached.
+
+        :param timeout: maximum time to wait (s) - normally the fixed delay that used to be slept
+        :param min_time: readings taken before this time (s) are ignored, to allow for display and upload latency -
+            never less than min_dwell
+        :return: the time waited (s)
+        """
+        min_time = max(min_time, self.min_dwell)
+        self.fixed_time += timeout
+        if timeout <= min_time:
+            # No reading could count before the timeout, so this is just the fixed delay
+            time.sleep(timeout)
+            self.settle_time += timeout
+            return timeout
+
+        start = time.perf_counter()
+        time.sleep(min_time)  # Readings before min_time would be ignored anyway
+        times = deque(maxlen=self.window)
+        powers = deque(maxlen=self.window)
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= timeout:
+                self.n_timeouts += 1
+                break
+            power = self.read_power()
+            elapsed = time.perf_counter() - start
+            times.append(elapsed)
+            powers.append(power)
+            if len(powers) == self.window and self.isStable(times, powers):
+                break
+            if self.interval:
+                time.sleep(self.interval)
+
+        # A reading started just before the timeout can finish after it - it is counted as the timeout, which is all
+        # the fixed delay would have waited
+        elapsed = min(elapsed, timeout)
+        self.settle_time += elapsed
+        return elapsed
+
+    def timeSaved(self):
+        return self.fixed_time - self.settle_time
+
+    def report(self):
+        return (f"Settle detection waited {self.settle_time:.1f} s instead of {self.fixed_time:.1f} s of fixed delays "
+                f"(saved {self.timeSaved():.1f} s, {self.n_timeouts} timeouts)")
+
+    def reset(self):
+        self.fixed_time = 0
+        self.settle_time = 0
+        self.n_timeouts = 0
@@ -0,0 +1,158 @@
+"""
+Local database of measured LED spectra, keyed by LED, drive state (PWM and current), board temperature and date.
+
+Spectra are resampled onto one wavelength grid and kept as a float32 matrix (spectra.npy) next to an index of their keys
+(index.csv), so the whole database is loaded once and every query is a vectorised search over the index.
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+
+INDEX_FILE = "index.csv"
+SPECTRA_FILE = "spectra.npy"
+WAVELENGTHS_FILE = "wavelengths.npy"
+DEFAULT_WAVELENGTHS = np.arange(380, 781, 4)  # nm, the PR650 grid
+INDEX_COLUMNS = ["LED", "PWM", "Current", "Temperature", "Timestamp", "Luminance", "Power"]
+
+# Scales used to compare drive states: one unit of distance is 10% current or 5 °C
+CURRENT_SCALE = 0.1
+TEMPERATURE_SCALE = 5.0
+MAX_AGE_DAYS = 30  # Spectra older than this are re-measured
+TEMPERATURE_TOLERANCE = 3.0  # °C from the stored spectrum before it is re-measured
+POWER_TOLERANCE = 0.02  # Relative change in power meter reading that counts as drift
+
+
+class SpectralEntry:
+    """One stored spectrum and the state it was measured in"""
+
+    def __init__(self, wavelengths, spectrum, led, pwm, current, temperature, timestamp, luminance, power):
+        self.wavelengths = wavelengths
+        self.spectrum = spectrum
+        self.led = led
+        self.pwm = pwm
+        self.current = current
+        self.temperature = temperature  # °C, NaN if the board temperature was not known
+        self.timestamp = timestamp  # time.time() of the measurement
+        self.luminance = luminance
+        self.power = power  # µW from the power meter, NaN if it was not measured
+
+    @property
+    def age_days(self):
+        return (time.time() - self.timestamp) / 86400
+
+    def __repr__(self):
+        return (f"SpectralEntry(LED {self.led}, PWM {self.pwm}, current {self.current}, {self.temperature} °C, "
+                f"{time.strftime('%Y-%m-%d', time.localtime(self.timestamp))})")
+
+
+class SpectralDatabase:
+    def __init__(self, directory, wavelengths=DEFAULT_WAVELENGTHS):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            self.index = pd.read_csv(index_path)
+            self.wavelengths = np.load(os.path.join(self.directory, WAVELENGTHS_FILE))
+            self.spectra = np.load(os.path.join(self.directory, SPECTRA_FILE))
+        else:
+            self.index = pd.DataFrame(columns=INDEX_COLUMNS)
+            self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+            self.spectra = np.empty((0, len(self.wavelengths)), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.index)
+
+    def save(self):
+        """Write the database, replacing each file in one step so a crash can't leave a half written file"""
+        for name, write in [(WAVELENGTHS_FILE, lambda path: np.save(path, self.wavelengths)),
+                            (SPECTRA_FILE, lambda path: np.save(path, self.spectra)),
+                            (INDEX_FILE, lambda path: self.index.to_csv(path, index=False))]:
+            path = os.path.join(self.directory, name)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as file:
+                write(file)
+            os.replace(tmp_path, path)
+
+    def add(self, led, pwm, current, wavelengths, spectrum, luminance=np.nan, temperature=np.nan, power=np.nan,
+            timestamp=None, save=True):
+        spectrum = np.interp(self.wavelengths, wavelengths, spectrum, left=0.0, right=0.0)
+        self.spectra = np.vstack([self.spectra, spectrum.astype(np.float32)])
+        timestamp = time.time() if timestamp is None else timestamp
+        self.index.loc[len(self.index)] = [led, pwm, current, temperature, timestamp, luminance, power]
+        if save:
+            self.save()
+        return self.entry(len(self.index) - 1)
+
+    def entry(self, row):
+        values = self.index.iloc[row]
+        return SpectralEntry(self.wavelengths, self.spectra[row].astype(np.float64), int(values["LED"]),
+                             values["PWM"], values["Current"], values["Temperature"], values["Timestamp"],
+                             values["Luminance"], values["Power"])
+
+    def _candidates(self, led, before=None, max_age_days=None):
+        mask = self.index["LED"].to_numpy() == led
+        timestamps = self.index["Timestamp"].to_numpy(dtype=np.float64)
+        if before is not None:
+            mask &= timestamps <= before
+        if max_age_days is not None:
+            mask &= timestamps >= time.time() - max_age_days * 86400
+        return np.flatnonzero(mask)
+
+    def _distances(self, rows, pwm, current, temperature):
+        """Distance in drive state to each row - temperature is only compared where both are known"""
+        pwms = self.index["PWM"].to_numpy(dtype=np.float64)[rows]
+        currents = self.index["Current"].to_numpy(dtype=np.float64)[rows]
+        temperatures = self.index["Temperature"].to_numpy(dtype=np.float64)[rows]
+        temperature_distance = np.nan_to_num((temperatures - temperature) / TEMPERATURE_SCALE)
+        squared = (pwms - pwm) ** 2 + ((currents - current) / CURRENT_SCALE) ** 2 + temperature_distance ** 2
+        return np.sqrt(squared)
+
+    def nearest(self, led, pwm=1.0, current=1.0, temperature=np.nan, before=None, max_age_days=None):
+        """Stored spectrum closest in drive state and temperature (the newest of equally close ones), or None"""
+        rows = self._candidates(led, before, max_age_days)
+        if len(rows) == 0:
+            return None
+        distances = self._distances(rows, pwm, current, temperature)
+        timestamps = self.index["Timestamp"].to_numpy(dtype=np.float64)[rows]
+        best = np.lexsort((-timestamps, distances))[0]
+        return self.entry(rows[best])
+
+    def interpolate(self, led, pwm=1.0, current=1.0, temperature=np.nan, k=4, before=None, max_age_days=None):
+        """Estimated spectrum at a drive state.
+
+        Radiance is proportional to PWM (duty cycle), so each stored spectrum is first scaled to the requested PWM. The
+        shape depends on current and temperature, so the k nearest spectra in (current, temperature) are blended with
+        inverse distance weights.
+        :return: (wavelengths, spectrum), or None if the LED has no spectra
+        """
+        rows = self._candidates(led, before, max_age_days)
+        if len(rows) == 0:
+            return None
+        pwms = self.index["PWM"].to_numpy(dtype=np.float64)[rows]
+        distances = self._distances(rows, pwms, current, temperature)  # PWM is scaled out, not compared
+        nearest = np.argsort(distances)[:k]
+        scaled = self.spectra[rows[nearest]].astype(np.float64) * (pwm / pwms[nearest])[:, None]
+        if distances[nearest[0]] == 0:
+            return self.wavelengths, scaled[0]
+        weights = 1 / distances[nearest] ** 2
+        return self.wavelengths, weights @ scaled / weights.sum()
+
+    def needsRemeasure(self, led, pwm=1.0, current=1.0, temperature=np.nan, power=None,
+                       max_age_days=MAX_AGE_DAYS, temperature_tolerance=TEMPERATURE_TOLERANCE,
+                       power_tolerance=POWER_TOLERANCE):
+        """Whether a fresh spectrum is needed for this drive state.
+
+        True if there is no spectrum measured at exactly this PWM and current, if it is too old or was measured at a
+        different temperature, or if a quick power meter reading (power, µW) has drifted from the one stored with it.
+        """
+        entry = self.nearest(led, pwm, current, temperature, max_age_days=max_age_days)
+        if entry is None or entry.pwm != pwm or entry.current != current:
+            return True
+        if not np.isnan(temperature) and not np.isnan(entry.temperature) \
+                and abs(entry.temperature - temperature) > temperature_tolerance:
+            return True
+        if power is not None and not np.isnan(entry.power) \
+                and abs(power - entry.power) > power_tolerance * abs(entry.power):
+            return True
+        return False
@@ -4,11 +4,8 @@ from PyQt5 import QtWidgets
 from collections import OrderedDict
 import ast
 from . import guiSequence as seq
+from .utils import thermistor
 
-# Thermistor properties
-PCB_THERMISTOR_NOMINAL = 4700  # Value of thermistor on PCB at nominal temp (25°C)
-PCB_B_COEFFICIENT = 3500  # Beta value for the PCB thermistor
-SERIES_RESISTOR = 3600  # Resistor value in series with thermistor on PCB board
 # Clock speed of the Teensy in MHz - used to convert confocal delay times to clock cycles for sub-microsecond precision
 DEFAULT_CLOCK_SPEED = 600
 N_BOARDS = 3  # Number of boards connected to the driver
@@ -502,47 +499,12 @@ def updateModelWhatsThis(gui, dictionary):
 
 
 def adcToTemp(adc, external=False):
-    try:
-        if external:
-            therm_nominal = EXT_THERMISTOR_NOMINAL
-            b_coefficient = EXT_B_COEFFICIENT
-        else:
-            therm_nominal = PCB_THERMISTOR_NOMINAL
-            b_coefficient = PCB_B_COEFFICIENT
-        if adc > 65500:  # If ADC value is arbitrarily high then thermistor is disconnected, so return arbitrarily low value
-            return -1000
-        raw = adc
-        raw = 65535 / raw - 1
-        raw = SERIES_RESISTOR / raw
-        steinhart = raw / therm_nominal
-        steinhart = math.log(steinhart)
-        steinhart /= b_coefficient
-        steinhart += 1.0 / (25 + 273.15)
-        steinhart = 1.0 / steinhart
-        steinhart -= 273.15
-    except ZeroDivisionError:
-        return -1000  # Return impossible temp if invalid ADC value is received
-    return steinhart
+    # Accepts a single ADC reading or an array of readings - returns -1000 for invalid or disconnected readings
+    return thermistor.adcToTemp(adc, external)
 
 
 def tempToAdc(temperature, external=False):
-    if external:
-        therm_nominal = EXT_THERMISTOR_NOMINAL
-        b_coefficient = EXT_B_COEFFICIENT
-    else:
-        therm_nominal = PCB_THERMISTOR_NOMINAL
-        b_coefficient = PCB_B_COEFFICIENT
-
-    steinhart = temperature
-    steinhart += 273.15
-    steinhart = 1.0 / steinhart
-    steinhart -= 1.0 / (25 + 273.15)
-    steinhart *= b_coefficient
-    steinhart = math.exp(steinhart)
-    raw = steinhart * therm_nominal
-    raw = SERIES_RESISTOR / raw
-    raw = 65535 / (raw + 1)
-    return round(raw)
+    return thermistor.tempToAdc(temperature, external)
 
 
 def showMessage(gui, text):
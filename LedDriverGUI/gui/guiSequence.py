@@ -74,6 +74,27 @@ def loadSequence(gui, widget, get_path=False):
     gui.waitCursor(False)
 
 
+def loadSequenceRows(gui, widget, rows):
+    """Load sequence rows held in memory ([LED #, PWM %, current %, duration s] per row) into a sequence table widget.
+
+    Unlike loadSequence() no file is read, so this can be used to push a sequence that is being edited in memory (such
+    as a LUT during calibration) straight to the table before it is uploaded to the driver.
+    """
+    widget.setRowCount(0)
+    widget.itemChanged.disconnect()  # Speed up loading by preventing widget from validating every cell as data is loaded
+    for row_data in rows[:maximum_rows]:
+        row = widget.rowCount()
+        widget.insertRow(row)
+        for column, data in enumerate(row_data):
+            widget.setItem(row, column, QtWidgets.QTableWidgetItem(str(data)))
+    if widget.rowCount() < maximum_rows:
+        widget.insertRow(widget.rowCount())  # Add one extra row to allow for editing
+    if widget.rowCount() < 4:
+        widget.setRowCount(4)  # Ensure there are at least 4 rows
+    widget.itemChanged.connect(verifyCell)
+    setSequencePath(gui, widget, None)  # Table no longer matches a saved file
+
+
 # derived from - https://stackoverflow.com/questions/12608835/writing-a-qtablewidget-to-a-csv-or-xls
 def saveSequence(gui, widget, get_path=None):
     if get_path:
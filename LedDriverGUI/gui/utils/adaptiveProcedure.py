@@ -0,0 +1,86 @@
+"""
+Adaptive session procedure for the anomaloscope: keeps a running estimate of the subject's match point and stops the
+session once the confidence region of the mean match is small enough.
+
+Matches are in percent (red_percentage, yellow_luminance_percent). Starting values of each trial are placed around the
+current estimate, on alternating sides, at a distance that shrinks with the subject's spread - the subject always has
+to adjust towards the match, but doesn't spend the trial travelling across the whole range.
+"""
+import numpy as np
+
+from .matchStatistics import ellipseParameters, chi2Scale, CONFIDENCE
+
+TARGET_SIZE = 5.0  # % - stop once the confidence ellipse of the mean is smaller than this across its major axis
+MIN_TRIALS = 3  # Too few matches for the variance to mean anything
+START_RANGE = (10.0, 90.0)  # % - range of the random starting values of the first trial
+START_SPREAD = 3.0  # Starting values this many std devs from the mean match
+MIN_START_OFFSET = 5.0  # %
+MAX_START_OFFSET = 30.0  # %
+START_JITTER = 0.25  # Random fraction added to or taken from each offset
+
+
+def percentToEncoder(percent):
+    """Encoder value (-32768 to 32767) for a percentage of the encoder range"""
+    return int(np.clip(round(percent / 100 * 65535) - 32768, -32768, 32767))
+
+
+class AdaptiveMatchProcedure:
+    def __init__(self, target_size=TARGET_SIZE, max_trials=100, min_trials=MIN_TRIALS, confidence=CONFIDENCE,
+                 seed=None):
+        self.target_size = target_size
+        self.max_trials = max_trials
+        self.min_trials = min_trials
+        self.confidence = confidence
+        self.matches = []  # (red %, yellow %) of each match
+        self._rng = np.random.default_rng(seed)
+        self._red_side = self._rng.choice([-1, 1])  # Side of the estimate the next red starting value is on
+
+    def __len__(self):
+        return len(self.matches)
+
+    def addMatch(self, red_percentage, yellow_luminance_percent):
+        self.matches.append((float(red_percentage), float(yellow_luminance_percent)))
+
+    def removeLastMatch(self):
+        if self.matches:
+            self.matches.pop()
+
+    def estimate(self):
+        """(mean match (red %, yellow %), 2 x 2 covariance), or None before the first match"""
+        if not self.matches:
+            return None
+        matches = np.array(self.matches)
+        covariance = np.cov(matches.T) if len(matches) > 1 else np.full((2, 2), np.nan)
+        return matches.mean(axis=0), covariance
+
+    def confidenceSize(self):
+        """Major axis (%) of the confidence ellipse of the mean match, inf until there are two matches"""
+        if len(self.matches) < 2:
+            return np.inf
+        _, covariance = self.estimate()
+        major, _, _ = ellipseParameters(covariance[0, 0], covariance[1, 1], covariance[0, 1],
+                                        chi2Scale(self.confidence))
+        return float(major) / np.sqrt(len(self.matches))
+
+    def isDone(self):
+        if len(self.matches) >= self.max_trials:
+            return True
+        return len(self.matches) >= self.min_trials and self.confidenceSize() <= self.target_size
+
+    def startingValues(self):
+        """(red %, yellow %) to start the next trial at"""
+        estimate = self.estimate()
+        if estimate is None:
+            return tuple(float(value) for value in self._rng.uniform(*START_RANGE, size=2))
+        mean, covariance = estimate
+        spread = np.sqrt(np.diag(covariance)) if len(self.matches) > 1 else np.full(2, np.inf)
+        offsets = np.clip(START_SPREAD * spread, MIN_START_OFFSET, MAX_START_OFFSET)
+        offsets *= 1 + self._rng.uniform(-START_JITTER, START_JITTER, size=2)
+        # Red alternates sides so the matches aren't biased towards one starting direction, yellow is random
+        sides = np.array([self._red_side, self._rng.choice([-1, 1])])
+        self._red_side = -self._red_side
+        start = mean + sides * offsets
+        # Off the end of the range: start on the other side instead
+        outside = (start < 0) | (start > 100)
+        start[outside] = (mean - sides * offsets)[outside]
+        return tuple(float(value) for value in np.clip(start, 0, 100))
@@ -0,0 +1,146 @@
+"""
+Audio cues for the anomaloscope, played by one long-lived worker thread from tones synthesised once at startup.
+
+Cues are requested from any thread without blocking. A cue that is already waiting to play, or started less than
+MIN_REPEAT_INTERVAL ago, is dropped, and at most MAX_PENDING cues wait at once, so fast encoder sweeps hitting a limit
+can't pile up beeps. Windows plays the WAV buffers with winsound, elsewhere they are played with QSoundEffect. The time
+from each request to the start of playback is recorded.
+"""
+import io
+import os
+import platform
+import tempfile
+import threading
+import time
+import wave
+import numpy as np
+from PyQt5 import QtCore
+
+from .ringBuffer import RingBuffer
+
+# Windows plays from memory with winsound, other platforms with QtMultimedia if it is available
+if platform.system() == "Windows":
+    import winsound
+else:
+    winsound = None
+try:
+    from PyQt5.QtMultimedia import QSoundEffect
+except ImportError:
+    QSoundEffect = None
+
+MATCH = "match"
+LIMIT_TOP = "limit_top"
+LIMIT_BOTTOM = "limit_bottom"
+CUES = {MATCH: 1000, LIMIT_TOP: 1200, LIMIT_BOTTOM: 800}  # Hz
+TONE_DURATION = 0.75  # s
+FADE_DURATION = 0.01  # s of fade in and out, so the tones don't click
+SAMPLE_RATE = 44100
+VOLUME = 0.5
+MAX_PENDING = 4  # Cues waiting to play at once, further requests are dropped
+MIN_REPEAT_INTERVAL = 0.3  # s before the same cue is played again
+LATENCY_HISTORY = 1000  # Number of cue latencies kept for latencyStats()
+CUE_DIRECTORY = os.path.join(tempfile.gettempdir(), "led_driver_cues")  # WAV files for QSoundEffect
+
+
+def synthesizeTone(frequency, duration=TONE_DURATION, sample_rate=SAMPLE_RATE, volume=VOLUME, fade=FADE_DURATION):
+    """16 bit mono sine tone with linear fade in and out"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    envelope = np.minimum(1.0, np.minimum(t, duration - t) / fade)
+    return (volume * 32767 * envelope * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def wavBytes(samples, sample_rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class AudioWorker(QtCore.QObject):
+    """Plays cues on its own thread, see AudioCueEngine"""
+
+    def __init__(self, engine, buffers):
+        super(AudioWorker, self).__init__()
+        self.engine = engine
+        self.buffers = buffers  # {cue: WAV bytes}
+        self.effects = {}  # {cue: QSoundEffect}, created on the worker thread by setup()
+
+    def setup(self):
+        if winsound is not None or QSoundEffect is None:
+            return
+        os.makedirs(CUE_DIRECTORY, exist_ok=True)
+        for cue, buffer in self.buffers.items():
+            path = os.path.join(CUE_DIRECTORY, f"{cue}.wav")
+            with open(path, "wb") as file:
+                file.write(buffer)
+            effect = QSoundEffect()
+            effect.setSource(QtCore.QUrl.fromLocalFile(path))
+            self.effects[cue] = effect
+
+    def playCue(self, cue, requested):
+        if winsound is not None:
+            self.engine.cueStarted(cue, requested)
+            winsound.PlaySound(self.buffers[cue], winsound.SND_MEMORY)  # Blocks this thread only
+        elif cue in self.effects:
+            self.effects[cue].play()
+            self.engine.cueStarted(cue, requested)
+        else:
+            self.engine.cueStarted(cue, requested)
+            print(f"Beep sound at frequency {CUES[cue]}Hz (no audio output available)")
+
+
+class AudioCueEngine(QtCore.QObject):
+    # Queued to the worker thread: cue name, time.perf_counter() of the request
+    cue_requested = QtCore.pyqtSignal(str, float)
+
+    def __init__(self, cues=CUES):
+        super(AudioCueEngine, self).__init__()
+        self.buffers = {cue: wavBytes(synthesizeTone(frequency)) for cue, frequency in cues.items()}
+        self.latency = RingBuffer(LATENCY_HISTORY)  # Seconds from request to playback of each cue
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pending = set()  # Cues requested but not started
+        self._last_started = {}  # {cue: time.perf_counter() it last started}
+
+        self.thread = QtCore.QThread()
+        self.worker = AudioWorker(self, self.buffers)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.setup)
+        self.cue_requested.connect(self.worker.playCue)
+        self.thread.start()
+
+    def play(self, cue):
+        """Request a cue without blocking. Returns False if it was dropped as a duplicate or the queue is full"""
+        now = time.perf_counter()
+        with self._lock:
+            if cue in self._pending or len(self._pending) >= MAX_PENDING \
+                    or now - self._last_started.get(cue, -np.inf) < MIN_REPEAT_INTERVAL:
+                self.dropped += 1
+                return False
+            self._pending.add(cue)
+        self.cue_requested.emit(cue, now)
+        return True
+
+    def cueStarted(self, cue, requested):
+        """Called by the worker as each cue starts playing"""
+        now = time.perf_counter()
+        with self._lock:
+            self._pending.discard(cue)
+            self._last_started[cue] = now
+            self.latency.append(now - requested)
+
+    def latencyStats(self):
+        """Request to playback latency (ms) of recent cues, or None if none were played."""
+        with self._lock:
+            latency = self.latency.data(0) * 1000
+            if len(latency) == 0:
+                return None
+            return {"cues": len(latency), "dropped": self.dropped, "mean_ms": float(latency.mean()),
+                    "p95_ms": float(np.percentile(latency, 95)), "max_ms": float(latency.max())}
+
+    def close(self):
+        self.thread.quit()
+        self.thread.wait()
@@ -461,6 +461,9 @@ class usbSerial(QtWidgets.QWidget):  # Implementation based on: https://stackove
             # If status has changed, emit status change signal with rate limiting (60 Hz max)
             if status_change:
                 current_time = timer()
+                if not self.pending_status_emit:
+                    # Changes merged into a pending emit keep the time of the first one, for latency measurements
+                    self.gui.controller_status_dict["Frame Time"] = current_time
                 time_since_last_emit = current_time - self.last_status_emit_time
 
                 if time_since_last_emit >= self.status_emit_rate_limit:
@@ -17,6 +17,8 @@ from timeit import default_timer as timer
 import traceback
 import pyautogui
 from typing import List
+import numpy as np
+from .ringBuffer import RingBuffer
 
 # Teensy USB serial microcontroller program id data:
 VENDOR_ID = 0x16C0
@@ -25,6 +27,9 @@ SERIAL_NUMBER = "30MMLED"
 MAGIC_SEND = "51ERrUAT6ZWlThiltxJK"  # Magic number sent to Teensy to verify that they are an LED driver
 MAGIC_RECEIVE = "A5DihJ3v5bbXKmAmmhQl"  # Magic number received from Teensy verifying it is an LED driver
 HEARTBEAT_INTERVAL = 5  # Send a heartbeat signal every 5 seconds after the last packet was transmitted
+ANOMALOSCOPE_PREFIX = 100  # Prefix of the compact PWM only packet
+PWM_PACKETS = False  # Send LED updates as compact PWM only packets - opt in until the firmware is confirmed to accept them
+LATENCY_HISTORY = 1000  # Number of encoder to serial write latencies kept for ledLatencyStats()
 debug = True  # Show all serial debug messages excluding status updates
 debug_status = False  # Also show status messages
 
@@ -63,6 +68,9 @@ class usbSerial(QtWidgets.QWidget):  # Implementation based on: https://stackove
         self.initializing_connection = True  # Flag to suppress unnecessary notifications if connection is being initialized
         self.stop_receive = False  # Blocks receive thread when a packet is being processed
         self.heartbeat_timer = timer()  # Timer to track if a heartbeat signal needs to be sent
+        self.pwm_packets = PWM_PACKETS  # Send PWM only packets while channels and currents are unchanged, see updateLedStatus()
+        self.sent_led_settings = None  # Channels and currents of the last override status, while they are still active
+        self.led_latency = RingBuffer(LATENCY_HISTORY)  # Seconds from encoder frame to serial write
         self.autoclick_mouse = False  # Automatically click the mouse when the sync switches to the set state
         self.autoclick_state = False  # State of the sync status that will trigger an auto-mouse click
         self.autoclick_position = (0, 0)  # Position to click mouse
@@ -539,17 +547,7 @@ class usbSerial(QtWidgets.QWidget):  # Implementation based on: https://stackove
                 self.heartbeat_timer = timer()
         else:
             if self.portConnected():
-                def widgetIndex(widget_list):
-                    nonlocal self
-                    for w_index, n_widget in enumerate(widget_list):
-                        if self.gui.getValue(n_widget) in [True, 1]:
-                            # if the slider has a value of 1 this means mode is 0
-                            if (n_widget is self.gui.main_model["Mode"][0]):
-                                w_index = 0
-                            return w_index
-                    else:
-                        # self.gui.showMessage("Error: Widget index not found!")
-                        return None
+                widgetIndex = self.statusWidgetIndex
                 # Send a status control command only if GUI has control
                 if widgetIndex(self.gui.main_model["Control"]) == 0 or force_tx:
                     status_list = [0] * (5*self.gui.nBoards() + 3)
@@ -591,10 +589,42 @@ class usbSerial(QtWidgets.QWidget):  # Implementation based on: https://stackove
                         status_list[2*self.gui.nBoards() + board] = led_dict["current"][board]
                     status_list[3*self.gui.nBoards()] = mode
                     status_list[3*self.gui.nBoards()+2] = widgetIndex(self.gui.main_model["Control"])
-                    print(status_list)
+                    self.sent_led_settings = None  # A PWM only packet can only follow an override status
                     status_list = struct.pack("<BBBHHHHHHB??HHHHHH", *status_list)
                     self.sendWithoutReply(status_list, True, 0)
 
+    def statusWidgetIndex(self, widget_list):
+        """Index of the checked widget in a list of status widgets, or None if none is checked"""
+        for w_index, n_widget in enumerate(widget_list):
+            if self.gui.getValue(n_widget) in [True, 1]:
+                # if the slider has a value of 1 this means mode is 0
+                if (n_widget is self.gui.main_model["Mode"][0]):
+                    w_index = 0
+                return w_index
+        return None
+
+    def sendLedStatus(self):
+        """
+        Write the Channel/PWM/Current values of status_dict straight to the port as an override status packet - the
+        same packet as updateStatus(force_tx=True, override=True), without reading the LED widgets or waiting.
+        :return: False if the packet has to be built by updateStatus() instead, as PWM and current mode read the dial.
+        """
+        mode = self.statusWidgetIndex(self.gui.main_model["Mode"])
+        if self.active_port is None or mode in [1, 2]:
+            return False
+        n_boards = self.gui.nBoards()
+        status_list = [0] * (5*n_boards + 3)
+        for board in range(n_boards):
+            status_list[board] = self.gui.status_dict["Channel" + str(board + 1)]
+            status_list[n_boards + board] = self.gui.status_dict["PWM" + str(board + 1)]
+            status_list[2*n_boards + board] = self.gui.status_dict["Current" + str(board + 1)]
+        status_list[3*n_boards] = mode
+        status_list[3*n_boards+2] = self.statusWidgetIndex(self.gui.main_model["Control"])
+        packet = bytes([self.prefix_dict["updateStatus"]]) + struct.pack("<BBBHHHHHHB??HHHHHH", *status_list)
+        self.active_port.write(cobs.encode(packet) + bytes(1))  # NULL framing byte
+        self.heartbeat_timer = timer()
+        return True
+
     def measurePeriod(self, reply=None):
         if reply:
             mirror_period = struct.unpack("<f", reply)[0]
@@ -640,14 +670,53 @@ class usbSerial(QtWidgets.QWidget):  # Implementation based on: https://stackove
     def sendCustomAnomaloscopePacket(self, leds: List[int]):
         """
         Send a custom packet to the LED driver for the anomaloscope.
-        :param leds: A dictionary with keys 'red', 'green', and 'yellow' and their corresponding PWM values.
+        :param leds: PWM value of each board, in board order.
         """
 
         if self.portConnected():
-            message = struct.pack("<B", 100)  # Pack 1 byte with value 100
-            for pwm_value in leds:
-                message += struct.pack("<H", pwm_value)  # Pack 2 bytes for each LED's PWM value
-            self.sendWithoutReply(message)
+            self.sendAnomaloscopePWM(leds)
+
+    def sendAnomaloscopePWM(self, pwms, frame_time=None):
+        """
+        Write the compact PWM only packet straight to the port - no widgets are read and no reply is waited for.
+        :param pwms: PWM value (0-65535) of each board, in board order.
+        :param frame_time: timer() of the encoder frame that caused this update, to measure the latency.
+        """
+        if self.active_port is None:
+            return False
+        packet = struct.pack("<B" + "H" * len(pwms), ANOMALOSCOPE_PREFIX, *pwms)
+        self.active_port.write(cobs.encode(packet) + bytes(1))  # NULL framing byte
+        self.heartbeat_timer = timer()
+        if frame_time:
+            self.led_latency.append(timer() - frame_time)
+        return True
+
+    def updateLedStatus(self, status_updates, frame_time=None):
+        """
+        Apply Channel/PWM/Current status updates.  The override status is sent directly, unless pwm_packets is set -
+        then it is only sent when channels or currents change, and only the PWM packet while they stay the same.
+        """
+        for key, value in status_updates.items():
+            self.gui.status_dict[key] = value
+        boards = range(1, self.gui.nBoards() + 1)
+        settings = tuple(self.gui.status_dict[key + str(board)] for key in ["Channel", "Current"] for board in boards)
+        if self.pwm_packets and settings == self.sent_led_settings and self.active_port is not None:
+            self.sendAnomaloscopePWM([self.gui.status_dict["PWM" + str(board)] for board in boards], frame_time)
+        else:
+            if not self.sendLedStatus():
+                self.updateStatus(force_tx=True, override=True)
+            self.sent_led_settings = settings
+            if frame_time:
+                self.led_latency.append(timer() - frame_time)
+
+    def ledLatencyStats(self):
+        """Encoder frame to serial write latency (ms) of recent LED updates, or None if there were none."""
+        latency = self.led_latency.data(0) * 1000
+        if len(latency) == 0:
+            return None
+        return {"updates": len(latency), "mean_ms": float(latency.mean()),
+                "p95_ms": float(np.percentile(latency, 95)),
+                "max_ms": float(latency.max())}
 
     def portConnected(self):
         if self.active_port is None:
@@ -0,0 +1,115 @@
+"""
+Statistics of anomaloscope matches for every subject (or session) at once.
+
+Trials are sorted by group once, and every statistic is a grouped numpy reduction over the sorted arrays. Bootstrap
+resamples of all groups are reduced together as one (n_bootstrap, n_trials) index array. Only the random draws are made
+group by group, each from a generator seeded by the group's key, so a group's intervals don't change when other groups'
+trials do.
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+
+X_COLUMN = "red_percentage"
+Y_COLUMN = "yellow_luminance_percent"
+N_BOOTSTRAP = 1000
+CONFIDENCE = 0.95
+STAT_COLUMNS = ["n", "mean_x", "mean_y", "var_x", "var_y", "cov_xy", "width", "height", "angle",
+                "min_x", "max_x", "min_y", "max_y", "range_x", "range_y"]
+CI_COLUMNS = ["ci_x_low", "ci_x_high", "ci_y_low", "ci_y_high", "ci_width", "ci_height", "ci_angle"]
+
+
+def ellipseParameters(var_x, var_y, cov_xy, n_std=1.0):
+    """Full width, full height and angle (degrees) of the n_std ellipse of 2 x 2 covariances, closed form"""
+    half_trace = (var_x + var_y) / 2
+    spread = np.sqrt(((var_x - var_y) / 2) ** 2 + cov_xy ** 2)
+    major = np.maximum(half_trace + spread, 0)
+    minor = np.maximum(half_trace - spread, 0)
+    angle = np.degrees(0.5 * np.arctan2(2 * cov_xy, var_x - var_y))
+    return 2 * n_std * np.sqrt(major), 2 * n_std * np.sqrt(minor), angle
+
+
+def chi2Scale(confidence):
+    """Number of standard deviations of the ellipse holding a fraction confidence of a 2D normal distribution"""
+    return np.sqrt(-2 * np.log(1 - confidence))
+
+
+def _groupedCovariance(x, y, starts, counts, ddof=1):
+    """Means and covariances of groups of consecutive values along the last axis"""
+    mean_x = np.add.reduceat(x, starts, axis=-1) / counts
+    mean_y = np.add.reduceat(y, starts, axis=-1) / counts
+    dx = x - np.repeat(mean_x, counts, axis=-1)
+    dy = y - np.repeat(mean_y, counts, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = np.where(counts > ddof, counts - ddof, np.nan)
+        var_x = np.add.reduceat(dx * dx, starts, axis=-1) / denominator
+        var_y = np.add.reduceat(dy * dy, starts, axis=-1) / denominator
+        cov_xy = np.add.reduceat(dx * dy, starts, axis=-1) / denominator
+    return mean_x, mean_y, var_x, var_y, cov_xy
+
+
+def groupSeed(seed, key):
+    """Seed of a group's bootstrap draws - depends only on the seed and the group key, not on the other groups"""
+    return [seed, int(hashlib.sha1(str(key).encode()).hexdigest()[:8], 16)]
+
+
+def matchStatistics(trials, by="subject_id", x=X_COLUMN, y=Y_COLUMN, n_bootstrap=N_BOOTSTRAP,
+                    confidence=CONFIDENCE, seed=0):
+    """Match statistics of each group of trials.
+
+    :param trials: DataFrame with one row per trial
+    :param by: column or list of columns to group by, e.g. ["subject_id", "session"] for per-session statistics
+    :param n_bootstrap: bootstrap resamples for the confidence intervals of the mean, 0 to skip them
+    :param seed: seed of the bootstrap resampling, so repeated calls give the same intervals
+    :return: DataFrame indexed by group, in order of first appearance (trials with a missing key are left out), with
+        n, mean_x, mean_y, var_x, var_y, cov_xy,
+        width, height, angle - the 1 std dev ellipse (NaN for a single trial),
+        min_x, max_x, range_x, min_y, max_y, range_y - the matching range,
+        ci_x_low, ci_x_high, ci_y_low, ci_y_high - percentile intervals of the mean,
+        ci_width, ci_height, ci_angle - confidence ellipse of the mean, from the bootstrap covariance
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    grouped = trials.groupby(by, sort=False)
+    keys = grouped.size().index  # Groups in the order ngroup numbers them
+    # Trials with a NaN key belong to no group - ngroup numbers them -1 or NaN, depending on the pandas version
+    codes = grouped.ngroup().to_numpy(dtype=np.float64)
+    valid = np.flatnonzero(codes >= 0)
+    if len(valid) == 0:
+        return pd.DataFrame(columns=STAT_COLUMNS + (CI_COLUMNS if n_bootstrap else []), index=keys)
+    codes = codes[valid].astype(np.int64)
+    order = valid[np.argsort(codes, kind="stable")]
+    counts = np.bincount(codes, minlength=len(keys))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    xs = trials[x].to_numpy(dtype=np.float64)[order]
+    ys = trials[y].to_numpy(dtype=np.float64)[order]
+
+    mean_x, mean_y, var_x, var_y, cov_xy = _groupedCovariance(xs, ys, starts, counts)
+    width, height, angle = ellipseParameters(var_x, var_y, cov_xy)
+    stats = {
+        "n": counts, "mean_x": mean_x, "mean_y": mean_y, "var_x": var_x, "var_y": var_y, "cov_xy": cov_xy,
+        "width": width, "height": height, "angle": angle,
+        "min_x": np.minimum.reduceat(xs, starts), "max_x": np.maximum.reduceat(xs, starts),
+        "min_y": np.minimum.reduceat(ys, starts), "max_y": np.maximum.reduceat(ys, starts),
+    }
+    stats["range_x"] = stats["max_x"] - stats["min_x"]
+    stats["range_y"] = stats["max_y"] - stats["min_y"]
+
+    if n_bootstrap:
+        # Each row resamples every group with replacement from its own trials
+        draws = np.empty((n_bootstrap, len(xs)))
+        for key, start, count in zip(keys, starts, counts):
+            draws[:, start:start + count] = np.random.default_rng(groupSeed(seed, key)).random((n_bootstrap, count))
+        group_starts = np.repeat(starts, counts)
+        group_counts = np.repeat(counts, counts)
+        samples = group_starts + (draws * group_counts).astype(np.int64)
+        boot_x = np.add.reduceat(xs[samples], starts, axis=1) / counts
+        boot_y = np.add.reduceat(ys[samples], starts, axis=1) / counts
+        tail = (1 - confidence) / 2 * 100
+        stats["ci_x_low"], stats["ci_x_high"] = np.percentile(boot_x, [tail, 100 - tail], axis=0)
+        stats["ci_y_low"], stats["ci_y_high"] = np.percentile(boot_y, [tail, 100 - tail], axis=0)
+        # Covariance of the bootstrap means of each group, over the resamples
+        _, _, boot_var_x, boot_var_y, boot_cov = _groupedCovariance(boot_x.T, boot_y.T, [0], n_bootstrap)
+        stats["ci_width"], stats["ci_height"], stats["ci_angle"] = ellipseParameters(
+            boot_var_x[:, 0], boot_var_y[:, 0], boot_cov[:, 0], chi2Scale(confidence))
+
+    return pd.DataFrame(stats, index=keys)
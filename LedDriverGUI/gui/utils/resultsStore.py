@@ -0,0 +1,118 @@
+"""
+SQLite store of anomaloscope results, one row per trial, indexed by subject, date and randomization mode.
+
+Every session is stored under the name of its CSV file (without extension). Existing CSVs are imported once - the store
+remembers the modification time of each file, so later imports only read files that are new or have changed.
+"""
+import glob
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+RESULTS_DATABASE = "results.sqlite"  # In the data folder, next to the CSV files
+INDEXED_COLUMNS = ["subject_id", "experiment_date", "randomization_mode"]
+
+
+def sessionName(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _quote(column):
+    return '"' + str(column).replace('"', '""') + '"'
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS sessions "
+                                     "(session TEXT PRIMARY KEY, source TEXT, modified REAL, trials INTEGER)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS trials (session TEXT NOT NULL, trial_number INTEGER, "
+                                     + ", ".join(f"{column} TEXT" for column in INDEXED_COLUMNS) + ")")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS trials_session ON trials (session)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS trials_subject ON trials (subject_id, experiment_date)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS trials_date ON trials (experiment_date)")
+            # Modes are compared case insensitively, as they were when filtering the CSVs
+            self._connection.execute("CREATE INDEX IF NOT EXISTS trials_mode "
+                                     "ON trials (randomization_mode COLLATE NOCASE, subject_id)")
+        self.columns = [row[1] for row in self._connection.execute("PRAGMA table_info(trials)")]
+
+    def close(self):
+        self._connection.close()
+
+    def sessions(self):
+        """{session: (source file, modification time)}"""
+        with self._lock:
+            rows = self._connection.execute("SELECT session, source, modified FROM sessions").fetchall()
+        return {session: (source, modified) for session, source, modified in rows}
+
+    def addSession(self, session, trials, source=None):
+        """Store the trials (dicts of column: value) of a session, replacing it if it was stored before"""
+        modified = os.path.getmtime(source) if source is not None and os.path.exists(source) else None
+        columns = list(dict.fromkeys(column for trial in trials for column in trial if column != "session"))
+        with self._lock, self._connection:
+            for column in columns:
+                if column not in self.columns:
+                    self._connection.execute(f"ALTER TABLE trials ADD COLUMN {_quote(column)}")
+                    self.columns.append(column)
+            self._connection.execute("DELETE FROM trials WHERE session = ?", (session,))
+            self._connection.executemany(
+                f"INSERT INTO trials (session, {', '.join(_quote(column) for column in columns)}) "
+                f"VALUES (?, {', '.join('?' for _ in columns)})",
+                [[session] + [trial.get(column) for column in columns] for trial in trials])
+            self._connection.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                                     (session, source, modified, len(trials)))
+
+    def importCsv(self, path):
+        df = pd.read_csv(path)
+        # Plain Python values (sqlite can't store numpy types), with missing values as NULL
+        df = df.astype(object).where(df.notna(), None)
+        self.addSession(sessionName(path), df.to_dict("records"), path)
+
+    def importDirectory(self, directory):
+        """Import the CSVs in a folder that are not in the store or have changed since. Returns the imported paths"""
+        stored = self.sessions()
+        imported = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            session = sessionName(path)
+            if session in stored and stored[session][1] == os.path.getmtime(path):
+                continue
+            try:
+                self.importCsv(path)
+            except Exception as e:
+                print(f"Could not import {path}: {e}")
+                continue
+            imported.append(path)
+        return imported
+
+    def query(self, columns=None, subject_id=None, mode=None, date_from=None, date_to=None):
+        """Trials as a DataFrame, in the order they were stored.
+
+        :param columns: columns to read, all of them if None
+        :param mode: randomization mode, compared case insensitively
+        :param date_from: first experiment date (YYYY-MM-DD) to include
+        :param date_to: last experiment date to include
+        """
+        conditions = []
+        params = []
+        for condition, value in [("subject_id = ?", subject_id), ("randomization_mode = ? COLLATE NOCASE", mode),
+                                 ("experiment_date >= ?", date_from), ("experiment_date <= ?", date_to)]:
+            if value is not None:
+                conditions.append(condition)
+                params.append(str(value))
+        if columns is None:
+            selected = "*"
+        else:
+            selected = ", ".join(_quote(column) if column in self.columns else f"NULL AS {_quote(column)}"
+                                 for column in columns)
+        sql = f"SELECT {selected} FROM trials"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            return pd.read_sql_query(sql + " ORDER BY rowid", self._connection, params=params)
+
+    def subjects(self, mode=None):
+        return self.query(["subject_id"], mode=mode)["subject_id"].unique().tolist()
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Preallocated circular buffer holding one or more synchronized numeric traces.
+
+    Every sample is written twice (at i and i + capacity) so the most recent samples are always available as a
+    contiguous, zero-copy view regardless of where the write head is.
+    """
+
+    def __init__(self, capacity, n_traces=1, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.n_traces = int(n_traces)
+        self._buffer = np.zeros((self.n_traces, 2 * self.capacity), dtype=dtype)
+        self._head = 0  # Index of the oldest sample
+        self._count = 0  # Number of valid samples in the buffer
+
+    def __len__(self):
+        return self._count
+
+    def append(self, values):
+        """Add one sample to each trace, overwriting the oldest sample if the buffer is full."""
+        if self._count < self.capacity:
+            index = self._head + self._count
+            self._count += 1
+        else:
+            index = self._head
+            self._head = (self._head + 1) % self.capacity
+        index %= self.capacity
+        self._buffer[:, index] = values
+        self._buffer[:, index + self.capacity] = values
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def data(self, trace=None):
+        """Return a read-only view of the buffered samples in chronological order - shape (n_traces, len(self))"""
+        view = self._buffer[:, self._head:self._head + self._count]
+        view = view.view()
+        view.flags.writeable = False
+        if trace is None:
+            return view
+        return view[trace]
+
+    def last(self, trace=None):
+        if self._count == 0:
+            return None
+        index = (self._head + self._count - 1) % self.capacity
+        if trace is None:
+            return self._buffer[:, index].copy()
+        return self._buffer[trace, index]
+
+
+def decimateMinMax(x, y, n_bins):
+    """Reduce a trace to the min and max sample of n_bins equal width bins (e.g. one bin per horizontal pixel).
+
+    The envelope of the trace is preserved, so narrow spikes are still drawn, while the number of points passed to the
+    plot is bounded by 2*n_bins + 1 no matter how many samples are buffered.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n_samples = len(y)
+    n_bins = int(n_bins)
+    if n_bins < 1 or n_samples <= 2 * n_bins:
+        return x, y
+
+    bin_size = n_samples // n_bins
+    offset = n_samples - bin_size * n_bins  # Leading samples that don't fill a bin - keep newest data aligned to the bins
+    y_bins = y[offset:].reshape(n_bins, bin_size)
+    bin_start = offset + np.arange(n_bins) * bin_size
+    i_min = bin_start + np.argmin(y_bins, axis=1)
+    i_max = bin_start + np.argmax(y_bins, axis=1)
+
+    # Keep min and max of each bin in chronological order so the line trace is drawn correctly
+    index = np.empty(2 * n_bins + (1 if offset else 0), dtype=np.intp)
+    pairs = index[1:] if offset else index
+    pairs[0::2] = np.minimum(i_min, i_max)
+    pairs[1::2] = np.maximum(i_min, i_max)
+    if offset:
+        index[0] = 0  # Keep the first sample so the trace still starts at the beginning of the time axis
+    return x[index], y[index]
@@ -0,0 +1,87 @@
+import numpy as np
+
+# Thermistor properties
+PCB_THERMISTOR_NOMINAL = 4700  # Value of thermistor on PCB at nominal temp (25°C)
+PCB_B_COEFFICIENT = 3500  # Beta value for the PCB thermistor
+# External thermistor properties - defaults to the PCB thermistor until a different external thermistor is configured
+EXT_THERMISTOR_NOMINAL = PCB_THERMISTOR_NOMINAL
+EXT_B_COEFFICIENT = PCB_B_COEFFICIENT
+SERIES_RESISTOR = 3600  # Resistor value in series with thermistor on PCB board
+NOMINAL_TEMP = 25  # Temperature in °C at which the thermistor has its nominal resistance
+ADC_MAX = 65535  # Full scale 16-bit ADC reading
+DISCONNECTED_ADC = 65500  # ADC readings above this value mean the thermistor is disconnected
+DISCONNECTED_TEMP = -1000  # Impossible temperature returned for invalid or disconnected readings
+
+_tables = {}  # Cached lookup tables, keyed by (thermistor nominal, B coefficient)
+
+
+class ThermistorTable:
+    """Precomputed Steinhart (B parameter) conversion for every possible 16-bit ADC reading of one thermistor."""
+
+    def __init__(self, therm_nominal, b_coefficient, series_resistor=SERIES_RESISTOR):
+        self.therm_nominal = therm_nominal
+        self.b_coefficient = b_coefficient
+        adc = np.arange(ADC_MAX + 1, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resistance = series_resistor / (ADC_MAX / adc - 1)
+            steinhart = np.log(resistance / therm_nominal) / b_coefficient + 1.0 / (NOMINAL_TEMP + 273.15)
+            temperature = 1.0 / steinhart - 273.15
+        temperature[0] = DISCONNECTED_TEMP  # ADC reading of 0 is invalid
+        temperature[DISCONNECTED_ADC + 1:] = DISCONNECTED_TEMP
+        self.temperature = temperature
+        self.temperature.flags.writeable = False
+
+        # Temperature decreases with ADC value, so store the valid range in ascending temperature order for searching
+        self._valid_adc = np.flatnonzero(temperature != DISCONNECTED_TEMP)[::-1]
+        self._valid_temperature = temperature[self._valid_adc]
+
+    def adcToTemp(self, adc):
+        """Convert one ADC reading or an array of readings (e.g. averaged or logged telemetry) to °C."""
+        index = np.clip(np.rint(adc), 0, ADC_MAX).astype(np.intp)
+        temperature = self.temperature[index]
+        if np.ndim(temperature) == 0:
+            return float(temperature)
+        return temperature
+
+    def tempToAdc(self, temperature):
+        """Return the ADC reading whose table temperature is closest to each temperature.
+
+        Round trips through the table are exact: tempToAdc(adcToTemp(adc)) == adc for every valid ADC reading.
+        """
+        temperature = np.asarray(temperature, dtype=np.float64)
+        index = np.searchsorted(self._valid_temperature, temperature)
+        index = np.clip(index, 1, len(self._valid_temperature) - 1)
+        lower = self._valid_temperature[index - 1]
+        upper = self._valid_temperature[index]
+        index -= (temperature - lower) < (upper - temperature)
+        adc = self._valid_adc[index]
+        if adc.ndim == 0:
+            return int(adc)
+        return adc
+
+
+def getTable(external=False):
+    if external:
+        key = (EXT_THERMISTOR_NOMINAL, EXT_B_COEFFICIENT)
+    else:
+        key = (PCB_THERMISTOR_NOMINAL, PCB_B_COEFFICIENT)
+    try:
+        return _tables[key]
+    except KeyError:
+        _tables[key] = ThermistorTable(*key)
+        return _tables[key]
+
+
+def setExternalThermistor(therm_nominal, b_coefficient):
+    global EXT_THERMISTOR_NOMINAL
+    global EXT_B_COEFFICIENT
+    EXT_THERMISTOR_NOMINAL = therm_nominal
+    EXT_B_COEFFICIENT = b_coefficient
+
+
+def adcToTemp(adc, external=False):
+    return getTable(external).adcToTemp(adc)
+
+
+def tempToAdc(temperature, external=False):
+    return getTable(external).tempToAdc(temperature)
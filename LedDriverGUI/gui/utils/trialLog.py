@@ -0,0 +1,140 @@
+import csv
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LOG_DIRECTORY = "sessions"  # Subfolder of the data folder holding the session logs
+SESSION = "session"
+TRIAL = "trial"
+DISCARD = "discard"
+EXPORTED = "exported"
+FINALIZED = "finalized"
+
+
+class TrialLog:
+    """Append-only log of one experiment session, so no trial is lost if the program crashes or the power goes out.
+
+    Each entry is one JSON object per line: the session info, each trial as it is recorded, a tombstone for each
+    discarded trial, a checkpoint for each export during the session, and a final entry once the session has ended. Entries are written and flushed to the OS
+    straight away (a few µs, so the trial loop is never delayed) and fsynced on a background thread. A log without the
+    final entry is an unfinished session, which recoverSessions() exports on the next start - over its last checkpoint
+    export if it has one, so the session is never stored twice.
+    """
+
+    def __init__(self, path, session_info=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sync_queue = ThreadPoolExecutor(max_workers=1)
+        self._file = open(self.path, "a+", encoding="utf-8")
+        # Start a fresh line if the last entry was cut short by a crash
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+        self.write_times = []  # Seconds spent in each write() call
+        if session_info is not None:
+            self.write(SESSION, info=session_info)
+
+    def write(self, entry_type, **fields):
+        start = time.perf_counter()
+        line = json.dumps({"type": entry_type, "time": time.time(), **fields}, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        self._sync_queue.submit(self._sync)
+        self.write_times.append(time.perf_counter() - start)
+
+    def _sync(self):
+        # Not under the lock, so a write never waits for the disk - close() waits for pending syncs before closing
+        os.fsync(self._file.fileno())
+
+    def recordTrial(self, trial):
+        self.write(TRIAL, trial=trial)
+
+    def discardTrial(self, trial_number):
+        self.write(DISCARD, trial_number=trial_number)
+
+    def checkpoint(self, csv_path):
+        """Note an export during the session - the log stays open for the trials that follow"""
+        self.write(EXPORTED, csv_path=csv_path)
+
+    def finalize(self, csv_path):
+        self.write(FINALIZED, csv_path=csv_path)
+        self.close()
+
+    def close(self):
+        self._sync_queue.shutdown(wait=True)  # Everything written is on disk once this returns
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+
+def readLog(path):
+    """Returns (session info, trials without the discarded ones, finalized, CSV path of the last checkpoint or None),
+    ignoring a last line cut short by a crash"""
+    info = {}
+    trials = []
+    finalized = False
+    exported = None
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry["type"] == SESSION:
+                info = entry["info"]
+            elif entry["type"] == TRIAL:
+                trials.append(entry["trial"])
+            elif entry["type"] == DISCARD:
+                # Tombstone for the most recent trial with this number
+                for index in range(len(trials) - 1, -1, -1):
+                    if trials[index]["trial_number"] == entry["trial_number"]:
+                        del trials[index]
+                        break
+            elif entry["type"] == EXPORTED:
+                exported = entry["csv_path"]
+            elif entry["type"] == FINALIZED:
+                finalized = True
+    return info, trials, finalized, exported
+
+
+def writeCsvAtomic(path, rows):
+    """Write rows to a CSV file in one step - a crash leaves either the complete file or none"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+    os.replace(tmp_path, path)
+
+
+def recoverSessions(data_directory):
+    """Export the trials of every unfinished session log to a CSV file. Returns the paths of the recovered files
+
+    A session exported during the run is written over its last export, which then holds all of its trials, rather than
+    to a second file that would be imported as another session.
+    """
+    recovered = []
+    for path in sorted(glob.glob(os.path.join(data_directory, LOG_DIRECTORY, "*.jsonl"))):
+        info, trials, finalized, exported = readLog(path)
+        if finalized:
+            continue
+        csv_path = None
+        if trials:
+            if exported is not None:
+                csv_path = os.path.join(data_directory, os.path.basename(exported))
+            else:
+                name = os.path.splitext(os.path.basename(path))[0]
+                csv_path = os.path.join(data_directory, f"{name}_recovered.csv")
+            writeCsvAtomic(csv_path, trials)
+            recovered.append(csv_path)
+        log = TrialLog(path)
+        log.finalize(csv_path)
+    return recovered
@@ -0,0 +1,144 @@
+"""
+Phase scheduler for the anomaloscope trial loop, timed on the monotonic high-resolution clock (time.perf_counter).
+
+Each phase ends at a deadline computed from the scheduled onset of the phase, not from when its timer happened to fire,
+so a late timer on a busy GUI thread shortens the next wait instead of adding up over the session. The timer fires a
+little early and the last few ms are waited out on the clock. The scheduled and actual time of every phase onset and
+offset, and of the first display frame and LED update in each phase, are recorded for export.
+"""
+import os
+import time
+from PyQt5 import QtCore
+
+from .trialLog import writeCsvAtomic
+
+TIMING_DIRECTORY = "timing"  # Subfolder of the data folder holding the timing of each session
+SPIN_MARGIN = 0.002  # s before a deadline the timer fires, the rest is waited out on the clock
+STIMULUS_PHASE = "stimulus"  # Phase showing the bipartite field, timed for stimulus_duration_s
+PHASE_ONSET = "onset"
+PHASE_OFFSET = "offset"
+INTERRUPTED = "interrupted"  # Phase ended before its deadline by the subject
+DISPLAY = "display"  # First frame painted in a phase
+LEDS = "leds"  # First LED update sent in a phase
+
+
+class TrialScheduler(QtCore.QObject):
+    # Emitted when a phase reaches its deadline
+    phase_finished = QtCore.pyqtSignal()
+
+    def __init__(self, clock=time.perf_counter):
+        super(TrialScheduler, self).__init__()
+        self.clock = clock
+        self.timer = QtCore.QTimer()
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._onTimeout)
+        self.events = []  # One dict per timing event, see _record()
+        self.trial = 0
+        self.phase = None
+        self.onset = None  # Scheduled onset of the current phase
+        self.deadline = None  # Scheduled end of the current phase, None while no phase is timed
+        self.previous_deadline = None  # Scheduled end of the last phase, if it ran to its deadline
+        self._first = set()  # Events still to be recorded for the first time in this phase
+
+    def reset(self):
+        self.stop()
+        self.events = []
+
+    def startPhase(self, trial, phase, duration, follows_previous=True):
+        """Start a phase of duration seconds.
+
+        :param follows_previous: the phase starts when the previous one was scheduled to end, so timing errors don't
+            accumulate - False to start it now, e.g. after a match ends a phase early
+        """
+        now = self.clock()
+        if follows_previous and self.previous_deadline is not None:
+            onset = self.previous_deadline
+        else:
+            onset = now
+        self.trial = trial
+        self.phase = phase
+        self.onset = onset
+        self.deadline = onset + duration
+        self._first = {DISPLAY, LEDS}
+        self._record(PHASE_ONSET, onset, now)
+        self._wait()
+
+    def stop(self):
+        """End the current phase now, e.g. when the subject accepts a match"""
+        self._end(INTERRUPTED)
+
+    def _end(self, event):
+        self.timer.stop()
+        if self.deadline is not None:
+            self._record(event, self.deadline, self.clock())
+        self.previous_deadline = self.deadline if event == PHASE_OFFSET else None
+        self.deadline = None
+
+    def markDisplay(self):
+        """Call when a frame has been painted - the first one in each phase is recorded"""
+        self._mark(DISPLAY)
+
+    def markLeds(self):
+        """Call when an LED update has been sent - the first one in each phase is recorded"""
+        self._mark(LEDS)
+
+    def _mark(self, event):
+        if self.deadline is not None and event in self._first:
+            self._first.discard(event)
+            self._record(event, self.onset, self.clock())
+
+    def _record(self, event, scheduled, actual):
+        self.events.append({
+            "trial": self.trial,
+            "phase": self.phase,
+            "event": event,
+            "scheduled_s": scheduled,
+            "actual_s": actual,
+            "error_ms": (actual - scheduled) * 1000,
+        })
+
+    def _wait(self):
+        remaining = self.deadline - self.clock()
+        if remaining > SPIN_MARGIN:
+            self.timer.start(int((remaining - SPIN_MARGIN) * 1000))
+        else:
+            self._onTimeout()
+
+    def _onTimeout(self):
+        if self.deadline is None:
+            return
+        if self.deadline - self.clock() > SPIN_MARGIN:
+            self._wait()  # Woke up too early
+            return
+        while self.clock() < self.deadline:
+            pass
+        self._end(PHASE_OFFSET)
+        self.phase_finished.emit()
+
+    def trialTiming(self, trial):
+        """Timing summary of one trial: largest phase timing error (ms) and time the stimulus was shown (s)"""
+        events = [event for event in self.events if event["trial"] == trial]
+        phase_errors = [abs(event["error_ms"]) for event in events if event["event"] in (PHASE_ONSET, PHASE_OFFSET)]
+        onsets = [event for event in events if event["event"] == PHASE_ONSET]
+        ends = [event for event in events if event["event"] in (PHASE_OFFSET, INTERRUPTED)]
+        stimulus_time = sum(end["actual_s"] - onset["actual_s"] for onset, end in zip(onsets, ends)
+                            if onset["phase"] == STIMULUS_PHASE)
+        if len(onsets) > len(ends) and onsets[-1]["phase"] == STIMULUS_PHASE:
+            stimulus_time += self.clock() - onsets[-1]["actual_s"]  # Still showing
+        return {
+            "timing_error_ms": round(max(phase_errors, default=0.0), 3),
+            "stimulus_duration_s": round(stimulus_time, 4),
+        }
+
+    def exportTiming(self, path):
+        """Write every timing event to a CSV file, with times relative to the first event"""
+        if not self.events:
+            return None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        start = self.events[0]["actual_s"]
+        rows = [dict(event, scheduled_s=round(event["scheduled_s"] - start, 6),
+                     actual_s=round(event["actual_s"] - start, 6), error_ms=round(event["error_ms"], 3))
+                for event in self.events]
+        writeCsvAtomic(path, rows)
+        return path
@@ -1,29 +1,20 @@
 from datetime import datetime
 import os
-import csv
 from collections import OrderedDict
 from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtCore import pyqtSignal, QTimer, QThread
 from .bipartiteFieldWindow import BipartiteFieldManager
+from ..utils.trialLog import TrialLog, recoverSessions, writeCsvAtomic, LOG_DIRECTORY
+from ..utils.resultsStore import ResultsStore, sessionName, RESULTS_DATABASE
+from ..utils.matchStatistics import matchStatistics
+from ..utils.adaptiveProcedure import AdaptiveMatchProcedure, percentToEncoder, TARGET_SIZE
+from ..utils.trialScheduler import TrialScheduler, STIMULUS_PHASE, TIMING_DIRECTORY
+from ..utils.audioCues import AudioCueEngine, MATCH, LIMIT_TOP, LIMIT_BOTTOM
+from ..calibration.rayleighTable import loadRayleighTable, loadBoardSweeps, COLORS
 import random
-import threading
-import platform
-from PyQt5.QtMultimedia import QSound
+import pandas as pd
 
-# Conditional import for winsound (Windows only)
-if platform.system() == "Windows":
-    import winsound
-else:
-    winsound = None
-
-
-def beep_sound(frequency):
-    if winsound is not None:
-        winsound.Beep(frequency, 750)
-    else:
-        # On macOS, we can use a simple print or system command
-        # For now, just print a message - you could also use os.system("afplay /System/Library/Sounds/Tink.aiff")
-        print(f"Beep sound at frequency {frequency}Hz (not implemented on macOS)")
+LIVE_BOOTSTRAP = 200  # Bootstrap resamples for the statistics shown during the experiment
 
 
 class TrialManager:
@@ -33,10 +24,21 @@ class TrialManager:
         self.trials = []
         self.experiment_info = {}
         self.data_directory = "anomaloscope_data"
+        self.trial_log = None  # Append-only log of the current session
+        self.export_path = None  # CSV every export of the current session is written to
 
         # Ensure data directory exists
-        if not os.path.exists(self.data_directory):
-            os.makedirs(self.data_directory)
+        os.makedirs(os.path.join(self.data_directory, LOG_DIRECTORY), exist_ok=True)
+
+        # Export any session that was interrupted before its data was exported
+        for filepath in recoverSessions(self.data_directory):
+            print(f"Recovered unfinished session to {filepath}")
+
+        # Results of every session for analysis, including CSVs saved before the store existed
+        self.results = ResultsStore(os.path.join(self.data_directory, RESULTS_DATABASE))
+        imported = self.results.importDirectory(self.data_directory)
+        if imported:
+            print(f"Imported {len(imported)} CSV files into {self.results.path}")
 
     def initialize_experiment(self, subject_id, total_trials):
         """Initialize a new experiment session."""
@@ -47,6 +49,12 @@ class TrialManager:
             'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'experiment_date': datetime.now().strftime('%Y-%m-%d')
         }
+        if self.trial_log is not None:
+            self.trial_log.close()  # Left unfinished - recovered on the next start
+        self.export_path = None
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        log_path = os.path.join(self.data_directory, LOG_DIRECTORY, f"anomaloscope_{subject_id}_{timestamp}.jsonl")
+        self.trial_log = TrialLog(log_path, self.experiment_info)
 
     def record_trial(self, trial_data):
         """Record a single trial's data."""
@@ -62,37 +70,43 @@ class TrialManager:
             ('green_luminance_cd_m2', trial_data['green_luminance_measurement']),
             ('yellow_luminance_cd_m2', trial_data['yellow_luminance_measurement']),
             ('red_luminance_cd_m2', trial_data['red_luminance_measurement']),
+            ('green_current', trial_data.get('green_current')),
+            ('yellow_current', trial_data.get('yellow_current')),
+            ('red_current', trial_data.get('red_current')),
             ('viewing_mode', trial_data['viewing_mode']),
             ('randomization_mode', trial_data.get('randomization_mode', 'Fixed')),
             ('color_assignment', trial_data.get('color_assignment', 0)),
-            ('match_timestamp', trial_data['timestamp'])
+            ('match_timestamp', trial_data['timestamp']),
+            ('timing_error_ms', trial_data.get('timing_error_ms')),
+            ('stimulus_duration_s', trial_data.get('stimulus_duration_s'))
         ])
 
         self.trials.append(complete_trial_data)
+        if self.trial_log is not None:
+            self.trial_log.recordTrial(complete_trial_data)
 
-    def export_to_csv(self):
-        """Export trial data to CSV file."""
+    def export_to_csv(self, finalize=False):
+        """Export trial data to CSV file - finalize ends the session log, otherwise it stays open for later trials."""
         if not self.trials:
             raise ValueError("No trial data to export")
 
-        # Generate filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        subject_id = self.experiment_info.get('subject_id', 'unknown')
-        filename = f"anomaloscope_{subject_id}_{timestamp}.csv"
-        filepath = os.path.join(self.data_directory, filename)
-
-        # Write CSV
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            if self.trials:
-                fieldnames = list(self.trials[0].keys())
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-                # Write header
-                writer.writeheader()
-
-                # Write trial data
-                for trial in self.trials:
-                    writer.writerow(trial)
+        # Generate the filename on the first export - later exports of the session replace it, so it's stored once
+        if self.export_path is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            subject_id = self.experiment_info.get('subject_id', 'unknown')
+            filename = f"anomaloscope_{subject_id}_{timestamp}.csv"
+            self.export_path = os.path.join(self.data_directory, filename)
+        filepath = self.export_path
+
+        # Write CSV, then mark the session log as finished, or note the export if the session continues
+        writeCsvAtomic(filepath, self.trials)
+        self.results.addSession(sessionName(filepath), self.trials, filepath)
+        if self.trial_log is not None:
+            if finalize:
+                self.trial_log.finalize(filepath)
+                self.trial_log = None
+            else:
+                self.trial_log.checkpoint(filepath)
 
         return filepath
 
@@ -114,11 +128,18 @@ class TrialManager:
             'subject_id': self.experiment_info.get('subject_id'),
             'experiment_date': self.experiment_info.get('experiment_date'),
             'yellow_luminance_stats': self._calculate_stats('yellow_luminance_percent'),
-            'red_green_ratio_stats': self._calculate_stats('red_green_ratio')
+            'red_green_ratio_stats': self._calculate_stats('red_green_ratio'),
+            'match_statistics': self.match_statistics()
         }
 
         return summary
 
+    def match_statistics(self, n_bootstrap=LIVE_BOOTSTRAP):
+        """Mean, ellipse, matching range and bootstrap CI of the matches so far (a matchStatistics row), or None."""
+        if not self.trials:
+            return None
+        return matchStatistics(pd.DataFrame(self.trials), 'subject_id', n_bootstrap=n_bootstrap).iloc[0]
+
     def _calculate_stats(self, field):
         """Calculate basic statistics for a field."""
         values = [trial[field] for trial in self.trials]
@@ -137,11 +158,16 @@ class TrialManager:
         """Remove the most recently recorded trial."""
         if self.trials:
             removed_trial = self.trials.pop()
+            if self.trial_log is not None:
+                self.trial_log.discardTrial(removed_trial['trial_number'])
             print(f"Removed trial {removed_trial['trial_number']} from data")
             return removed_trial
         return None
 
 
+REFERENCE_CURRENTS_GYR = [10000, 65535, 16811]  # Currents the LED luminances are measured at
+
+
 class AnomaloscopeController(QtCore.QObject):
     """Controller for anomaloscope LED management and user input."""
 
@@ -177,7 +203,8 @@ class AnomaloscopeController(QtCore.QObject):
         self.current_rate_index = 0
 
         # Currents for the LEDs
-        self.currents_GYR = [10000, 65535, 16811]  # int(65535//2/1.15 * 1.18) //2
+        self.currents_GYR = list(REFERENCE_CURRENTS_GYR)
+        self.rayleigh_table = None  # Luminance balanced mixture table, see set_rayleigh_table()
 
         # Track if encoders have been initialized
         self.encoders_initialized = False
@@ -194,6 +221,8 @@ class AnomaloscopeController(QtCore.QObject):
         self.update_timer.setSingleShot(True)
 
         self.match_accept_enabled = True  # Prevent double match
+        self.pending_frame_time = None  # timer() of the first encoder frame not yet sent to the LEDs
+        self.audio_cues = AudioCueEngine()  # Limit and match beeps, played on one worker thread
 
     def start_monitoring(self):
         """Start monitoring controller inputs."""
@@ -204,6 +233,15 @@ class AnomaloscopeController(QtCore.QObject):
         """Stop monitoring controller inputs."""
         self.monitoring = False
         self.update_timer.stop()
+        latency = self.gui.ser.ledLatencyStats()
+        if latency is not None:
+            print(f"Encoder to LED latency: mean {latency['mean_ms']:.2f} ms, 95th percentile "
+                  f"{latency['p95_ms']:.2f} ms, max {latency['max_ms']:.2f} ms over {latency['updates']} updates")
+        cue_latency = self.audio_cues.latencyStats()
+        if cue_latency is not None:
+            print(f"Audio cue latency: mean {cue_latency['mean_ms']:.2f} ms, 95th percentile "
+                  f"{cue_latency['p95_ms']:.2f} ms, max {cue_latency['max_ms']:.2f} ms over {cue_latency['cues']} "
+                  f"cues ({cue_latency['dropped']} dropped)")
         try:
             self.gui.controller_status_signal.disconnect(self.update_controller_status)
         except:
@@ -235,8 +273,10 @@ class AnomaloscopeController(QtCore.QObject):
 
     def setStartingValuesRandom(self):
         """Set encoders to random starting values."""
-        left_start = random.randint(-32768, 32767)
-        right_start = random.randint(-32768, 32767)
+        self.setStartingValues(random.randint(-32768, 32767), random.randint(-32768, 32767))
+
+    def setStartingValues(self, left_start, right_start):
+        """Set the encoders to given starting values (left: yellow, right: red/green ratio)."""
         self.previous_encoder_values = {"Left": left_start, "Right": right_start}
         self.encoder_positions = {"Left": left_start, "Right": right_start}
         self.current_yellow_lum_int16 = left_start
@@ -251,7 +291,7 @@ class AnomaloscopeController(QtCore.QObject):
         self.gui.controller_status_dynamic_dict["Encoder"]["Right"] = right_start
         self.encoders_initialized = True
         self.update_leds()
-        print(f"Starting values set to random: Left={left_start}, Right={right_start}")
+        print(f"Starting values set to: Left={left_start}, Right={right_start}")
 
     def cycleRate(self):
         """Cycle through rate multipliers."""
@@ -309,6 +349,8 @@ class AnomaloscopeController(QtCore.QObject):
 
         # Update LED values based on encoder changes
         if encoder_changed:
+            if self.pending_frame_time is None:
+                self.pending_frame_time = controller_status.get("Frame Time")
             self.update_from_encoders()
 
         # Check for button presses (match acceptance)
@@ -405,11 +447,7 @@ class AnomaloscopeController(QtCore.QObject):
     def _beep_at_limit(self, limit_type):
         """Play a beep sound when a limit is reached."""
         print(f"Limit reached: {limit_type} at maximum")
-        if "top" in limit_type:
-            beep_thread = threading.Thread(target=lambda: beep_sound(1200))
-        else:
-            beep_thread = threading.Thread(target=lambda: beep_sound(800))
-        beep_thread.start()
+        self.audio_cues.play(LIMIT_TOP if "top" in limit_type else LIMIT_BOTTOM)
 
     def schedule_led_update(self):
         """Schedule an LED update with rate limiting."""
@@ -434,6 +472,14 @@ class AnomaloscopeController(QtCore.QObject):
         self.last_update_time = QtCore.QDateTime.currentMSecsSinceEpoch()
         self.update_leds()
 
+    def set_rayleigh_table(self, table):
+        """Drive the LEDs from a precomputed Rayleigh match table (None for the linear PWM mapping)."""
+        self.rayleigh_table = table
+        if table is not None:
+            self.currents_GYR = [table.currents["green"], table.currents["yellow"], table.currents["red"]]
+        else:
+            self.currents_GYR = list(REFERENCE_CURRENTS_GYR)
+
     def update_leds(self):
         """Update physical LED outputs based on current values."""
         if self._updating:
@@ -441,12 +487,17 @@ class AnomaloscopeController(QtCore.QObject):
             QtCore.QTimer.singleShot(10, self.update_leds)
             return
 
-        # Calculate LED intensities
-        yellow_pwm = self.current_yellow_lum_int16 + 32768
+        if self.rayleigh_table is not None:
+            # Luminance balanced red-green mixture and yellow luminance, one table lookup per encoder value
+            red_pwm, green_pwm, yellow_pwm = self.rayleigh_table.lookup(
+                self.current_red_green_ratio_int16, self.current_yellow_lum_int16)
+        else:
+            # Calculate LED intensities
+            yellow_pwm = self.current_yellow_lum_int16 + 32768
 
-        # Red-green mixture: ratio determines split, but total is always 100%
-        red_pwm = self.current_red_green_ratio_int16 + 32768
-        green_pwm = 65535 - red_pwm
+            # Red-green mixture: ratio determines split, but total is always 100%
+            red_pwm = self.current_red_green_ratio_int16 + 32768
+            green_pwm = 65535 - red_pwm
 
         # Prepare PWM updates
         pwm_updates = {}
@@ -468,12 +519,10 @@ class AnomaloscopeController(QtCore.QObject):
 
         self._updating = True
         try:
-            # Update the status dictionary
-            for key, value in pwm_updates.items():
-                self.gui.status_dict[key] = value
-                print(f"Updating {key} to {value}")
-            # Update the driver with new PWM values
-            self.gui.ser.updateStatus(force_tx=True, override=True)
+            # Only the PWM packet is sent unless the channels or currents have changed
+            frame_time, self.pending_frame_time = self.pending_frame_time, None
+            self.gui.ser.updateLedStatus(pwm_updates, frame_time)
+            self.main_window.trial_scheduler.markLeds()
 
         finally:
             self._updating = False
@@ -481,9 +530,7 @@ class AnomaloscopeController(QtCore.QObject):
     def accept_match(self):
         """Handle match acceptance (button press)."""
         self.disable_match_accept()
-        # Play a sound (try QSound, fallback to system beep)
-        beep_thread = threading.Thread(target=lambda: beep_sound(1000))
-        beep_thread.start()
+        self.audio_cues.play(MATCH)
         match_data = {
             'yellow_luminance': self.current_yellow_lum_int16,
             'red_green_ratio': self.current_red_green_ratio_int16,
@@ -507,6 +554,7 @@ class AnomaloscopeController(QtCore.QObject):
     def cleanup(self):
         """Cleanup controller resources."""
         self.stop_monitoring()
+        self.audio_cues.close()
 
         # Turn off all LEDs
         pwm_updates = {}
@@ -565,15 +613,15 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.randomization_enabled = False
         self.current_color_assignment = 0  # 0: green top, magenta bottom; 1: magenta top, green bottom
         self.color_assignments = []  # Pre-generated balanced color assignments for all trials
+        self.adaptive_procedure = None  # Running match estimate of an adaptive session
 
         # Control mapping state
         self.spatial_controls_enabled = False  # False: fixed controls, True: spatial controls
 
         # Trial loop state
         self.current_trial_state = self.BEFORE_TRIAL_ADAPTATION
-        self.trial_loop_timer = QtCore.QTimer()
-        self.trial_loop_timer.timeout.connect(self._continue_trial_loop)
-        self.trial_loop_timer.setSingleShot(True)
+        self.trial_scheduler = TrialScheduler()
+        self.trial_scheduler.phase_finished.connect(self._continue_trial_loop)
 
         self.setupUI()
         self.connectSignals()
@@ -605,6 +653,18 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.trials_input.setValue(10)
         setup_layout.addRow("Number of Trials:", self.trials_input)
 
+        # Adaptive sessions stop once the mean match is known precisely enough, with the number of trials as a cap
+        self.adaptive_checkbox = QtWidgets.QCheckBox("Stop when the match is precise (trials above are the maximum)")
+        setup_layout.addRow("Adaptive Session:", self.adaptive_checkbox)
+
+        self.target_size_input = QtWidgets.QDoubleSpinBox()
+        self.target_size_input.setRange(0.5, 50.0)
+        self.target_size_input.setValue(TARGET_SIZE)
+        self.target_size_input.setDecimals(1)
+        self.target_size_input.setSuffix(" %")
+        self.target_size_input.setToolTip("Size of the 95% confidence region of the mean match at which to stop")
+        setup_layout.addRow("Target Precision:", self.target_size_input)
+
         setup_group.setLayout(setup_layout)
         main_layout.addWidget(setup_group)
 
@@ -813,10 +873,12 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.trial_info_label = QtWidgets.QLabel("No active trial")
         self.yellow_level_label = QtWidgets.QLabel("Yellow Level: --")
         self.red_green_ratio_label = QtWidgets.QLabel("Red:Green Ratio: --")
+        self.match_statistics_label = QtWidgets.QLabel("Session Matches: --")
 
         trial_layout.addWidget(self.trial_info_label)
         trial_layout.addWidget(self.yellow_level_label)
         trial_layout.addWidget(self.red_green_ratio_label)
+        trial_layout.addWidget(self.match_statistics_label)
         trial_group.setLayout(trial_layout)
         main_layout.addWidget(trial_group)
 
@@ -825,7 +887,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         export_layout = QtWidgets.QHBoxLayout()
 
         self.export_button = QtWidgets.QPushButton("Export Data to CSV")
-        self.export_button.clicked.connect(self.exportData)
+        self.export_button.clicked.connect(lambda: self.exportData())
 
         self.discard_last_trial_button = QtWidgets.QPushButton("Discard Last Trial")
         self.discard_last_trial_button.setStyleSheet("background-color: #ffcccc; font-weight: bold;")
@@ -950,6 +1012,24 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
             # Magenta top, green bottom (swapped)
             return magenta_color, green_color
 
+    def loadRayleighTable(self):
+        """Use the mixture table built from the PWM sweep of each LED's board - only rebuilt when the sweeps change.
+
+        Without a sweep of every LED the LEDs keep the linear PWM mapping and the reference currents.
+        """
+        reference_currents = dict(zip(COLORS, REFERENCE_CURRENTS_GYR))
+        boards = {color: self.led_config[f'{color}_board'] for color in COLORS}
+        calibration = loadBoardSweeps(boards, reference_currents)
+        if calibration is None:
+            print("No PWM sweeps of the anomaloscope LEDs - using the linear PWM mapping")
+            self.controller_manager.set_rayleigh_table(None)
+            return
+        luminances, gamma_curves = calibration
+        table_path = os.path.join(self.trial_manager.data_directory, 'rayleigh_table.npz')
+        table = loadRayleighTable(table_path, luminances, reference_currents, gamma_curves=gamma_curves)
+        self.controller_manager.set_rayleigh_table(table)
+        print(f"Rayleigh table: mixture luminance {table.mixture_luminance:.2f} cd/m², currents {table.currents}")
+
     def startExperiment(self):
         """Start the anomaloscope experiment."""
         # Validate inputs
@@ -960,11 +1040,16 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.subject_id = self.subject_input.text().strip()
         self.total_trials = self.trials_input.value()
         self.current_trial = 0
+        if self.adaptive_checkbox.isChecked():
+            self.adaptive_procedure = AdaptiveMatchProcedure(self.target_size_input.value(), self.total_trials)
+        else:
+            self.adaptive_procedure = None
 
         # Update luminance values from UI
         self.green_luminance = self.green_luminance_input.value()
         self.yellow_luminance = self.yellow_luminance_input.value()
         self.red_luminance = self.red_luminance_input.value()
+        self.loadRayleighTable()
 
         # Setup UI for experiment
         self.experiment_active = True
@@ -972,6 +1057,8 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.stop_button.setEnabled(True)
         self.subject_input.setEnabled(False)
         self.trials_input.setEnabled(False)
+        self.adaptive_checkbox.setEnabled(False)
+        self.target_size_input.setEnabled(False)
         self.before_trial_adaptation_input.setEnabled(False)
         self.stimulus_time_input.setEnabled(False)
         self.during_trial_adaptation_input.setEnabled(False)
@@ -995,6 +1082,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
 
         # Initialize trial manager
         self.trial_manager.initialize_experiment(self.subject_id, self.total_trials)
+        self.updateMatchStatistics()
 
         # Pre-generate balanced color assignments if randomization is enabled
         if self.randomization_enabled:
@@ -1005,8 +1093,10 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         # Start controller monitoring
         self.controller_manager.start_monitoring()
 
-        # Create bipartite field window on second screen
-        self.bipartite_manager.createBipartiteWindow()
+        # Create bipartite field window on second screen, timestamping the frames
+        self.trial_scheduler.reset()
+        if self.bipartite_manager.createBipartiteWindow():
+            self.bipartite_manager.bipartite_window.paint_callback = self.trial_scheduler.markDisplay
 
         # Set initial radius
         if self.bipartite_manager.bipartite_window:
@@ -1021,6 +1111,11 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         if self.current_trial >= self.total_trials:
             self.finishExperiment()
             return
+        if self.adaptive_procedure is not None and self.adaptive_procedure.isDone():
+            print(f"Adaptive session done after {self.current_trial} trials: confidence region "
+                  f"{self.adaptive_procedure.confidenceSize():.2f} % (target {self.adaptive_procedure.target_size} %)")
+            self.finishExperiment()
+            return
 
         self.current_trial += 1
         self.updateTrialDisplay()
@@ -1049,7 +1144,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
                 f"Stimulus time - Adjust controllers and press button when colors match ({duration} s)")
 
         # Start timer for next phase
-        self.trial_loop_timer.start(duration * 1000)
+        self.trial_scheduler.startPhase(self.current_trial, "adaptation", duration)
 
     def _start_stimulus_time(self, randomize_controls=True):
         """Start the stimulus time phase (bipartite field visible)."""
@@ -1069,7 +1164,11 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
 
         # Randomize controls only on first stimulus presentation of a trial
         if randomize_controls:
-            self.controller_manager.setStartingValuesRandom()
+            if self.adaptive_procedure is not None:
+                red_start, yellow_start = self.adaptive_procedure.startingValues()
+                self.controller_manager.setStartingValues(percentToEncoder(yellow_start), percentToEncoder(red_start))
+            else:
+                self.controller_manager.setStartingValuesRandom()
 
         # Enable controls
         self.controller_manager.enable_all_controls()
@@ -1080,7 +1179,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
             f"Stimulus time - Adjust controllers and press button when colors match ({duration} s)")
 
         # Start timer for next phase
-        self.trial_loop_timer.start(duration * 1000)
+        self.trial_scheduler.startPhase(self.current_trial, STIMULUS_PHASE, duration)
 
     def _start_during_trial_adaptation(self):
         """Start the during trial adaptation phase (black field)."""
@@ -1100,7 +1199,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.status_label.setText(f"Between matches and during trial adaptation (black field)... ({duration} s)")
 
         # Start timer for next phase
-        self.trial_loop_timer.start(duration * 1000)
+        self.trial_scheduler.startPhase(self.current_trial, "between", duration)
 
     def _continue_trial_loop(self):
         """Continue the trial loop based on current state."""
@@ -1127,7 +1226,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
             return
 
         # Stop the trial loop timer
-        self.trial_loop_timer.stop()
+        self.trial_scheduler.stop()
 
         # Disable controls immediately
         self.controller_manager.disable_all_controls()
@@ -1147,8 +1246,15 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
             'color_assignment': self.current_color_assignment,  # 0: green top, 1: magenta top
             'timestamp': match_data['timestamp']
         }
+        # Currents the LEDs were driven at - set by the Rayleigh table if there is one
+        trial_data.update(zip(['green_current', 'yellow_current', 'red_current'],
+                              self.controller_manager.currents_GYR))
+        trial_data.update(self.trial_scheduler.trialTiming(self.current_trial))
 
         self.trial_manager.record_trial(trial_data)
+        if self.adaptive_procedure is not None:
+            last_trial = self.trial_manager.trials[-1]
+            self.adaptive_procedure.addMatch(last_trial['red_percentage'], last_trial['yellow_luminance_percent'])
         self.trial_completed_signal.emit(trial_data)
 
     def onTrialCompleted(self, trial_data):
@@ -1161,6 +1267,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
 
         # Show brief feedback
         self.status_label.setText(f"Trial {self.current_trial} completed - Match accepted!")
+        self.updateMatchStatistics()
 
         # Start next trial after brief delay
         QtCore.QTimer.singleShot(1500, self.startNextTrial)
@@ -1183,6 +1290,17 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.red_green_ratio_label.setText(
             f"Red:Green Ratio: {current_values['red_green_ratio']:.1f} : {100-current_values['red_green_ratio']:.1f}")
 
+    def updateMatchStatistics(self):
+        """Show the mean match, its confidence interval and the matching range of the session so far."""
+        stats = self.trial_manager.match_statistics()
+        if stats is None:
+            self.match_statistics_label.setText("Session Matches: --")
+            return
+        self.match_statistics_label.setText(
+            f"Session Matches ({int(stats['n'])}): Red {stats['mean_x']:.1f}% "
+            f"[{stats['ci_x_low']:.1f}-{stats['ci_x_high']:.1f}], range {stats['min_x']:.1f}-{stats['max_x']:.1f}; "
+            f"Yellow {stats['mean_y']:.1f}% [{stats['ci_y_low']:.1f}-{stats['ci_y_high']:.1f}]")
+
     def stopExperiment(self):
         """Stop the experiment early."""
         if self.experiment_active:
@@ -1201,7 +1319,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.controller_manager.stop_monitoring()
 
         # Stop trial loop timer
-        self.trial_loop_timer.stop()
+        self.trial_scheduler.stop()
 
         # Close bipartite field window
         self.bipartite_manager.closeWindow()
@@ -1211,6 +1329,8 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         self.stop_button.setEnabled(False)
         self.subject_input.setEnabled(True)
         self.trials_input.setEnabled(True)
+        self.adaptive_checkbox.setEnabled(True)
+        self.target_size_input.setEnabled(True)
         self.before_trial_adaptation_input.setEnabled(True)
         self.stimulus_time_input.setEnabled(True)
         self.during_trial_adaptation_input.setEnabled(True)
@@ -1231,8 +1351,8 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         completed_trials = len(self.trial_manager.get_trials())
         self.status_label.setText(f"Experiment completed: {completed_trials} trials recorded")
 
-        # Auto-export data
-        self.exportData()
+        # Auto-export data and close the session log
+        self.exportData(finalize=True)
 
     def discardLastTrial(self):
         """Discard the most recently completed trial."""
@@ -1270,6 +1390,8 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
         if reply == QtWidgets.QMessageBox.Yes:
             # Remove the last trial from the trial manager
             self.trial_manager.remove_last_trial()
+            if self.adaptive_procedure is not None:
+                self.adaptive_procedure.removeLastMatch()
 
             # Update progress bar to reflect the removed trial
             completed_trials = len(self.trial_manager.get_trials())
@@ -1278,19 +1400,23 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
 
             # Update status
             self.status_label.setText(f"Trial {last_trial_number} discarded. {completed_trials} trials remaining.")
+            self.updateMatchStatistics()
 
             # Disable discard button if no more trials
             if completed_trials == 0:
                 self.discard_last_trial_button.setEnabled(False)
 
-    def exportData(self):
-        """Export collected data to CSV."""
+    def exportData(self, finalize=False):
+        """Export collected data to CSV - finalize once the experiment has finished."""
         if not self.trial_manager.has_data():
             QtWidgets.QMessageBox.information(self, "No Data", "No trial data to export")
             return
 
         try:
-            filename = self.trial_manager.export_to_csv()
+            filename = self.trial_manager.export_to_csv(finalize)
+            timing_path = os.path.join(self.trial_manager.data_directory, TIMING_DIRECTORY,
+                                       sessionName(filename) + "_timing.csv")
+            self.trial_scheduler.exportTiming(timing_path)
             QtWidgets.QMessageBox.information(
                 self, "Export Complete",
                 f"Data exported to: {filename}"
@@ -1316,7 +1442,7 @@ class AnomaloscopeWindow(QtWidgets.QWidget):
 
         self.controller_manager.cleanup()
         self.bipartite_manager.closeWindow()
-        self.trial_loop_timer.stop()
+        self.trial_scheduler.stop()
         self.window_closed = True
         event.accept()
 
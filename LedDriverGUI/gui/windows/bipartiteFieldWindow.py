@@ -2,9 +2,16 @@ from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QGraphicsBlurEffect
 from screeninfo import get_monitors
-from PIL import Image, ImageDraw
+from PIL import Image, ImageChops, ImageDraw
 from PIL.ImageFilter import GaussianBlur
 import math
+import time
+import numpy as np
+
+from ..utils.ringBuffer import RingBuffer
+
+BLUR_RADIUS = 2  # Gaussian blur (render pixels) softening the edge of the field
+FRAME_TIME_HISTORY = 1000  # Number of frame render times kept for frameTimeStats()
 
 
 def getSecondScreenGeometry():
@@ -16,6 +23,94 @@ def getSecondScreenGeometry():
         return monitors[0]
 
 
+class BipartiteRenderer:
+    """Renders the bipartite field from precomputed masks into a reused image buffer.
+
+    The blurred and resized alpha mask of each half of the field is computed once per (radius, window size), with the
+    same PIL drawing, blur and Lanczos resize as before. A colour change is then only a multiply-add of the two masks into
+    the buffer, which a QImage wraps without copying.
+    """
+
+    def __init__(self, render_width, render_height):
+        self.render_width = render_width
+        self.render_height = render_height
+        # (radius, width, height) -> (bounding box of the field, float32 array (n_pixels, 3) of each half's alpha inside
+        # it and 1 for the alpha channel) - everything outside the box is black
+        self._masks = {}
+        self._colors = None  # (top color, bottom color) the buffer was last rendered with
+        self._radius = None
+        self._buffer = None
+        self._scratch = None
+        self.image = None
+        self.frame_times = RingBuffer(FRAME_TIME_HISTORY)  # Seconds spent rendering each frame
+
+    def halfImage(self, radius, start_angle):
+        image = Image.new('L', (self.render_width, self.render_height), 0)
+        center_x = self.render_width // 2
+        center_y = self.render_height // 2
+        bbox = (center_x - radius, center_y - radius, center_x + radius, center_y + radius)
+        ImageDraw.Draw(image).pieslice(bbox, start_angle, start_angle + 180, fill=255)
+        return image
+
+    def masks(self, radius, width, height):
+        key = (radius, width, height)
+        if key not in self._masks:
+            # The second half is drawn over the first, so the pixels on the dividing line belong to it
+            second = self.halfImage(radius, 180)
+            first = ImageChops.subtract(self.halfImage(radius, 0), second)
+            halves = [np.asarray(image.filter(GaussianBlur(radius=BLUR_RADIUS))
+                                 .resize((width, height), Image.Resampling.LANCZOS), dtype=np.float32) / 255
+                      for image in [first, second]]
+            rows = np.flatnonzero(np.any(halves[0] + halves[1] > 0, axis=1))
+            columns = np.flatnonzero(np.any(halves[0] + halves[1] > 0, axis=0))
+            bbox = (rows[0], rows[-1] + 1, columns[0], columns[-1] + 1) if len(rows) else (0, 0, 0, 0)
+            top, bottom, left, right = bbox
+            masks = np.ones(((bottom - top) * (right - left), 3), dtype=np.float32)
+            for column, half in enumerate(halves):
+                masks[:, column] = half[top:bottom, left:right].ravel()
+            self._masks[key] = (bbox, masks)
+        return self._masks[key]
+
+    def render(self, top_color, bottom_color, radius, width, height) -> QtGui.QImage:
+        """Image of the field, only redrawn if the colours, radius or size have changed"""
+        colors = (tuple(top_color), tuple(bottom_color))
+        if self.image is not None and self._colors == colors and self._buffer.shape[:2] == (height, width) \
+                and self._radius == radius:
+            return self.image
+
+        start = time.perf_counter()
+        (top, bottom, left, right), masks = self.masks(radius, width, height)
+        if self._buffer is None or self._buffer.shape[:2] != (height, width) or self._radius != radius:
+            self._buffer = np.zeros((height, width, 4), dtype=np.uint8)
+            self._buffer[..., 3] = 255
+            self._scratch = np.empty((len(masks), 4), dtype=np.float32)
+            self.image = QtGui.QImage(self._buffer.data, width, height, self._buffer.strides[0],
+                                      QtGui.QImage.Format_RGBX8888)
+
+        # Each pixel is first alpha * first color + second alpha * second color, with an opaque alpha channel.
+        # The 0.5 offset rounds to nearest when converting to 8 bit.
+        weights = np.zeros((3, 4), dtype=np.float32)
+        weights[0, :3] = colors[0]
+        weights[1, :3] = colors[1]
+        weights[2] = [0.5, 0.5, 0.5, 255.5]
+        np.dot(masks, weights, out=self._scratch)
+        np.clip(self._scratch, 0, 255, out=self._scratch)
+        self._buffer[top:bottom, left:right] = self._scratch.reshape(bottom - top, right - left, 4)
+
+        self._colors = colors
+        self._radius = radius
+        self.frame_times.append(time.perf_counter() - start)
+        return self.image
+
+    def frameTimeStats(self):
+        """Render time statistics (ms) of the recent frames, or None before the first frame"""
+        times = self.frame_times.data(0) * 1000
+        if len(times) == 0:
+            return None
+        return {'frames': len(times), 'mean_ms': float(times.mean()), 'p95_ms': float(np.percentile(times, 95)),
+                'max_ms': float(times.max()), 'last_ms': float(times[-1])}
+
+
 class BipartiteFieldWindow(QtWidgets.QWidget):
     """Fullscreen window displaying a bipartite field for anomaloscope experiments."""
 
@@ -44,6 +139,8 @@ class BipartiteFieldWindow(QtWidgets.QWidget):
 
         # Initialize radius (direct pixel value)
         self.radius_pixels = int(min(self.render_width, self.render_height) // 6 / 2.5)   # Default radius in pixels
+        self.renderer = BipartiteRenderer(self.render_width, self.render_height)
+        self.paint_callback = None  # Called after every frame is painted, e.g. to timestamp display changes
 
         # Move the window to the second monitor's position
         self.setGeometry(screen_geometry.x, screen_geometry.y,
@@ -69,28 +166,6 @@ class BipartiteFieldWindow(QtWidgets.QWidget):
         # Create a custom paint event to draw the bipartite field
         self.update()
 
-    def createBipartiteImage(self):
-        """Create a PIL image with antialiased bipartite circle."""
-        # Create a new image with black background
-        image = Image.new('RGB', (self.render_width, self.render_height), (0, 0, 0))
-        draw = ImageDraw.Draw(image)
-
-        # Calculate center and radius
-        center_x = self.render_width // 2
-        center_y = self.render_height // 2
-        radius = self.radius_pixels
-
-        # Define the bounding box for the circle
-        bbox = (center_x - radius, center_y - radius, center_x + radius, center_y + radius)
-
-        # Draw the top half (left color) - from 0 to 180 degrees
-        draw.pieslice(bbox, 0, 180, fill=tuple(self.left_color))
-
-        # Draw the bottom half (right color) - from 180 to 360 degrees
-        draw.pieslice(bbox, 180, 360, fill=tuple(self.right_color))
-
-        return image
-
     def setTrialInfo(self, trial_number, total_trials):
         """Set the current trial number and total trials for display."""
         self.trial_number = trial_number
@@ -98,7 +173,7 @@ class BipartiteFieldWindow(QtWidgets.QWidget):
         self.update()
 
     def paintEvent(self, event):
-        """Custom paint event with PIL-based rendering and proper resizing."""
+        """Custom paint event drawing the pre-rendered field, resized to the window."""
         painter = QtGui.QPainter(self)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
 
@@ -106,22 +181,9 @@ class BipartiteFieldWindow(QtWidgets.QWidget):
         window_width = self.width()
         window_height = self.height()
 
-        # Fill with black background
-        painter.fillRect(0, 0, window_width, window_height, QtGui.QColor(0, 0, 0))
-
-        # Create the PIL image with antialiased bipartite circle
-        pil_image = self.createBipartiteImage()
-        pil_image = pil_image.filter(GaussianBlur(radius=2))
-
-        # Resize to projector dimensions with high-quality resampling
-        pil_image = pil_image.resize((window_width, window_height), Image.Resampling.LANCZOS)
-
-        # Convert PIL image to QImage
-        pil_image = pil_image.convert('RGBA')
-        data = pil_image.tobytes('raw', 'RGBA')
-        qimage = QtGui.QImage(data, pil_image.width, pil_image.height, QtGui.QImage.Format_RGBA8888)
-
-        # Draw the resized image to the window
+        # The field covers the whole window, black outside the circle
+        qimage = self.renderer.render(self.left_color, self.right_color, self.radius_pixels,
+                                      window_width, window_height)
         painter.drawImage(0, 0, qimage)
 
         # Draw trial number in lower left corner if set
@@ -142,6 +204,9 @@ class BipartiteFieldWindow(QtWidgets.QWidget):
             y = window_height - margin
             painter.drawText(x, y, text)
 
+        if self.paint_callback is not None:
+            self.paint_callback()
+
     def updateColors(self, left_color, right_color):
         """Update the colors of the bipartite field."""
         self.left_color = left_color
@@ -158,6 +223,10 @@ class BipartiteFieldWindow(QtWidgets.QWidget):
             self.radius_pixels = radius_pixels
             self.update()  # Trigger a repaint
 
+    def frameTimeStats(self):
+        """Render time statistics (ms) of recent frames."""
+        return self.renderer.frameTimeStats()
+
     def keyPressEvent(self, event):
         """Handle key press events."""
         if event.key() == Qt.Key_Escape:
@@ -208,6 +277,12 @@ class BipartiteFieldManager:
         if self.bipartite_window:
             self.bipartite_window.updateRadius(radius_pixels)
 
+    def frameTimeStats(self):
+        """Render time statistics (ms) of recent frames, or None without a window."""
+        if self.bipartite_window:
+            return self.bipartite_window.frameTimeStats()
+        return None
+
     def closeWindow(self):
         """Close the bipartite field window."""
         if self.bipartite_window:
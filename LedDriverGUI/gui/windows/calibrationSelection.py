@@ -258,6 +258,14 @@ def promptForLUTStartingValues():
     return starting_values_filename
 
 
+def promptForRemeasure():
+    """Whether to measure every LED spectrum, instead of reusing stored spectra that have not drifted"""
+    reply = QMessageBox.question(None, "Spectral Database",
+                                 "Re-measure every LED, even if a stored spectrum is still valid?",
+                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+    return reply == QMessageBox.Yes
+
+
 def promptForLEDList():
     dialog = IntegerListDialog("Enter the list of LED indices separated by commas: ")
     if dialog.exec_() == QDialog.Accepted:
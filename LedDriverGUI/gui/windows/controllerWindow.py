@@ -22,11 +22,8 @@ class UpdateStatus:
 
         self._updating = True
         try:
-            # Update the status dictionary
-            for key, value in pwm_updates.items():
-                self.gui.status_dict[key] = value
-            # Update the driver with new PWM values
-            self.gui.ser.updateStatus(force_tx=True, override=True)
+            # Only the PWM packet is sent unless the channels or currents have changed
+            self.gui.ser.updateLedStatus(pwm_updates, self.gui.controller_status_dict.get("Frame Time"))
 
         finally:
             self._updating = False
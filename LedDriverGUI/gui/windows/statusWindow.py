@@ -4,7 +4,8 @@ import re
 from PyQt5 import QtGui, QtCore, QtWidgets, uic
 from PyQt5.QtGui import QFont
 import qdarkstyle  # This awesome style sheet was made by Colin Duquesnoy and Daniel Cosmo Pizetta - https://github.com/ColinDuquesnoy/QDarkStyleSheet
-from collections import OrderedDict, deque
+from collections import OrderedDict
+import numpy as np
 import pyqtgraph as pg
 from .. import guiMapper
 from .. import guiSequence as seq
@@ -15,6 +16,7 @@ import copy
 N_MEASUREMENTS = 50  # Number of measurements per plot
 MIN_TEMP_RANGE = 6  # Number of degrees at maximum zoom on the temperature plot
 PLOT_PADDING = 1.1  # Factor of dark space above and below plot line so that plot line doesn't touch top of widget
+BOARD_KEYS = ["Channel", "PWM", "Current", "Temperature", "Fan"]  # Status values that are reported once per board
 debug = False
 
 
@@ -39,7 +41,6 @@ class statusWindow(QtWidgets.QWidget):
         else:
             self.app.setStyleSheet("")
         self.app.setFont(QFont("MS Shell Dlg 2", 12))
-        self.x_axis_offset = 0  # Current x-axis offset to use for rastering the plots in time
 
         # Set signals
         self.status_emit = self.status_signal.emit  # Initialize instance of function so it can be explicitly disconnected later
@@ -55,22 +56,40 @@ class statusWindow(QtWidgets.QWidget):
 
         self.plot_timeline = guiMapper.TimeLine(loopCount=0, interval=100)  # Animation object for animating plots
 
-        # Initialize plot data
+        # Initialize status accumulator - per board values are summed on each status update and averaged once per display tick
         self.status_dict = copy.deepcopy(self.gui.status_dict)
         self.status_dict["Count"] = 0  # Add count element to dictionary
+        self.board_keys = [key + str(board) for key in BOARD_KEYS for board in range(1, self.gui.nBoards() + 1)]
+        self.board_sum = np.zeros((len(BOARD_KEYS), self.gui.nBoards()))  # Rows are in the order of BOARD_KEYS
+
+        # Initialize plot data
         self.plots = OrderedDict([("PWM", self.graph_intensity_pwm), ("Current", self.graph_intensity_current),
                                   ("Temperature1", self.graph_temperature_board1), ("Temperature2", self.graph_temperature_board2), ("Temperature3", self.graph_temperature_board3)])
-
-        self.y_values = OrderedDict([("PWM", [deque([0]*N_MEASUREMENTS)]), ("Current", [deque([0]*N_MEASUREMENTS)]),
-                                     ("Temperature1", deque([-1000]*N_MEASUREMENTS)), ("Temperature2", deque([-1000]*N_MEASUREMENTS)), ("Temperature3", deque([-1000]*N_MEASUREMENTS))])
-        for _ in range(self.gui.nBoards()):
-            self.y_values["PWM"].append(deque([0]*N_MEASUREMENTS))
-            self.y_values["Current"].append(deque([0] * N_MEASUREMENTS))
+        self.x_values = np.arange(N_MEASUREMENTS)
+        self.y_values = OrderedDict([("PWM", np.zeros((self.gui.nBoards(), N_MEASUREMENTS))),
+                                     ("Current", np.zeros((self.gui.nBoards(), N_MEASUREMENTS))),
+                                     ("Temperature", np.full((self.gui.nBoards(), N_MEASUREMENTS), -1000.0))])
+        self.plotted_values = {}  # Copy of the data last drawn on each plot, so plots are only redrawn when the data changes
+        self.plot_ranges = {}  # Last y range set on each plot
+
+        # Cache label widgets and their text so labels are only redrawn when the displayed value changes
+        self.label_widgets = {}
+        self.label_text = {}
+        self.button_states = {}
 
         self.state_dict = self.gui.state_dict
         self.speed_model, self.custom_spinbox = self.initializeSpeedModel()
+        self.curves = OrderedDict()
+        color_list = ['c', 'y', 'm']
         for key, value in self.plots.items():
             self.initializePlot(value, key)
+            # Plot items are created once and then updated in place with setData()
+            if "Temperature" in key:
+                self.curves[key] = [value.plot(self.x_values, self.y_values["Temperature"][int(key[-1])-1],
+                                               pen=pg.mkPen('g', width=1), connect="finite")]
+            else:
+                self.curves[key] = [value.plot(self.x_values, self.y_values[key][board], pen=pg.mkPen(
+                    color_list[board], width=1), connect="finite") for board in range(self.gui.nBoards())]
         self.startAnimation()
         self.changeSpeed()  # initialize update speed to default value
 
@@ -101,7 +120,7 @@ class statusWindow(QtWidgets.QWidget):
         status_plot.getAxis('right').setTextPen('k', width=2)
 
         # Set
-        status_plot.setXRange(0, N_MEASUREMENTS, padding=0)
+        status_plot.setXRange(0, N_MEASUREMENTS-1, padding=0)
         status_plot.getAxis('bottom').setTickSpacing(N_MEASUREMENTS/10, N_MEASUREMENTS/10)
         status_plot.getAxis('bottom').setStyle(showValues=False)
         status_plot.getAxis('bottom').setGrid(150)
@@ -155,11 +174,15 @@ class statusWindow(QtWidgets.QWidget):
         if debug:
             print("Recv: " + str(status))
         count = self.status_dict["Count"]
-        for index, key in enumerate(status):
-            if key in ["Mode", "Control", "State"] or count == 0 or "Channel" in key:
-                self.status_dict[key] = status[key]
-            else:  # Calculate running average of measured values per update
-                self.status_dict[key] += status[key]
+        values = np.fromiter(map(status.__getitem__, self.board_keys), dtype=np.float64,
+                             count=len(self.board_keys)).reshape(self.board_sum.shape)
+        if count == 0:
+            self.board_sum[:] = values
+        else:  # Calculate running average of measured values per update
+            self.board_sum += values
+        self.board_sum[0] = values[0]  # Channel is not averaged, so keep the most recent value
+        for key in ["Mode", "Control", "State"]:
+            self.status_dict[key] = status[key]
         self.status_dict["Count"] += 1
 
     def controllerUpdateStatus(self, status):
@@ -169,164 +192,147 @@ class statusWindow(QtWidgets.QWidget):
         # Roudn to sig fig - https://stackoverflow.com/questions/3410976/how-to-round-a-number-to-significant-figures-in-python
         def round_to_n(x, n): return x if x == 0 else round(x, -int(math.floor(math.log10(abs(x)))) + (n - 1))
         count = self.status_dict["Count"]
+        n_leds = self.gui.nLeds()
         for key in ["Name", "COM Port", "Serial"]:
-            self.status_dict[key] = str(self.gui.status_dict[key])
+            self.updateLabel(key, str(self.gui.status_dict[key]))
         if count > 0:
-            for key, value in self.status_dict.items():
-                unit = ""
-                if "Channel" in key:
-                    value += 1
-                    board_number = key[-1]
-                    if value <= self.gui.nLeds():
-                        led_number = value + (int(board_number)-1)*self.gui.nLeds()
-                        self.updateLabel(key, led_number)
-                        key = "Channel Name" + str(board_number)
-                        value = self.gui.getValue(self.gui.config_model["LED" + str(board_number) + str(value)]["ID"])
-                    else:
-                        self.updateLabel(key, "Off")
-                        key = "Channel Name" + str(board_number)
-                        value = "Off"
-                elif "Temperature" in key:
-                    # Use internal thermistor coefficients
-                    self.status_dict[key] = fileIO.adcToTemp(value / count, False)
-                    if self.status_dict[key] > -30:
-                        value = round_to_n(self.status_dict[key], 3)
-                        unit = " °C"
-                    else:
-                        self.status_dict[key] = -1000
-                        value = "Not Connected"
-                elif "PWM" in key or "Fan" in key:
-                    board_number = key[-1]
-                    led_number = round(self.status_dict["Channel" + str(board_number)]) + 1
-                    self.status_dict[key] = ((value / count)/65535)*100
-                    value = round_to_n(self.status_dict[key], 3)
-                    unit = " %"
-                    if ("PWM" in key and led_number > self.gui.nLeds()):
-                        self.status_dict[key] = 0
-                        value = "Off"
-                        unit = ""
-                elif "Current" in key:
-                    board_number = key[-1]
-                    led_number = round(self.status_dict["Channel" + str(board_number)]) + 1
-                    if led_number <= self.gui.nLeds():
-                        self.status_dict[key] = ((value / count)/6.5535) / \
-                            self.gui.getAdcCurrentLimit(board_number, led_number)
-                        value = round_to_n(self.status_dict[key], 3)
-                        unit = " %"
-                    else:
-                        self.status_dict[key] = 0
-                        value = "Off"
-                elif key == "Control":
-                    value = self.gui.main_model["Control"][int(value)].text()
-                elif key == "Mode":
-                    if self.status_dict[key] == 0:
-                        value = "Sync - " + self.gui.sync_model["Mode"].whatsThis()
-                    elif self.status_dict[key] in [1, 2]:
-                        value = "Manual"
-                    else:
-                        value = "Off"
-                elif key == "State":
-                    try:
-                        if self.status_dict["Mode"] == 0:
-                            value = self.state_dict[self.gui.sync_model["Mode"].whatsThis()][self.status_dict[key]]
-                        elif self.status_dict["Mode"] == 1:
-                            value = "PWM"
-                        elif self.status_dict["Mode"] == 2:
-                            value = "Current"
-                        else:
-                            value = "Off"
-                    except KeyError:
-                        value = "Loading..."
-
-                if key not in ["Count"]:
-                    self.updateLabel(key, value, unit)
+            # Convert the accumulated board values to averages in one step
+            average = self.board_sum / count
+            # Channel holds the latest value rather than a sum, so it isn't divided by count
+            channel = np.rint(self.board_sum[0]).astype(int) + 1  # Active LED on each board - nLeds + 1 means off
+            led_on = channel <= n_leds
+            current_limit = np.array([self.gui.getAdcCurrentLimit(board + 1, channel[board]) if led_on[board] else 1
+                                      for board in range(self.gui.nBoards())])
+            pwm = np.where(led_on, (average[1] / 65535) * 100, 0)
+            current = np.where(led_on, (average[2] / 6.5535) / current_limit, 0)
+            # Use internal thermistor coefficients
+            temperature = fileIO.adcToTemp(average[3], False)
+            temperature[temperature <= -30] = -1000
+            fan = (average[4] / 65535) * 100
+
+            for index in range(self.gui.nBoards()):
+                board = str(index + 1)
+                if led_on[index]:
+                    self.updateLabel("Channel" + board, channel[index] + index*n_leds)
+                    self.updateLabel("Channel Name" + board,
+                                     self.gui.getValue(self.gui.config_model["LED" + board + str(channel[index])]["ID"]))
+                    self.updateLabel("PWM" + board, round_to_n(float(pwm[index]), 3), " %")
+                    self.updateLabel("Current" + board, round_to_n(float(current[index]), 3), " %")
+                else:
+                    for key in ["Channel", "Channel Name", "PWM", "Current"]:
+                        self.updateLabel(key + board, "Off")
+                if temperature[index] > -30:
+                    self.updateLabel("Temperature" + board, round_to_n(float(temperature[index]), 3), " °C")
+                else:
+                    self.updateLabel("Temperature" + board, "Not Connected")
+                self.updateLabel("Fan" + board, round_to_n(float(fan[index]), 3), " %")
+
+            self.updateLabel("Control", self.gui.main_model["Control"][int(self.status_dict["Control"])].text())
+            if self.status_dict["Mode"] == 0:
+                self.updateLabel("Mode", "Sync - " + self.gui.sync_model["Mode"].whatsThis())
+            elif self.status_dict["Mode"] in [1, 2]:
+                self.updateLabel("Mode", "Manual")
+            else:
+                self.updateLabel("Mode", "Off")
+            try:
+                if self.status_dict["Mode"] == 0:
+                    value = self.state_dict[self.gui.sync_model["Mode"].whatsThis()][self.status_dict["State"]]
+                elif self.status_dict["Mode"] == 1:
+                    value = "PWM"
+                elif self.status_dict["Mode"] == 2:
+                    value = "Current"
+                else:
+                    value = "Off"
+            except KeyError:
+                value = "Loading..."
+            self.updateLabel("State", value)
+
+            samples = OrderedDict([("PWM", pwm), ("Current", current), ("Temperature", temperature)])
 
         else:
-            for key, value in self.status_dict.items():
-                if key not in ["Name", "COM Port", "Serial"]:
-                    value = "N/A"
-                if key not in ["Count"]:
-                    self.updateLabel(key, value)
+            for key in self.status_dict:
+                if key not in ["Name", "COM Port", "Serial", "Count"]:
+                    self.updateLabel(key, "N/A")
+            samples = OrderedDict((key, value[:, -1]) for key, value in self.y_values.items())  # Repeat last sample
 
         self.status_dict["Count"] = 0  # Reset the averaging counter
 
+        # Shift the plot data one sample to the left and add the new sample at the end
+        for key, y_array in self.y_values.items():
+            y_array[:, :-1] = y_array[:, 1:]
+            y_array[:, -1] = samples[key]
+
         # Update plots
         show_plot = self.isVisible() and self.gui.getValue(self.main_tab) in ["Intensity Plots", "Temperature Plots"]
-        self.x_axis_offset += 1
-        for key, status_plot in self.plots.items():
-            if self.x_axis_offset == N_MEASUREMENTS:
-                self.x_axis_offset = 0
-            x_values = list(range(self.x_axis_offset, self.x_axis_offset + N_MEASUREMENTS))
-            if show_plot:
-                status_plot.setXRange(self.x_axis_offset, N_MEASUREMENTS+self.x_axis_offset, padding=0)
+        if show_plot:
+            for key, status_plot in self.plots.items():
+                if "Temperature" in key:
+                    y_array = self.y_values["Temperature"][int(key[-1])-1:int(key[-1])]
+                else:
+                    y_array = self.y_values[key]
+                if key in self.plotted_values and np.array_equal(self.plotted_values[key], y_array):
+                    continue  # Plot is unchanged since it was last drawn
+                self.plotted_values[key] = y_array.copy()
+
+                if "Temperature" in key:
+                    connected = y_array[y_array > -273.15]
+                    if connected.size:
+                        y_mean = (connected.max() + connected.min()) / 2
+                        y_range = max(connected.max() - connected.min(), MIN_TEMP_RANGE * PLOT_PADDING)
+                        self.setPlotRange(key, y_mean - y_range / 2, y_mean + y_range / 2)
+                else:
+                    self.setPlotRange(key, 0, y_array.max() * PLOT_PADDING)
+
+                for curve, y_list in zip(self.curves[key], y_array):
+                    curve.setData(self.x_values, y_list)
 
-            if "Temperature" in key:
-                self.y_values[key][0] = self.status_dict[key]
-                self.y_values[key].rotate(-1)
-                if show_plot:
-                    y_list = list(self.y_values[key])
-                    try:
-                        # Exclude None: https://stackoverflow.com/questions/2295461/list-minimum-in-python-with-none
-                        list_max = max(y for y in y_list if y > -273.15)
-                        list_min = min(y for y in y_list if y > -273.15)
-                        y_mean = (list_max + list_min) / 2
-                        y_range = list_max - list_min
-                        if y_range < MIN_TEMP_RANGE * PLOT_PADDING:
-                            y_range = MIN_TEMP_RANGE * PLOT_PADDING
-                        status_plot.setYRange(y_mean - y_range / 2, y_mean + y_range / 2, padding=0)
-                    except ValueError:
-                        pass
-                    status_plot.plot(x_values, y_list, pen=pg.mkPen('g', width=1), connect="finite", clear=True)
-
-            else:
-                color_list = ['c', 'y', 'm']
-                max_value = 0
-                for board in range(self.gui.nBoards()):
-                    max_value = max(max(self.y_values[key][board]), max_value)
-                max_value *= PLOT_PADDING
-
-                for board in range(1, self.gui.nBoards()+1):
-                    if board == 1:
-                        clear_graph = True
-                    else:
-                        clear_graph = False
-                    self.y_values[key][board-1][0] = self.status_dict[key + str(board)]
-                    if self.y_values[key][board-1][0] > 100:
-                        print(str(count))
-                    self.y_values[key][board-1].rotate(-1)
-                    if show_plot:
-                        y_list = list(self.y_values[key][board-1])
-                        status_plot.setYRange(0, max_value, padding=0)
-                        status_plot.plot(x_values, y_list, pen=pg.mkPen(
-                            color_list[board-1], width=1), connect="finite", clear=clear_graph)
         # Update controller status
         for key in ["Button", "Switch", "LED"]:
             for side in ["Left", "Right"]:
-                value = self.gui.controller_status_dict[key][side] > 0
-                widget = eval("self.controller_" + side.lower() + "_" + key.lower() + "_button")
-                widget.setStyleSheet(
-                    "background-color: lightgreen; color: black;" if value else "background-color: lightGray; color: black;")
-                widget.setChecked(value)
-        self.controller_builtin_led_button.setStyleSheet(
-            "background-color: lightgreen; color: black;" if self.gui.controller_status_dict["Built-in"] else "background-color: lightGray; color: black;")
-        self.controller_builtin_led_button.setChecked(self.gui.controller_status_dict["Built-in"])
+                self.updateButton("controller_" + side.lower() + "_" + key.lower() + "_button",
+                                  self.gui.controller_status_dict[key][side] > 0)
+        self.updateButton("controller_builtin_led_button", bool(self.gui.controller_status_dict["Built-in"]))
         for side in ["Left", "Right"]:
             value = self.gui.controller_status_dict["Encoder"][side] % 256
-            widget = eval("self.controller_" + side.lower() + "_dial")
-            widget.setValue(value)
-        self.text_controller_name_label.setText("Name: " + str(self.gui.controller_status_dict["Name"]))
-        self.text_controller_serial_label.setText("Serial: " + str(self.gui.controller_status_dict["Serial"]))
-        self.text_controller_com_port_label.setText("COM Port: " + str(self.gui.controller_status_dict["COM Port"]))
+            widget = getattr(self, "controller_" + side.lower() + "_dial")
+            if widget.value() != value:
+                widget.setValue(value)
+        self.updateText(self.text_controller_name_label, "Name: " + str(self.gui.controller_status_dict["Name"]))
+        self.updateText(self.text_controller_serial_label, "Serial: " + str(self.gui.controller_status_dict["Serial"]))
+        self.updateText(self.text_controller_com_port_label,
+                        "COM Port: " + str(self.gui.controller_status_dict["COM Port"]))
+
+    def setPlotRange(self, key, y_min, y_max):
+        if self.plot_ranges.get(key) != (y_min, y_max):
+            self.plots[key].setYRange(y_min, y_max, padding=0)
+            self.plot_ranges[key] = (y_min, y_max)
+
+    def updateButton(self, name, value):
+        if self.button_states.get(name) != value:
+            widget = getattr(self, name)
+            widget.setStyleSheet(
+                "background-color: lightgreen; color: black;" if value else "background-color: lightGray; color: black;")
+            widget.setChecked(value)
+            self.button_states[name] = value
+
+    def updateText(self, widget, text):
+        if self.label_text.get(widget) != text:
+            widget.setText(text)
+            self.label_text[widget] = text
 
     def updateLabel(self, key, value, unit=""):
-        prefix = key
-        board_number = key[-1]
-        if board_number.isdigit():
-            prefix = key[:-1]
-            key = prefix + "_board" + str(board_number)
-        widget = key.lower()
-        widget = eval("self.text_" + widget.replace(" ", "_") + "_label")
-        widget.setText(prefix + ": " + str(value) + unit)
+        try:
+            prefix, widget = self.label_widgets[key]
+        except KeyError:
+            prefix = key
+            widget = key
+            board_number = key[-1]
+            if board_number.isdigit():
+                prefix = key[:-1]
+                widget = prefix + "_board" + str(board_number)
+            widget = getattr(self, "text_" + widget.lower().replace(" ", "_") + "_label")
+            self.label_widgets[key] = (prefix, widget)
+        self.updateText(widget, prefix + ": " + str(value) + unit)
 
     def closeEvent(self, event):
         self.stopAnimation()
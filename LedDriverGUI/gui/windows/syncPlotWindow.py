@@ -14,10 +14,11 @@ import copy
 from timeit import default_timer as timer
 import datetime
 from ..utils.path import get_resource_path
+from ..utils.ringBuffer import RingBuffer, decimateMinMax
 
 PLOT_PADDING = 1.1  # Factor of dark space above and below plot line so that plot line doesn't touch top of widget
 SLEW_TIME = 1e-6  # Time for LED to switch between intensities
-N_SAMPLES = 1000  # When plots exceed 2x this length, they will be binned back to this length
+BUFFER_SIZE = 100000  # Maximum number of samples stored per plot - once full the oldest samples are overwritten
 STARTING_PLOT_RATE = 50  # Time between plot updates at start of plot
 debug = False
 
@@ -60,8 +61,9 @@ class syncPlotWindow(QtWidgets.QWidget):
                       # Y values of reference sequence line
                       OrderedDict([("PWM", []), ("Current", []), ("Channel", [])])]
         self.x_ref = [[], []]  # X values of reference sequence line
-        self.y_values = copy.deepcopy(self.y_ref)
-        self.x_values = copy.deepcopy(self.x_ref)  # X values of reference sequence line
+        # Measured plot data - row 0 is time, then one row per key in y_ref
+        self.buffers = [RingBuffer(BUFFER_SIZE, len(self.y_ref[0]) + 1), RingBuffer(BUFFER_SIZE, len(self.y_ref[1]) + 1)]
+        self.samples_added = [0, 0]  # Samples added to each buffer since it was cleared
         self.status_dict = copy.deepcopy(self.gui.status_dict)
         self.resetStatus()
         self.seq_list = guiMapper.initializeSeqList(self.gui)
@@ -74,6 +76,9 @@ class syncPlotWindow(QtWidgets.QWidget):
         self.state_dict = OrderedDict([("Digital", ["LOW", "HIGH"]), ("Analog", ["Active", "Active"]), ("Confocal", ["Standby", "Scanning"]),
                                        ("Serial", ["Active", "Active"]), ("Custom", ["Active", "Active"])])
         self.hold_label = [self.hold_label0, self.hold_label1]
+        # Plot items are created once and then updated in place with setData()
+        self.ref_curves = [OrderedDict(), OrderedDict()]
+        self.data_curves = [OrderedDict(), OrderedDict()]
 
         # Timers for x-axis
         self.plot_interval = STARTING_PLOT_RATE  # Time between plot updates in milliseconds
@@ -82,9 +87,12 @@ class syncPlotWindow(QtWidgets.QWidget):
         # State of plot hold (None = no hold, False = hold not yet reached, True = in hold)
         self.hold_status = [None, None]
 
-        for plot_dict in self.plots:
+        for index, plot_dict in enumerate(self.plots):
             for key, value in plot_dict.items():
                 self.initializePlot(value, key)
+                self.ref_curves[index][key] = value.plot([], [], pen=pg.mkPen('m', width=1))
+                self.data_curves[index][key] = value.plot([], [], pen=pg.mkPen('g', width=1), connect="finite")
+        self.plot_timeline.frameChanged.connect(lambda: self.updateSyncPlot())
         self.updateWindow()
 
     def initializePlot(self, status_plot, key):
@@ -321,32 +329,21 @@ class syncPlotWindow(QtWidgets.QWidget):
         if debug:
             print("Hold status initialized: " + str(self.hold_status))
 
-        # Plot reference lines
+        # Plot reference lines - reference lines are only shown for modes with a predefined intensity profile
         for index in range(2):
             if self.main_tab.isTabEnabled(index):
-                for key, seq_plot in self.plots[index].items():
-                    seq_plot.plot(self.x_ref[index], self.y_ref[index][key], pen=pg.mkPen('m', width=1), clear=True)
-
-    def binPlots(self):
-        index = self.status_dict["State"]
-        array_length = len(self.x_values[index])
-        if array_length >= N_SAMPLES*2:
-            for key in self.y_values[index]:
-                self.y_values[index][key] = self.y_values[index][key][::2]
-            self.x_values[index] = self.x_values[index][::2]
-
-            # Halve the plotting rate to match new bin widths
-            self.plot_interval *= 2
-            self.plot_timeline.setInterval(self.plot_interval)
-            if debug:
-                print("sync interval: " + str(self.plot_interval))
+                for key, ref_curve in self.ref_curves[index].items():
+                    if self.mode in ["Analog", "Serial", "Custom"]:
+                        ref_curve.setData([], [])
+                    else:
+                        ref_curve.setData(self.x_ref[index], self.y_ref[index][key])
+            self.clearPlot(index)
 
     def startAnimation(self):
         self.plot_start_time = timer()  # Start timer for tracking time points for x_axis
         self.plot_interval = STARTING_PLOT_RATE
         self.plot_timeline.setInterval(self.plot_interval)
         self.plot_timeline.setFrameRange(0, 100)
-        self.plot_timeline.frameChanged.connect(lambda: self.updateSyncPlot())
         self.plot_timeline.start()
         if debug:
             print("sync plot started")
@@ -403,9 +400,10 @@ class syncPlotWindow(QtWidgets.QWidget):
             self.status_dict["Count"] += 1
 
     def clearPlot(self, index):
-        for key in self.y_values[index]:
-            self.y_values[index][key] = []
-        self.x_values[index] = []
+        self.buffers[index].clear()
+        self.samples_added[index] = 0
+        for data_curve in self.data_curves[index].values():
+            data_curve.setData([], [])
 
     def resetStatus(self):
         self.status_dict["Count"] = 0  # Add count element to dictionary
@@ -436,26 +434,23 @@ class syncPlotWindow(QtWidgets.QWidget):
             self.status_dict["Channel"] += 1
 
             if self.hold_status[state] is not True:  # Update plots if timer has not reached hold
-                self.x_values[state].append(self.status_dict["Time"] / count)  # Add current time to x values
-                for key, status_plot in self.plots[state].items():
-                    self.y_values[state][key].append(self.status_dict[key])
-                    if show_plot:
-                        if self.mode in ["Analog", "Serial", "Custom"]:
-                            status_plot.plot(self.x_values[state][1:], self.y_values[state][key][1:], pen=pg.mkPen(
-                                'g', width=1), connect="finite", clear=True)
-                        else:
-                            status_plot.plot(self.x_ref[state], self.y_ref[state][key],
-                                             pen=pg.mkPen('m', width=1), connect="finite", clear=True)
-                            status_plot.plot(self.x_values[state][1:], self.y_values[state][key][1:], pen=pg.mkPen(
-                                'g', width=1), connect="finite", clear=False)
-                self.binPlots()  # Check if plots need to be down sampled
+                buffer = self.buffers[state]
+                # Add current time and values to the plot buffer
+                buffer.append([self.status_dict["Time"] / count] + [self.status_dict[key] for key in self.plots[state]])
+                self.samples_added[state] += 1
+                if show_plot:
+                    # The first sample is skipped as it is recorded before the sync started - until it is overwritten
+                    first = 1 if self.samples_added[state] <= buffer.capacity else 0
+                    x_values = buffer.data(0)[first:]
+                    for trace, (key, status_plot) in enumerate(self.plots[state].items(), start=1):
+                        # Only send as many points to the plot as there are pixels to draw them
+                        x_plot, y_plot = decimateMinMax(x_values, buffer.data(trace)[first:], status_plot.width())
+                        self.data_curves[state][key].setData(x_plot, y_plot)
 
             else:  # If timer has reached hold, update hold label instead
                 # Round to sig fig - https://stackoverflow.com/questions/3410976/how-to-round-a-number-to-significant-figures-in-python
                 def round_to_n(x, n): return x if x == 0 else round(x, -int(math.floor(math.log10(abs(x)))) + (n - 1))
                 hold_seconds = round((self.status_dict["Time"]/count)-self.hold_start_time)
-                for key, status_plot in self.plots[state].items():
-                    self.y_values[state][key].append(self.status_dict[key]/count)
                 self.hold_label[state].setText("Hold at end: PWM = " + str(round_to_n(self.status_dict["PWM"], 3)) +
                                                "%, Current = " + str(round_to_n(self.status_dict["Current"], 3)) +
                                                "%, Channel = " + str(round(self.status_dict["Channel"])) +
@@ -101,6 +101,7 @@ class Ui(QtWidgets.QMainWindow):
                                                         ("Right Name", 0),
                                                         ("Left Rates", [0] * N_STEPS),
                                                         ("Right Rates", [0] * N_STEPS),
+                                                        ("Frame Time", 0),  # timer() of the oldest encoder change not yet handled
                                                         ("LED Off", 0),
                                                         ("LED On", 0),
                                                         ("Interval", 0)]))
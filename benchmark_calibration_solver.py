@@ -0,0 +1,113 @@
+"""
+Compare the number of upload+measure cycles the PID loop and the Illinois solver need to calibrate every bit-plane
+level, on the same simulated projector and power meter the calibration is simulated with
+(LedDriverGUI.devices.simulator). Mirrors the set points, thresholds and PID gains used by
+LUTMeasurement.runLutCalibration() and runCalibration().
+"""
+import argparse
+import numpy as np
+from simple_pid import PID
+
+from LedDriverGUI.devices.simulator import LED_PEAKS, N_CHANNELS, N_LEVELS, SimulatedPowerMeter, SimulatedProjector
+from LedDriverGUI.gui.calibration.rootFinder import IllinoisSolver, warmStart
+
+LEVELS = [2 ** i for i in range(8)][::-1]
+
+
+class SimulatedLED:
+    """One LED of a SimulatedProjector, measured by a SimulatedPowerMeter set to its peak wavelength"""
+
+    def __init__(self, projector, led, noise):
+        self.projector = projector
+        self.led = led  # 0-based, B G O R
+        self.meter = SimulatedPowerMeter(projector, noise=noise, read_time=0)  # noise: µW standard deviation
+        self.meter.setInstrumWavelength(LED_PEAKS[led])
+        self.projector.setBackgroundColor([0, 0, 0])
+        self.meter.zeroPowerMeter()  # Removes the dark offset, as LUTMeasurement.zeroBackground() does
+
+    def measure(self, level, control):
+        # The LED is on the first channel of every bit-plane at full current, and the background color shows only the
+        # bit-plane being calibrated
+        rows = [[self.led + 1, control * 100, 100, 0]] * (N_LEVELS * N_CHANNELS)
+        self.projector.setSequence(rows, rows)
+        self.projector.setBackgroundColor([level, 0, 0])
+        return self.meter.readPower()
+
+
+def pidIterations(led, level, level_idx, set_point, starting_control, threshold, max_iterations):
+    pid_offset = 6 if level >= 16 else 3
+    pid = PID(0.000139, 0.2 * 2 ** (level_idx + pid_offset), 0.000000052, setpoint=set_point,
+              sample_time=None, starting_output=starting_control)
+    pid.output_limits = (0, 1)
+    power = led.measure(level, starting_control)
+    itr = 0
+    last_control = 0.0
+    while itr < max_iterations:
+        control = pid(power, dt=0.01)
+        power = led.measure(level, control)
+        itr += 1
+        if abs(power - set_point) < threshold and (power - set_point) > 0:
+            break
+        if abs(control - last_control) <= float(1 / 65535 * 2) and itr > 10:
+            break
+        last_control = control
+    return itr + 1, control, power
+
+
+def solverIterations(led, level, set_point, starting_control, threshold, max_iterations):
+    solver = IllinoisSolver(set_point, threshold, starting_control, max_iterations=max_iterations)
+    while not solver.done:
+        solver.update(solver.next_control, led.measure(level, solver.next_control))
+    return solver.iterations, solver.control, solver.power
+
+
+def runBenchmark(n_leds=20, level_set=16, threshold=0.0001, noise=0.00002, max_iterations=200, seed=0):
+    rng = np.random.default_rng(seed)
+    results = {"pid": [], "illinois": []}
+    errors = {"pid": [], "illinois": []}
+    projector = None
+    for led_idx in range(n_leds):
+        if led_idx % len(LED_PEAKS) == 0:
+            # A new projector for every four LEDs, with steady LEDs so each measurement is only limited by meter noise.
+            # Peak powers of 2-12 µW give 0.5-3 µW in the 128 bit-plane
+            projector = SimulatedProjector(peak_powers=rng.uniform(2.0, 12.0, len(LED_PEAKS)),
+                                           gammas=rng.uniform(0.9, 1.3, len(LED_PEAKS)), drift=0, settle_time=0,
+                                           seed=rng.integers(2 ** 32))
+        led = SimulatedLED(projector, led_idx % len(LED_PEAKS), noise)
+        start_controls = np.clip(rng.normal(0.95, 0.03, len(LEVELS)), 0, 1)
+        level_set_idx = LEVELS.index(level_set)
+        max_power = led.measure(level_set, start_controls[level_set_idx])
+        set_points = [max_power * level / level_set for level in LEVELS]
+
+        solved_levels = [(start_controls[level_set_idx], max_power, level_set)]
+        for level_idx, level in enumerate(LEVELS):
+            if level == level_set:
+                continue
+            level_threshold = threshold / 4 if level < 16 else threshold
+            itr, _, power = pidIterations(led, level, level_idx, set_points[level_idx], start_controls[level_idx],
+                                          level_threshold, max_iterations)
+            results["pid"] += [itr]
+            errors["pid"] += [power - set_points[level_idx]]
+
+            start = warmStart(set_points[level_idx], level, solved_levels, start_controls[level_idx])
+            itr, control, power = solverIterations(led, level, set_points[level_idx], start, level_threshold,
+                                                   max_iterations)
+            solved_levels += [(control, power, level)]
+            results["illinois"] += [itr]
+            errors["illinois"] += [power - set_points[level_idx]]
+
+    for name in results:
+        itr = np.array(results[name])
+        err = np.array(errors[name])
+        print(f"{name:>8}: {itr.mean():6.1f} mean / {np.median(itr):4.0f} median / {itr.max():4d} max iterations per "
+              f"level, {itr.sum():5d} total, max |error| {np.abs(err).max():.2e} µW")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--leds", type=int, default=20, help="number of simulated LEDs")
+    parser.add_argument("--noise", type=float, default=0.00002, help="power meter noise (µW standard deviation)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    runBenchmark(n_leds=args.leds, noise=args.noise, seed=args.seed)
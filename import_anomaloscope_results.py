@@ -0,0 +1,30 @@
+"""
+Import anomaloscope CSV files into the results store used by plot_anomaloscope_subjects.py.
+
+Only files that are new or changed since the last import are read, unless --all is given.
+"""
+import argparse
+import glob
+import os
+from LedDriverGUI.gui.utils.resultsStore import ResultsStore, RESULTS_DATABASE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("data_dir", nargs="?", default="anomaloscope_data", help="folder with the anomaloscope CSVs")
+    parser.add_argument("--database", help=f"results store to import into (defaults to <data_dir>/{RESULTS_DATABASE})")
+    parser.add_argument("--all", action="store_true", help="re-import every CSV, not just new or changed ones")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.database or os.path.join(args.data_dir, RESULTS_DATABASE))
+    if args.all:
+        imported = []
+        for path in sorted(glob.glob(os.path.join(args.data_dir, "*.csv"))):
+            store.importCsv(path)
+            imported.append(path)
+    else:
+        imported = store.importDirectory(args.data_dir)
+    for path in imported:
+        print(f"Imported {path}")
+    print(f"{len(imported)} files imported, {len(store.sessions())} sessions in {store.path}")
+    store.close()
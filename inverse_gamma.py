@@ -1,54 +1,32 @@
+"""
+Build inverse gamma LUTs for the firmware from the gamma curves measured by the gamma check.
+
+Writes <name>.h (C array, one row per LED) and <name>.bin (raw little-endian) next to the measurements, or to --output.
+"""
+import argparse
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-
-def createRemappedLUT(csv_file_path):
-    # Read the CSV file into a pandas DataFrame
-    df = pd.read_csv(csv_file_path)
-
-    # Assuming the lookup table values are in a column named 'Power'
-    lookup_table = df['Power'].to_numpy()
-
-    # Calculate the expected linear function values from 0 to 1
-    linear_function = np.linspace(lookup_table[0], lookup_table[-1], 256)
-
-    # Initialize the inverse lookup table
-    inverse_lookup_table = np.empty_like(linear_function).astype(int)
-
-    # Create the inverse lookup table
-    for i in range(256):
-        # Find the closest value in the original lookup table to the linear function value
-        closest_index = np.argmin(np.abs(lookup_table - linear_function[i]))
-        inverse_lookup_table[i] = closest_index
+from LedDriverGUI.gui.calibration import inverseGamma
 
-    # Create an array of the actual values from the lookup_table indexed by inverse_lookup_table
-    actual_values_from_lookup = lookup_table[inverse_lookup_table]
 
-    # Plot the original and inverse lookup tables side by side
-    fig, axs = plt.subplots(1, 2, figsize=(12, 6))
-
-    # Plot the original lookup table
-    axs[0].plot(np.arange(256), lookup_table, label='Original Lookup Table')
-    axs[0].set_title('Original Lookup Table')
-    axs[0].set_xlabel('Index')
-    axs[0].set_ylabel('Value')
-    axs[0].legend()
-
-    # Plot the inverse lookup table
-    axs[1].plot(np.arange(256), actual_values_from_lookup, label='Remapped Lookup Table', color='orange')
-    axs[1].set_title('Remapped Lookup Table')
-    axs[1].set_xlabel('Index')
-    axs[1].set_ylabel('Value')
-    axs[1].legend()
-
-    # Display the plots
-    plt.tight_layout()
-    plt.show()
-
-    return inverse_lookup_table
-
-csv_file_path = "./measurements/gammas/gamma_0.csv"
-inverse_lookup = createRemappedLUT(csv_file_path)
-
-# format for tianyun to copy
-print('{' + ','.join(map(str, inverse_lookup)) + '}')
+def createRemappedLUT(csv_file_path, bits=8):
+    """Inverse LUT for a single gamma curve CSV file"""
+    df = pd.read_csv(csv_file_path)
+    powers = df['Power'].to_numpy()
+    controls = df['Control'].to_numpy() if 'Control' in df else np.arange(len(powers))
+    _, luts = inverseGamma.buildInverseLUTs({0: (controls, powers)}, bits=bits)
+    return luts[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--gammas", default="./measurements/gammas", help="folder with gamma_check_<led>.csv files")
+    parser.add_argument("--output", help="folder to write the LUTs to (defaults to the gamma folder)")
+    parser.add_argument("--bits", type=int, default=8, choices=[8, 16], help="output resolution")
+    parser.add_argument("--name", default="inverse_gamma_lut", help="C array and file name")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="largest drop in power allowed as noise, as a fraction of each curve's range")
+    args = parser.parse_args()
+    leds, luts = inverseGamma.buildFromDirectory(args.gammas, args.output, args.bits, args.name, args.tolerance)
+    for led, lut in zip(leds, luts):
+        print(f"LED {led}: {lut.min()}-{lut.max()}")
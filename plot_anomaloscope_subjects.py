@@ -1,223 +1,161 @@
 import os
-import glob
+import json
+import time
+import hashlib
 import argparse
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Figures are only saved, never shown, so they can be rendered in worker processes
 import matplotlib.pyplot as plt
 from matplotlib.patches import Ellipse
 
+from LedDriverGUI.gui.utils.resultsStore import ResultsStore, RESULTS_DATABASE
+from LedDriverGUI.gui.utils.matchStatistics import matchStatistics, CONFIDENCE
 
-def load_subject_data(data_dir, mode):
+MODES = ['fixed', 'randomized']
+PLOT_COLUMNS = ['subject_id', 'randomization_mode', 'red_percentage', 'yellow_luminance_percent']
+HASH_FILE = '.plot_hashes.json'  # In the plot folder: data hash of every figure from the last run
+PLOT_VERSION = 2  # Bump when the figure layout changes, so every figure is re-rendered
+
+
+def load_subject_data(data_dir, modes=MODES):
+    """
+    Load the trials of the given randomization modes from the results store in data_dir.
+    CSVs that are new or changed since the last run are imported into the store first.
+    Returns a dict: {mode: DataFrame}
     """
-    Load all CSVs in data_dir, filter by randomization_mode, and group by subject_id.
-    Returns a dict: {subject_id: DataFrame}
+    store = ResultsStore(os.path.join(data_dir, RESULTS_DATABASE))
+    imported = store.importDirectory(data_dir)
+    if imported:
+        print(f"Imported {len(imported)} CSV files into {store.path}")
+    df = store.query(PLOT_COLUMNS)
+    store.close()
+    df['subject_id'] = df['subject_id'].astype(str)
+    df_modes = df['randomization_mode'].str.lower()
+    return {mode: df[df_modes == mode] for mode in modes}
+
+
+def plot_figure(path, title, subjects):
     """
-    all_files = glob.glob(os.path.join(data_dir, '*.csv'))
-    subject_data = {}
-    for file in all_files:
-        try:
-            df = pd.read_csv(file)
-        except Exception as e:
-            print(f"Could not read {file}: {e}")
+    Save one figure with the mean match, std dev ellipse and confidence ellipse of the mean of each subject.
+    subjects: list of (subject_id, color, statistics) - statistics is a dict of a matchStatistics row
+    Returns (path, seconds taken)
+    """
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for subject_id, color, stats in subjects:
+        mean = (stats['mean_x'], stats['mean_y'])
+        ax.scatter(*mean, label=f'Subject {subject_id}', color=color, marker='o')
+        # Single-point data has no ellipses
+        if stats['n'] < 2:
             continue
-        # Filter by randomization_mode
-        df = df[df['randomization_mode'].str.lower() == mode.lower()]
+        ax.add_patch(Ellipse(mean, stats['width'], stats['height'], angle=stats['angle'],
+                             edgecolor=color, facecolor='none', lw=2, alpha=0.7))
+        ax.add_patch(Ellipse(mean, stats['ci_width'], stats['ci_height'], angle=stats['ci_angle'],
+                             edgecolor=color, facecolor=color, lw=1, ls='--', alpha=0.25))
+    ax.set_xlim(0, 100)
+    ax.set_ylim(0, 100)
+    ax.set_xlabel('Red Percentage')
+    ax.set_ylabel('Yellow Luminance Percent')
+    ax.set_title(title)
+    ax.legend(title=f'Mean, std dev and {CONFIDENCE:.0%} CI of mean', title_fontsize='small')
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+    return path, time.perf_counter() - start
+
+
+def figure_jobs(mode_data, save_path, individual=True, combined=True):
+    """(path, title, subjects) of every figure: all subjects together and/or each subject on its own, for each mode"""
+    colors = plt.get_cmap('tab10')
+    jobs = []
+    for mode, df in mode_data.items():
         if df.empty:
+            print(f"No data found for mode '{mode}'")
             continue
-        # Ensure df is a DataFrame, not a numpy array
-        if isinstance(df, pd.DataFrame):
-            subject_id = str(df['subject_id'].iloc[0])
-        else:
-            continue
-        if subject_id not in subject_data:
-            subject_data[subject_id] = df
-        else:
-            subject_data[subject_id] = pd.concat([subject_data[subject_id], df], ignore_index=True)
-    return subject_data
+        mode_path = save_path.format(mode=mode)
+        statistics = matchStatistics(df, 'subject_id')
+        subjects = [(subject_id, colors(i % 10), stats)
+                    for i, (subject_id, stats) in enumerate(statistics.to_dict('index').items())]
+        if combined:
+            jobs.append((mode_path, f'Anomaloscope Mean Matches by Subject - {mode.title()} Mode', subjects))
+        if individual:
+            for subject in subjects:
+                jobs.append((mode_path.replace('.png', f'_subject_{subject[0]}.png'),
+                             f'Subject {subject[0]} - {mode.title()} Mode', [subject]))
+    return jobs
 
 
-def plot_subjects(subject_data, save_path=None, show_plot=True, individual=False):
-    """
-    Plot all subjects on one plot (or individually if individual=True).
-    Each subject: mean point and std dev ellipse (x=red_percentage, y=yellow_luminance_percent).
-    """
-    colors = plt.cm.get_cmap('tab10')
-    if not individual:
-        fig, ax = plt.subplots(figsize=(8, 6))
-    for i, (subject_id, df) in enumerate(subject_data.items()):
-        x = df['red_percentage']
-        y = df['yellow_luminance_percent']
-        mean_x = x.mean()
-        mean_y = y.mean()
-        color = colors(i % 10)
-        # Handle single-point data (no ellipse)
-        if len(x) < 2:
-            if not individual:
-                ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color, marker='o')
-            else:
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color, marker='o')
-                ax.set_xlabel('Red Percentage')
-                ax.set_ylabel('Yellow Luminance Percent')
-                ax.set_xlim(0, 100)
-                ax.set_ylim(0, 100)
-                ax.set_title(f'Subject {subject_id}')
-                ax.legend()
-                if save_path:
-                    indiv_path = save_path.replace('.png', f'_subject_{subject_id}.png')
-                    plt.savefig(indiv_path, dpi=150)
-                if show_plot:
-                    plt.show()
-                plt.close(fig)
+def job_hash(title, subjects):
+    """Hash of everything drawn in a figure - a subject's statistics, including the bootstrap intervals seeded by its
+    ID, only change when its own trials do"""
+    digest = hashlib.sha1(f'{PLOT_VERSION}|{title}'.encode())
+    for subject_id, color, stats in subjects:
+        digest.update(f'|{subject_id}|{color}|'.encode())
+        digest.update(np.array([stats[key] for key in sorted(stats)], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def render_figures(jobs, save_dir, workers=None, force=False):
+    """Render the figures whose data changed since the last run in a process pool. Returns the paths rendered"""
+    hash_path = os.path.join(save_dir, HASH_FILE)
+    hashes = {}
+    if os.path.exists(hash_path):
+        with open(hash_path) as file:
+            hashes = json.load(file)
+
+    pending = []
+    for path, title, subjects in jobs:
+        digest = job_hash(title, subjects)
+        if not force and hashes.get(path) == digest and os.path.exists(path):
+            print(f"Unchanged: {path}")
             continue
-        cov = np.cov(x, y)
-        # Ellipse parameters
-        vals, vecs = np.linalg.eigh(cov)
-        order = vals.argsort()[::-1]
-        vals = vals[order]
-        vecs = vecs[:, order]
-        theta = np.degrees(np.arctan2(*vecs[:, 0][::-1]))
-        width = 2 * np.sqrt(vals[0])
-        height = 2 * np.sqrt(vals[1])
-        if not individual:
-            ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color)
-            ellipse = Ellipse((mean_x, mean_y), width, height, angle=theta,
-                              edgecolor=color, facecolor='none', lw=2, alpha=0.7)
-            ax.add_patch(ellipse)
-        else:
-            fig, ax = plt.subplots(figsize=(8, 6))
-            ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color)
-            ellipse = Ellipse((mean_x, mean_y), width, height, angle=theta,
-                              edgecolor=color, facecolor='none', lw=2, alpha=0.7)
-            ax.add_patch(ellipse)
-            ax.set_xlabel('Red Percentage')
-            ax.set_ylabel('Yellow Luminance Percent')
-
-            ax.set_title(f'Subject {subject_id}')
-            ax.legend()
-            if save_path:
-                indiv_path = save_path.replace('.png', f'_subject_{subject_id}.png')
-                plt.savefig(indiv_path, dpi=150)
-            if show_plot:
-                plt.show()
-            plt.close(fig)
-    if not individual:
-        ax.set_xlabel('Red Percentage')
-        ax.set_ylabel('Yellow Luminance Percent')
-        ax.set_title('Anomaloscope Mean Matches by Subject')
-        ax.legend()
-        if save_path:
-            plt.savefig(save_path, dpi=150)
-        if show_plot:
-            plt.show()
-        plt.close(fig)
+        hashes[path] = digest
+        pending.append((path, title, subjects))
+
+    rendered = []
+    if pending:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(plot_figure, *job) for job in pending]
+            for future in futures:
+                path, seconds = future.result()
+                print(f"Rendered {path} in {seconds * 1000:.0f} ms")
+                rendered.append(path)
+        print(f"Rendered {len(rendered)} of {len(jobs)} figures in {time.perf_counter() - start:.2f} s")
+
+    with open(hash_path, 'w') as file:
+        json.dump(hashes, file, indent=1)
+    return rendered
 
 
 def main():
     parser = argparse.ArgumentParser(description='Plot anomaloscope subject matches.')
     parser.add_argument('data_dir', type=str, help='Path to anomaloscope_data folder')
-    parser.add_argument('--mode', type=str, choices=['fixed', 'randomized'],
-                        required=True, help='Trial environment: fixed or randomized')
-    parser.add_argument('--save', type=str, default='anomaloscope_subjects.png', help='Filename to save the plot')
-    parser.add_argument('--individual', action='store_true', help='Plot each subject individually')
-    parser.add_argument('--save_dir', type=str, default=None, help='Directory to save all plots')
+    parser.add_argument('--mode', type=str, choices=MODES, default=None,
+                        help='Trial environment: fixed or randomized (default: both)')
+    parser.add_argument('--save', type=str, default='anomaloscope_subjects_{mode}.png',
+                        help='Filename to save the plot, {mode} is replaced by the mode')
+    parser.add_argument('--individual', action='store_true', help='Only plot each subject individually')
+    parser.add_argument('--combined', action='store_true', help='Only plot all subjects together')
+    parser.add_argument('--save_dir', type=str, default='.', help='Directory to save all plots')
+    parser.add_argument('--workers', type=int, default=None, help='Rendering processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Re-render figures even if their data is unchanged')
     args = parser.parse_args()
 
-    # Handle save_dir
-    save_path = args.save
-    if args.save_dir:
-        os.makedirs(args.save_dir, exist_ok=True)
-        save_path = os.path.join(args.save_dir, os.path.basename(args.save))
-
-    subject_data = load_subject_data(args.data_dir, args.mode)
-    if not subject_data:
-        print(f"No data found for mode '{args.mode}' in {args.data_dir}")
-        return
-
-    # Patch plot_subjects to pass save_dir for individual plots
-    def plot_subjects_with_dir(subject_data, save_path=None, show_plot=True, individual=False, save_dir=None, mode="unknown"):
-        colors = plt.cm.get_cmap('tab10')
-        if not individual:
-            fig, ax = plt.subplots(figsize=(8, 6))
-        for i, (subject_id, df) in enumerate(subject_data.items()):
-            x = df['red_percentage']
-            y = df['yellow_luminance_percent']
-            mean_x = x.mean()
-            mean_y = y.mean()
-            color = colors(i % 10)
-            # Handle single-point data (no ellipse)
-            if len(x) < 2:
-                if not individual:
-                    ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color, marker='o')
-                else:
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color, marker='o')
-                    ax.set_xlabel('Red Percentage')
-                    ax.set_ylabel('Yellow Luminance Percent')
-                    ax.set_xlim(0, 100)
-                    ax.set_ylim(0, 100)
-                    ax.set_title(f'Subject {subject_id} - {mode.title()} Mode')
-                    ax.legend()
-                    if save_path:
-                        fname = os.path.basename(save_path)
-                        indiv_path = fname.replace('.png', f'_subject_{subject_id}.png')
-                        if save_dir:
-                            indiv_path = os.path.join(save_dir, indiv_path)
-                        plt.savefig(indiv_path, dpi=150)
-                    if show_plot:
-                        plt.show()
-                    plt.close(fig)
-                continue
-            cov = np.cov(x, y)
-            # Ellipse parameters
-            vals, vecs = np.linalg.eigh(cov)
-            order = vals.argsort()[::-1]
-            vals = vals[order]
-            vecs = vecs[:, order]
-            theta = np.degrees(np.arctan2(*vecs[:, 0][::-1]))
-            width = 2 * np.sqrt(vals[0])
-            height = 2 * np.sqrt(vals[1])
-            if not individual:
-                ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color)
-                ellipse = Ellipse((mean_x, mean_y), width, height, angle=theta,
-                                  edgecolor=color, facecolor='none', lw=2, alpha=0.7)
-                ax.add_patch(ellipse)
-            else:
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.scatter(mean_x, mean_y, label=f'Subject {subject_id}', color=color)
-                ellipse = Ellipse((mean_x, mean_y), width, height, angle=theta,
-                                  edgecolor=color, facecolor='none', lw=2, alpha=0.7)
-                ax.add_patch(ellipse)
-                ax.set_xlabel('Red Percentage')
-                ax.set_ylabel('Yellow Luminance Percent')
-                ax.set_xlim(0, 100)
-                ax.set_ylim(0, 100)
-                ax.set_title(f'Subject {subject_id} - {mode.title()} Mode')
-                ax.legend()
-                if save_path:
-                    fname = os.path.basename(save_path)
-                    indiv_path = fname.replace('.png', f'_subject_{subject_id}.png')
-                    if save_dir:
-                        indiv_path = os.path.join(save_dir, indiv_path)
-                    plt.savefig(indiv_path, dpi=150)
-                if show_plot:
-                    plt.show()
-                plt.close(fig)
-        if not individual:
-            ax.set_xlim(0, 100)
-            ax.set_ylim(0, 100)
-            ax.set_xlabel('Red Percentage')
-            ax.set_ylabel('Yellow Luminance Percent')
-            ax.set_title(f'Anomaloscope Mean Matches by Subject - {mode.title()} Mode')
-            ax.legend()
-            if save_path:
-                plt.savefig(save_path, dpi=150)
-            if show_plot:
-                plt.show()
-            plt.close(fig)
-
-    plot_subjects_with_dir(subject_data, save_path=save_path, show_plot=True,
-                           individual=args.individual, save_dir=args.save_dir, mode=args.mode)
+    modes = [args.mode] if args.mode else MODES
+    save_path = os.path.basename(args.save)
+    if '{mode}' not in save_path and len(modes) > 1:
+        save_path = save_path.replace('.png', '_{mode}.png')
+    os.makedirs(args.save_dir, exist_ok=True)
+    save_path = os.path.join(args.save_dir, save_path)
+
+    mode_data = load_subject_data(args.data_dir, modes)
+    # Both kinds of figure unless only one was asked for
+    individual = args.individual or not args.combined
+    combined = args.combined or not args.individual
+    jobs = figure_jobs(mode_data, save_path, individual, combined)
+    render_figures(jobs, args.save_dir, args.workers, args.force)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+"""
+Run the LUT calibration routines end-to-end against the simulated projector and instruments, and time them.
+Measurements are written to a temporary folder unless --output is given.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from LedDriverGUI.gui.calibration.lutCalibration import LUTMeasurement
+
+
+def runSimulation(output_dir, sleep_time=2, solver="illinois"):
+    lut_dir = os.path.join(output_dir, "LUT")
+    gamma_dir = os.path.join(output_dir, "gamma")
+    spectra_dir = os.path.join(output_dir, "spectras")
+    os.makedirs(lut_dir, exist_ok=True)
+
+    timings = {}
+    routines = [
+        ("runLutCalibration", dict(gamma_directory=gamma_dir)),
+        ("runGammaCheck", dict(gamma_directory=gamma_dir)),
+        ("runLUTCheck", dict(gamma_directory=gamma_dir)),
+        ("runSpectralMeasurement", dict(peak_spectra_directory=spectra_dir)),
+    ]
+    for name, kwargs in routines:
+        measurement = LUTMeasurement(None, lut_dir, starting_pwms=[0.95] * 4, sleep_time=sleep_time,
+                                     threshold=0.0001, solver=solver, debug=True, **kwargs)
+        start = time.perf_counter()
+        getattr(measurement, name)()
+        timings[name] = time.perf_counter() - start
+
+    for name, elapsed in timings.items():
+        print(f"{name:>24}: {elapsed:7.1f} s")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", help="folder to write the LUT and measurements to")
+    parser.add_argument("--sleep-time", type=float, default=2, help="maximum settle time (s) after each change")
+    parser.add_argument("--solver", default="illinois", choices=["illinois", "pid"])
+    args = parser.parse_args()
+    if args.output:
+        runSimulation(args.output, args.sleep_time, args.solver)
+    else:
+        with tempfile.TemporaryDirectory() as output_dir:
+            runSimulation(output_dir, args.sleep_time, args.solver)